@@ -0,0 +1,137 @@
+"""
+Click-to-wire latency of GUI commands over a pseudo-terminal loopback.
+
+A "GUI" thread puts release and chat commands on a commandChannel while a
+serial loop, shaped like serialHandlerThread.run, drains the channel, queues
+the frames on a txScheduler and writes them to the port. The time from put()
+until the frame is read back on the far side of the pty is reported, along
+with the time the command sat on the channel. The target is under 10 ms.
+
+Usage: python benchmarks/bench_command_channel.py [--samples N]
+
+POSIX only (needs pty) and pyserial.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import pty
+import time
+import random
+import select
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import serial
+from radioReader import radioPortReader, READ_MODE_SELECT
+from txScheduler import txScheduler
+from commandChannel import commandChannel, releaseBalloonCommand, chatMessageCommand
+
+TARGET_LATENCY = 0.010
+
+
+class channelSerialLoop(threading.Thread):
+	def __init__(self, port):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.port = port
+		self.reader = radioPortReader(READ_MODE_SELECT)
+		self.reader.setPort(port)
+		self.scheduler = txScheduler(38400)
+		self.channel = commandChannel(self.reader.wake)
+		self.running = True
+
+	def send(self, line):
+		self.scheduler.enqueue(line, "chase1," + line + ",END_TX\n")
+
+	def run(self):
+		while (self.running):
+			command = self.channel.get()
+			while (command is not None):
+				if (isinstance(command, releaseBalloonCommand)):
+					self.send("cmd,SSAG_RELEASE_BALLOON,{}".format(command.sequence))
+				else:
+					self.send("chat," + command.message)
+				self.channel.commandCompleted(command)
+				command = self.channel.get()
+
+			item = self.scheduler.getNextFrame()
+			while (item is not None):
+				self.port.write(item.frame.encode("ascii"))
+				item = self.scheduler.getNextFrame()
+
+			if (self.reader.waitForInput(self.scheduler.getWaitTime())):
+				self.port.read(self.port.inWaiting())
+
+		self.reader.close()
+
+
+def percentile(values, fraction):
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(name, latencies):
+	latencies = [value * 1000.0 for value in latencies]
+	return "{:<10} mean {:7.3f} ms  p50 {:7.3f} ms  p95 {:7.3f} ms  max {:7.3f} ms".format(
+		name,
+		sum(latencies) / len(latencies),
+		percentile(latencies, 0.5),
+		percentile(latencies, 0.95),
+		max(latencies))
+
+
+def main():
+	parser = argparse.ArgumentParser(description = __doc__.strip().split("\n")[0])
+	parser.add_argument("--samples", type = int, default = 200)
+	args = parser.parse_args()
+
+	master, slave = pty.openpty()
+	port = serial.Serial(os.ttyname(slave), 38400, timeout = 1)
+	loop = channelSerialLoop(port)
+	loop.start()
+
+	latencies = []
+	masterBuffer = b""
+
+	for sample in range(args.samples):
+		time.sleep(random.uniform(0.005, 0.05))
+
+		if (sample % 2 == 0):
+			command = releaseBalloonCommand()
+			command.sequence = sample
+		else:
+			command = chatMessageCommand("message,{}".format(sample))
+
+		sentTime = time.time()
+		loop.channel.put(command)
+
+		seen = False
+		deadline = sentTime + 2
+		while (not seen and time.time() < deadline):
+			if (len(select.select([master], [], [], 0.01)[0]) > 0):
+				masterBuffer += os.read(master, 4096)
+				while (b"\n" in masterBuffer):
+					line, masterBuffer = masterBuffer.split(b"\n", 1)
+					if (line.split(b",")[-2] == str(sample).encode("ascii")):
+						latencies.append(time.time() - sentTime)
+						seen = True
+
+	loop.running = False
+	loop.reader.wake()
+	loop.join(2)
+	port.close()
+	os.close(master)
+
+	statistics = loop.channel.latencyStatistics
+	print("{} of {} commands reached the wire".format(len(latencies), args.samples))
+	print("  " + summarize("wire", latencies))
+	print("  channel    mean {:7.3f} ms  max {:7.3f} ms".format(statistics.getMeanLatency() * 1000,
+																statistics.maxLatency * 1000))
+	print("  p95 under {:.0f} ms: {}".format(TARGET_LATENCY * 1000, percentile(latencies, 0.95) < TARGET_LATENCY))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,92 @@
+"""
+Feeds a flight's worth of radio traffic into the radio console's
+consoleBuffer and shows that appending and drawing stay flat as the history
+grows.
+
+Traffic is test_telemetry.txt replayed in chunks of --chunk bytes (so frames
+are split across chunks as they are off the port) until --hours of traffic at
+--rate frames per second have gone in. Per hour of traffic the report shows
+the time to append a chunk, the time to fetch one screen (--rows rows) of the
+unfiltered view and of a callsign and type filtered view, the lines held and
+the process RSS.
+
+Usage: python benchmarks/bench_console_buffer.py [--hours H] [--rate HZ] [--chunk BYTES] [--rows N]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from logReader import readLogLines, extractFrames
+from consoleBuffer import consoleBuffer
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+def getResidentBytes():
+	try:
+		with open("/proc/self/statm") as statm:
+			return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except:
+		return 0
+
+
+# What the model does for the rows on screen
+def fetchScreen(buffer, rows, callsign = None, messageType = None):
+	entries = buffer.getEntries(callsign, messageType)
+	count = len(entries)
+	for row in range(min(rows, count)):
+		entries[count - 1 - row].format()
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Radio console buffer benchmark")
+	parser.add_argument("--log", default = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_telemetry.txt"))
+	parser.add_argument("--hours", type = int, default = 8)
+	parser.add_argument("--rate", type = float, default = 10.0, help = "frames per second of traffic")
+	parser.add_argument("--chunk", type = int, default = 64, help = "bytes per read")
+	parser.add_argument("--rows", type = int, default = 40, help = "rows on screen")
+	args = parser.parse_args()
+
+	frames = [frame for timestamp, frame in extractFrames(readLogLines(args.log))]
+	traffic = "".join([frame + ",END_TX\n" for frame in frames])
+	averageFrame = len(traffic) / len(frames)
+
+	buffer = consoleBuffer()
+	chunksPerHour = int(args.rate * 3600 * averageFrame / args.chunk)
+	offset = 0
+
+	print("{} frames/s, {} byte chunks, {} chunks per hour".format(args.rate, args.chunk, chunksPerHour))
+	print("{:>5} {:>10} {:>12} {:>12} {:>8} {:>8}".format("hour", "append us", "screen us", "filtered us", "lines", "RSS MB"))
+
+	for hour in range(1, args.hours + 1):
+		appendStart = timer()
+		for index in range(chunksPerHour):
+			if (offset >= len(traffic)):
+				offset = 0
+			buffer.addText(traffic[offset:offset + args.chunk])
+			offset += args.chunk
+		appendTime = (timer() - appendStart) / chunksPerHour
+
+		repeats = 200
+		screenStart = timer()
+		for index in range(repeats):
+			fetchScreen(buffer, args.rows)
+		screenTime = (timer() - screenStart) / repeats
+
+		filteredStart = timer()
+		for index in range(repeats):
+			fetchScreen(buffer, args.rows, "hab", "data")
+		filteredTime = (timer() - filteredStart) / repeats
+
+		print("{:5d} {:10.2f} {:12.1f} {:12.1f} {:8d} {:8.1f}".format(hour, appendTime * 1e6, screenTime * 1e6,
+				filteredTime * 1e6, len(buffer.getEntries()), getResidentBytes() / 1e6))
+		sys.stdout.flush()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,138 @@
+"""
+Parsing microbenchmark: lines per second through the old fixed-offset slice
+chain from handleMessage against the table-driven messageDispatcher.
+
+Handlers only count what they receive, so the numbers are the cost of
+telling frames apart and extracting their payload.
+
+Usage: python benchmarks/bench_dispatch.py [--repeat N] [--copies N]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+import argparse
+
+ROOT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from frameDecoder import frameDecoder
+from messageDispatcher import messageDispatcher
+
+
+class countingHandlers(object):
+	def __init__(self):
+		self.heard = 0
+		self.handled = 0
+
+	def receivedHeartbeat(self, callsign):
+		self.heard += 1
+
+	def emit(self, *args):
+		self.handled += 1
+
+	def handle(self, callsign, payload):
+		self.handled += 1
+
+
+# The slice chain handleMessage used before the dispatcher, minus logging
+def legacyHandleLine(line, handlers):
+	if (line[:3] == "hab"):
+		handlers.receivedHeartbeat("hab")
+		if(line[4:7] == "ack"):
+			handlers.emit(line[8:])
+		elif (line[4:8] == "chat"):
+			handlers.emit("HAB: " + line[9:])
+		elif (line[4:8] == "data"):
+			handlers.emit(line[9:])
+		elif (line[4:8] == "init"):
+			handlers.emit(line[9:])
+
+	elif (line[:3] == "nps"):
+		handlers.receivedHeartbeat("nps")
+		if (line[4:8] == "chat"):
+			handlers.emit("NPS: " + line[9:])
+		elif(line[4:9] == "image"):
+			handlers.emit(line[10:])
+
+	elif (line[:6] == "chase1"):
+		handlers.receivedHeartbeat("chase1")
+		if (line[7:11] == "chat"):
+			handlers.emit("Chase 1: " + line[12:])
+		elif (line[7:11] == "data"):
+			handlers.emit("chase1," + line[12:])
+		elif(line[7:12] == "image"):
+			handlers.emit(line[13:])
+
+	elif (line[:6] == "chase2"):
+		handlers.receivedHeartbeat("chase2")
+		if (line[7:11] == "chat"):
+			handlers.emit("Chase 2: " + line[12:])
+		elif (line[7:11] == "data"):
+			handlers.emit("chase2," + line[12:])
+		elif(line[7:12] == "image"):
+			handlers.emit(line[13:])
+
+	elif (line[:6] == "chase3"):
+		handlers.receivedHeartbeat("chase3")
+		if (line[7:11] == "chat"):
+			handlers.emit("Chase 3: " + line[12:])
+		elif (line[7:11] == "data"):
+			handlers.emit("chase3," + line[12:])
+		elif(line[7:12] == "image"):
+			handlers.emit(line[13:])
+
+
+def runLegacy(lines):
+	handlers = countingHandlers()
+	for line in lines:
+		legacyHandleLine(line, handlers)
+	return handlers
+
+
+def runDispatcher(lines):
+	handlers = countingHandlers()
+	dispatcher = messageDispatcher()
+	dispatcher.setNodeHeardHandler(handlers.receivedHeartbeat)
+
+	for callsign in ("hab", "nps", "chase1", "chase2", "chase3"):
+		dispatcher.registerCallsign(callsign)
+
+	for messageType in ("chat", "data", "image"):
+		dispatcher.registerHandler(messageType, handlers.handle)
+	for messageType in ("ack", "init"):
+		dispatcher.registerHandler(messageType, handlers.handle, "hab")
+
+	dispatch = dispatcher.dispatch
+	for line in lines:
+		dispatch(line)
+	return handlers
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Frame dispatch microbenchmark")
+	parser.add_argument("--repeat", type = int, default = 5)
+	parser.add_argument("--copies", type = int, default = 50, help = "times the capture is repeated")
+	args = parser.parse_args()
+
+	with open(os.path.join(ROOT_DIRECTORY, "test_telemetry.txt"), "rb") as captureFile:
+		lines = frameDecoder().feed(captureFile.read()) * args.copies
+
+	print("{} frames from test_telemetry.txt".format(len(lines)))
+
+	for name, function in (("legacy", runLegacy), ("dispatcher", runDispatcher)):
+		best = None
+		for iteration in range(args.repeat):
+			start = time.time()
+			handlers = function(lines)
+			elapsed = time.time() - start
+			if (best is None or elapsed < best):
+				best = elapsed
+
+		print("{:<12} {:10.0f} lines/s  ({} heard, {} handled)".format(
+			name, len(lines) / best, handlers.heard, handlers.handled))
+
+
+if __name__ == "__main__":
+	main()
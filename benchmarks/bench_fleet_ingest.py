@@ -0,0 +1,430 @@
+"""
+Fleet scaling benchmark for the whole ingest path, from the bytes the radio
+hands over to the display updates:
+
+	decode        frameDecoder.feed() on each chunk read
+	handleFrame   per frame, made up of
+	  dispatch      messageDispatcher.dispatch(), which calls
+	    archive       telemetryArchive parsing and writing
+	    gui balloon   updateBalloonDataTelemetry, including
+	      rates         calculateRates
+	      map/plot      the map waypoint command, or updatePlot in offline mode
+	    gui chase     updateChaseVehicleTelemetry, including map/plot
+	  log           logTelemetry
+	log radio     logRadio, as the serial loop logs every frame
+
+Synthetic traffic comes from N balloons and M chase vehicles, each sending
+"data" at its own rate. The flight runs on a simulated clock as fast as the
+pipeline allows, one chunk per 0.1 simulated seconds. For each fleet the
+report shows frames/s achieved against frames/s offered, the simulated time
+at which processing first fell a second behind the flight, per-stage latency
+percentiles and RSS growth.
+
+run_MoGS.py needs PyQt4 (and winsound), so the GUI stages are done by
+guiIngestMirror, which repeats the per-frame work of the mogsMainWindow
+handlers with label text kept in a dict and map commands counted instead of
+run. Everything runs on one thread, whereas the GUI has its own, so the
+totals are an upper bound on what one core has to do.
+
+Usage: python benchmarks/bench_fleet_ingest.py [--fleets 1x3,4x12,...] [--balloon-rate HZ]
+                                               [--chase-rate HZ] [--duration S] [--view map|plot]
+                                               [--limit S]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from math import pi, sin, cos, acos
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import logger
+import telemetryCore as telemetryCoreModule
+from telemetryCore import telemetryCore
+from radioSimulator import formatBalloonData, formatChaseData
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+timer = getattr(time, "perf_counter", time.time)
+
+CHUNK_INTERVAL = 0.1  # simulated seconds of traffic per read
+
+STAGES = ["decode", "handleFrame", "  dispatch", "    archive", "    gui balloon", "      rates",
+		"      map/plot", "    gui chase", "  log", "log radio"]
+
+
+class stageTimer(object):
+	def __init__(self):
+		self.samples = dict([(name, []) for name in STAGES])
+
+	# Returns function with every call's duration recorded under name
+	def wrap(self, name, function):
+		samples = self.samples[name]
+
+		def timedFunction(*args):
+			startTime = timer()
+			try:
+				return function(*args)
+			finally:
+				samples.append(timer() - startTime)
+
+		return timedFunction
+
+	def getPercentiles(self, name):
+		samples = sorted(self.samples[name])
+		if (len(samples) == 0):
+			return None
+
+		return [samples[min(len(samples) - 1, int(len(samples) * fraction))] for fraction in (0.5, 0.95, 0.99)] + [samples[-1]]
+
+
+# Repeats what mogsMainWindow does for each balloon and chase data signal:
+# split and format the fields for the labels, extend the vehicle tracks, work
+# out ground speed and ascent rate, and add a map waypoint or redraw the
+# offline plot
+class guiIngestMirror(object):
+	def __init__(self, timers, offlineMode):
+		self.offlineModeEnabled = offlineMode
+		self.telemetryValuesToInclude = 5
+
+		self.vehicleLocationList = {}
+		self.dataTelemetryList = {}
+		self.labels = {}
+		self.javaArrayPosition = {}
+		self.mapCommands = 0
+		self.totalErrorsReceived = 0
+
+		# Set by the dispatcher before each balloon frame, as balloonData
+		# carries no callsign
+		self.currentBalloon = "hab"
+
+		self.calculateRates = timers.wrap("      rates", self.calculateRates)
+		self.updateMap = timers.wrap("      map/plot", self.updateMap)
+		self.updateBalloonDataTelemetry = timers.wrap("    gui balloon", self.updateBalloonDataTelemetry)
+		self.updateChaseVehicleTelemetry = timers.wrap("    gui chase", self.updateChaseVehicleTelemetry)
+
+	def getTrack(self, callsign):
+		if (callsign not in self.vehicleLocationList):
+			self.vehicleLocationList[callsign] = [[], []]
+			self.javaArrayPosition[callsign] = len(self.javaArrayPosition)
+		return self.vehicleLocationList[callsign]
+
+	def utcToLocalTime(self, timestamp):
+		hours = int(timestamp[:2])
+
+		if (":" in timestamp):
+			minutesAndSeconds = timestamp[2:]
+		else:
+			minutesAndSeconds = ":" + timestamp[2:4] + ":" + timestamp[4:]
+
+		return str((hours - 7) % 24) + minutesAndSeconds
+
+	def computeMagnitude(self, rawX, rawY, rawZ):
+		return "x: {} y: {} z: {}".format("%2.1f" % ((int(rawX) - 127) / float(29)),
+										"%2.1f" % ((int(rawY) - 127) / float(29)),
+										"%2.1f" % ((int(rawZ) - 127) / float(29)))
+
+	def updateMap(self, callsign, latitude, longitude, timestamp):
+		if (self.offlineModeEnabled):
+			self.updatePlot()
+		else:
+			javascriptCommand = "addVehicleWaypoint({}, {}, {}, \"{}\");".format(
+								self.javaArrayPosition[callsign], latitude, longitude, timestamp)
+			self.mapCommands += len(javascriptCommand) > 0
+
+	# updatePlot clears the plot and builds a PlotDataItem (two arrays) from
+	# every stored point of every vehicle, after printing each track
+	def updatePlot(self):
+		for key, value in self.vehicleLocationList.items():
+			str(value)
+			if (numpy is not None):
+				numpy.array(value[0], dtype = float)
+				numpy.array(value[1], dtype = float)
+			else:
+				list(value[0])
+				list(value[1])
+
+	def updateBalloonDataTelemetry(self, data):
+		logger.logTelemetry(data)
+		labels = self.labels.setdefault(self.currentBalloon, {})
+		telemetryList = self.dataTelemetryList.setdefault(self.currentBalloon, [])
+
+		while (len(telemetryList) > self.telemetryValuesToInclude):
+			telemetryList.pop(0)
+
+		try:
+			splitMessage = data.split(",")
+
+			timestamp = self.utcToLocalTime(splitMessage[0])
+			labels["timestamp"] = timestamp
+
+			latitude = splitMessage[1]
+			longitude = splitMessage[2]
+			labels["gps"] = latitude + ", " + longitude
+
+			track = self.getTrack(self.currentBalloon)
+			track[0].append(float(latitude))
+			track[1].append(float(longitude))
+			self.updateMap(self.currentBalloon, latitude, longitude, timestamp)
+
+			altitude = splitMessage[3]
+			labels["altitude"] = altitude + " m"
+			labels["tempInside"] = splitMessage[4] + " C"
+			labels["tempOutside"] = splitMessage[5] + " C"
+			labels["tempBattery"] = splitMessage[6] + " C"
+			labels["voltage"] = splitMessage[7] + " V"
+			labels["humidity"] = splitMessage[8] + " %"
+			labels["magnitude"] = self.computeMagnitude(splitMessage[9], splitMessage[10], splitMessage[11])
+
+			self.totalErrorsReceived += bin(int(splitMessage[12])).count("1")
+			labels["errors"] = str(self.totalErrorsReceived)
+
+			try:
+				groundSpeed, ascentRate = self.calculateRates(telemetryList)
+				labels["speed"] = groundSpeed + " m/s"
+				labels["ascent"] = ascentRate + " m/s"
+			except:
+				labels["speed"] = "None"
+				labels["ascent"] = "None"
+
+			telemetryList.append([timestamp, altitude, latitude, longitude,
+								splitMessage[7], splitMessage[4], splitMessage[5], splitMessage[6]])
+		except:
+			logger.logTelemetry("Invalid data packet - data was not processed.")
+
+	def updateChaseVehicleTelemetry(self, data):
+		logger.logTelemetry(data)
+
+		try:
+			splitMessage = data.split(",")
+			callsign = splitMessage[0]
+			timestamp = self.utcToLocalTime(splitMessage[1])
+
+			latitude = splitMessage[2]
+			longitude = splitMessage[3]
+
+			track = self.getTrack(callsign)
+			track[0].append(float(latitude))
+			track[1].append(float(longitude))
+			self.updateMap(callsign, latitude, longitude, timestamp)
+
+			self.labels.setdefault(callsign, {})["gps"] = "{} - {}".format(callsign, timestamp) + latitude + ", " + longitude
+		except:
+			logger.logTelemetry("Invalid data packet - data was not processed.")
+
+	def calculateRates(self, telemetryList):
+		groundSpeed = "NONE"
+		ascentRate = "NONE"
+
+		if (len(telemetryList) > 1):
+			time1 = telemetryList[0][0].split(":")
+			time2 = telemetryList[-1][0].split(":")
+
+			time1InSeconds = int(time1[0]) * 3600 + int(time1[1]) * 60 + int(time1[2])
+			time2InSeconds = int(time2[0]) * 3600 + int(time2[1]) * 60 + int(time2[2])
+			secondsTaken = time2InSeconds - time1InSeconds
+
+			distanceTraveled = distanceOnUnitSphere(float(telemetryList[0][2]), float(telemetryList[0][3]),
+													float(telemetryList[-1][2]), float(telemetryList[-1][3]))
+			altitudeDifference = float(telemetryList[-1][1]) - float(telemetryList[0][1])
+
+			groundSpeed = "{:.2f}".format(distanceTraveled / secondsTaken)
+			ascentRate = "{:.2f}".format(altitudeDifference / secondsTaken)
+
+		return groundSpeed, ascentRate
+
+
+def distanceOnUnitSphere(lat1, long1, lat2, long2):
+	degreesToRadians = pi / 180.0
+	phi1 = (90.0 - lat1) * degreesToRadians
+	phi2 = (90.0 - lat2) * degreesToRadians
+	theta1 = long1 * degreesToRadians
+	theta2 = long2 * degreesToRadians
+
+	cosine = sin(phi1) * sin(phi2) * cos(theta1 - theta2) + cos(phi1) * cos(phi2)
+	return acos(min(1.0, cosine)) * 6378100
+
+
+def getResidentBytes():
+	try:
+		with open("/proc/self/statm") as statm:
+			return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (IOError, OSError, ValueError):
+		import resource
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Callsigns hab, hab2, ... and chase1, chase2, ...
+def getFleetCallsigns(balloons, chaseVehicles):
+	return (["hab"] + ["hab" + str(index) for index in range(2, balloons + 1)],
+			["chase" + str(index) for index in range(1, chaseVehicles + 1)])
+
+
+def buildCore(timers, gui, balloonCallsigns, chaseCallsigns):
+	core = telemetryCore()
+
+	core.radioFrameDecoder.feed = timers.wrap("decode", core.radioFrameDecoder.feed)
+	core.messageDispatcher.dispatch = timers.wrap("  dispatch", core.messageDispatcher.dispatch)
+	core.telemetryArchive.addBalloonData = timers.wrap("    archive", core.telemetryArchive.addBalloonData)
+	core.telemetryArchive.addChaseData = timers.wrap("    archive", core.telemetryArchive.addChaseData)
+	core.handleFrame = timers.wrap("handleFrame", core.handleFrame)
+	telemetryCoreModule.logTelemetry = timers.wrap("  log", logger.logTelemetry)
+
+	core.subscribe("balloonData", gui.updateBalloonDataTelemetry)
+	core.subscribe("vehicleData", gui.updateChaseVehicleTelemetry)
+
+	for callsign in balloonCallsigns:
+		core.registerNode(callsign)
+		core.messageDispatcher.registerHandler("data", makeBalloonHandler(core, gui, callsign), callsign)
+	for callsign in chaseCallsigns:
+		core.registerChaseVehicle(callsign)
+
+	return core
+
+
+def makeBalloonHandler(core, gui, callsign):
+	def receivedBalloonData(frameCallsign, payload):
+		gui.currentBalloon = callsign
+		core.receivedBalloonData(frameCallsign, payload)
+	return receivedBalloonData
+
+
+# Frames due in the chunk starting at simulated time t, as one string
+def buildChunk(nodes, t, flightStart, noise):
+	frames = []
+
+	for node in nodes:
+		while (node["nextTime"] < t + CHUNK_INTERVAL):
+			elapsed = node["nextTime"] + node["offset"]
+			gpsTime = flightStart + node["nextTime"]
+			if (node["balloon"]):
+				payload = formatBalloonData(elapsed, noise, gpsTime)
+			else:
+				payload = formatChaseData(elapsed, gpsTime)
+			frames.append(node["callsign"] + ",data," + payload + ",END_TX\n")
+			node["nextTime"] += node["interval"]
+
+	return "".join(frames), len(frames)
+
+
+def runFleet(balloons, chaseVehicles, args):
+	timers = stageTimer()
+	gui = guiIngestMirror(timers, args.view == "plot")
+	balloonCallsigns, chaseCallsigns = getFleetCallsigns(balloons, chaseVehicles)
+	core = buildCore(timers, gui, balloonCallsigns, chaseCallsigns)
+	logRadio = timers.wrap("log radio", logger.logRadio)
+
+	noise = random.Random(1)
+	nodes = []
+	for callsign in balloonCallsigns:
+		nodes.append({"callsign" : callsign, "balloon" : True, "interval" : 1.0 / args.balloon_rate,
+					"nextTime" : noise.random() / args.balloon_rate, "offset" : noise.uniform(0, 3600)})
+	for callsign in chaseCallsigns:
+		nodes.append({"callsign" : callsign, "balloon" : False, "interval" : 1.0 / args.chase_rate,
+					"nextTime" : noise.random() / args.chase_rate, "offset" : noise.uniform(0, 600)})
+
+	offeredRate = len(balloonCallsigns) * args.balloon_rate + len(chaseCallsigns) * args.chase_rate
+	flightStart = 17 * 3600
+	startRss = getResidentBytes()
+	startDropped = logger.getLogWriter().droppedLines
+	startTime = time.time()
+	fellBehindAt = None
+	frames = 0
+	t = 0.0
+
+	while (t < args.duration):
+		chunk, chunkFrames = buildChunk(nodes, t, flightStart, noise)
+
+		# The body of telemetryCore.run for one read
+		for frame in core.radioFrameDecoder.feed(chunk):
+			logRadio(frame + ",END_TX")
+			if (len(frame) > 0):
+				core.handleFrame(frame)
+
+		frames += chunkFrames
+		t += CHUNK_INTERVAL
+
+		wallTime = time.time() - startTime
+		if (fellBehindAt is None and wallTime > t + 1):
+			fellBehindAt = t
+		if (wallTime > args.limit):
+			break
+
+	elapsed = time.time() - startTime
+	core.telemetryArchive.close()
+
+	return {"balloons" : len(balloonCallsigns),
+			"chase" : len(chaseCallsigns),
+			"offered" : offeredRate,
+			"achieved" : frames / elapsed,
+			"frames" : frames,
+			"simulated" : t,
+			"fellBehindAt" : fellBehindAt,
+			"limited" : t < args.duration,
+			"rssGrowth" : getResidentBytes() - startRss,
+			"droppedLines" : logger.getLogWriter().droppedLines - startDropped,
+			"timers" : timers}
+
+
+def printResult(result):
+	print("{balloons} balloons, {chase} chase: {frames} frames over {simulated:.0f} simulated s, "
+		"offered {offered:.0f} frames/s, achieved {achieved:.0f} frames/s".format(**result))
+
+	if (result["fellBehindAt"] is None):
+		print("  kept up with the flight")
+	else:
+		print("  fell a second behind {:.0f} s into the flight".format(result["fellBehindAt"]))
+	if (result["limited"]):
+		print("  stopped at the wall clock limit")
+	if (result["droppedLines"] > 0):
+		print("  log writer dropped {} lines".format(result["droppedLines"]))
+
+	print("  RSS grew {:.1f} MiB ({:.0f} bytes per frame)".format(
+		result["rssGrowth"] / 1048576.0, result["rssGrowth"] / max(1, result["frames"])))
+
+	print("  {:<16} {:>8} {:>10} {:>10} {:>10} {:>10}".format("stage", "calls", "p50 us", "p95 us", "p99 us", "max us"))
+	for name in STAGES:
+		percentiles = result["timers"].getPercentiles(name)
+		if (percentiles is not None):
+			print("  {:<16} {:>8d} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+				name, len(result["timers"].samples[name]), *[value * 1e6 for value in percentiles]))
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Fleet scaling benchmark for the ingest path")
+	parser.add_argument("--fleets", default = "1x3,4x12,16x48", help = "comma separated BALLOONSxCHASE")
+	parser.add_argument("--balloon-rate", type = float, default = 1.0, help = "data frames per second per balloon")
+	parser.add_argument("--chase-rate", type = float, default = 1.0, help = "data frames per second per chase vehicle")
+	parser.add_argument("--duration", type = float, default = 600.0, help = "simulated seconds of flight")
+	parser.add_argument("--view", choices = ["map", "plot"], default = "map",
+						help = "map waypoints, or the offline mode plot")
+	parser.add_argument("--limit", type = float, default = 60.0, help = "wall clock seconds per fleet")
+	args = parser.parse_args()
+
+	directory = tempfile.mkdtemp()
+	workingDirectory = os.getcwd()
+	os.chdir(directory)
+
+	try:
+		for fleet in args.fleets.split(","):
+			balloons, chaseVehicles = [int(count) for count in fleet.split("x")]
+			printResult(runFleet(balloons, chaseVehicles, args))
+			sys.stdout.flush()
+
+		logger.stopLogWriter()
+	finally:
+		telemetryCoreModule.logTelemetry = logger.logTelemetry
+		os.chdir(workingDirectory)
+		shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+	main()
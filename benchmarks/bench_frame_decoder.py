@@ -0,0 +1,97 @@
+"""
+Measures frameDecoder throughput over test_telemetry.txt cut at random byte
+boundaries, against the per-read split used by the old handleMessage.
+
+The legacy split is fast but loses every frame that straddles two reads, so
+the number of frames recovered intact is reported alongside the rate.
+
+Usage: python benchmarks/bench_frame_decoder.py [--repeat N] [--max-chunk BYTES] [--seed N]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from frameDecoder import frameDecoder, FRAME_TERMINATOR
+
+
+def cutIntoChunks(data, maxChunk, seed):
+	generator = random.Random(seed)
+	chunks = []
+	position = 0
+
+	while (position < len(data)):
+		size = generator.randint(1, maxChunk)
+		chunks.append(data[position:position + size])
+		position += size
+
+	return chunks
+
+
+# What handleMessage did with each read: split it and treat every piece as a frame
+def legacySplit(chunks):
+	frames = []
+	for chunk in chunks:
+		for line in chunk.split(FRAME_TERMINATOR):
+			if (len(line) > 0):
+				frames.append(line)
+	return frames
+
+
+def streamingDecode(chunks):
+	decoder = frameDecoder()
+	frames = []
+	for chunk in chunks:
+		frames.extend(decoder.feed(chunk))
+	return frames
+
+
+def timeDecoder(function, chunks, repeat):
+	best = None
+	for iteration in range(repeat):
+		start = time.time()
+		frames = function(chunks)
+		elapsed = time.time() - start
+		if (best is None or elapsed < best):
+			best = elapsed
+	return best, frames
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "frameDecoder throughput benchmark")
+	parser.add_argument("--repeat", type = int, default = 5)
+	parser.add_argument("--max-chunk", type = int, default = 64)
+	parser.add_argument("--copies", type = int, default = 20, help = "times the capture is repeated")
+	parser.add_argument("--seed", type = int, default = 1)
+	args = parser.parse_args()
+
+	with open(os.path.join(ROOT_DIRECTORY, "test_telemetry.txt"), "rb") as captureFile:
+		data = captureFile.read() * args.copies
+
+	expectedFrames = frameDecoder().feed(data)
+	expectedSet = set(expectedFrames)
+	chunks = cutIntoChunks(data, args.max_chunk, args.seed)
+	print("{} bytes in {} chunks of 1-{} bytes".format(len(data), len(chunks), args.max_chunk))
+
+	for name, function in (("legacy", legacySplit), ("streaming", streamingDecode)):
+		elapsed, frames = timeDecoder(function, chunks, args.repeat)
+		if (str is not bytes and name == "legacy"):
+			frames = [frame.decode("latin-1") for frame in frames]
+		intact = len([frame for frame in frames if frame in expectedSet])
+
+		print("{:<10} {:8.2f} MB/s  {:10.0f} frames/s  {} of {} frames intact".format(
+			name,
+			len(data) / elapsed / 1e6,
+			intact / elapsed,
+			intact,
+			len(expectedFrames)))
+
+
+if __name__ == "__main__":
+	main()
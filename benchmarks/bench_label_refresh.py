@@ -0,0 +1,267 @@
+"""
+Compares updating the GUI's telemetry labels on every frame with updating
+them through telemetryViewModel on a fixed-rate refresh.
+
+A log (test_telemetry.txt by default) is replayed on a simulated clock at
+--speed times its recorded rate. Each frame goes through a mirror of what
+the mogsMainWindow handlers do with their labels: a balloon frame sets about
+fifteen label texts and styles, a chase frame its two labels, and every frame
+from a known node fires networkStatus, which restyles the five status labels
+and sets the mission elapsed time. The direct run makes those calls on the
+widgets as they happen; the view model run stores them and applies the
+changed ones every --interval ms of replay time.
+
+With PyQt4 installed the labels are real QLabels (offscreen) and the CPU time
+includes Qt's work. Otherwise the labels only count the calls made on them,
+so the times cover the Python side and the call counts show what Qt would
+have been asked to do.
+
+Usage: python benchmarks/bench_label_refresh.py [--log FILE] [--speed X] [--interval MS]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from logReader import readLogLines, extractFrames
+from telemetryViewModel import telemetryViewModel, GUI_REFRESH_INTERVAL
+
+try:
+	from PyQt4 import QtGui
+except ImportError:
+	QtGui = None
+
+if (hasattr(time, "process_time")):
+	cpuTimer = time.process_time
+else:
+	cpuTimer = time.clock
+
+NODES = ["hab", "chase1", "chase2", "chase3", "nps"]
+TELEMETRY_FIELDS = ["timestamp", "gps", "met", "altitude", "voltage", "tempBattery", "tempInside",
+					"tempOutside", "humidity", "speed", "ascent", "magnitude", "disk", "startup", "errors"]
+
+UNTIMED_INTERVAL = 0.5  # replayPort's spacing for frames without a timestamp
+
+
+class countingLabel(object):
+	def __init__(self):
+		self.textCalls = 0
+		self.styleSheetCalls = 0
+
+	def setText(self, text):
+		self.textCalls += 1
+
+	def setStyleSheet(self, styleSheet):
+		self.styleSheetCalls += 1
+
+
+# Takes each call straight to the widget, as the handlers did before
+class directLabels(object):
+	def __init__(self):
+		self.labels = {}
+
+	def addLabel(self, field, label, text = None, styleSheet = None):
+		self.labels[field] = label
+
+	def setText(self, field, text):
+		self.labels[field].setText(text)
+
+	def setStyleSheet(self, field, styleSheet):
+		self.labels[field].setStyleSheet(styleSheet)
+
+	def applyChanges(self):
+		return 0
+
+
+class countingQLabel(object):
+	def __init__(self):
+		self.label = QtGui.QLabel("None")
+		self.textCalls = 0
+		self.styleSheetCalls = 0
+
+	def setText(self, text):
+		self.textCalls += 1
+		self.label.setText(text)
+
+	def setStyleSheet(self, styleSheet):
+		self.styleSheetCalls += 1
+		self.label.setStyleSheet(styleSheet)
+
+
+# The label work of the mogsMainWindow handlers
+class labelHandlerMirror(object):
+	def __init__(self, view):
+		self.view = view
+		self.activeNodes = dict([(callsign, 0) for callsign in NODES])
+		self.missionStartTime = datetime.datetime.now()
+		self.totalErrorsReceived = 0
+
+	def updateBalloonDataTelemetry(self, data):
+		view = self.view
+		view.setStyleSheet(("status", "hab"), "QFrame { background-color: Green }")
+
+		try:
+			splitMessage = data.split(",")
+			if (len(splitMessage[0]) > 0):
+				view.setText("timestamp", splitMessage[0])
+
+			if (len(splitMessage[1]) > 0 and len(splitMessage[2]) > 0):
+				view.setText("gps", splitMessage[1] + ", " + splitMessage[2])
+				view.setStyleSheet("gps", "QLabel { color: black }")
+			else:
+				view.setStyleSheet("gps", "QLabel { color: grey }")
+
+			if (len(splitMessage[3]) > 0):
+				view.setText("altitude", splitMessage[3] + " m")
+				view.setStyleSheet("altitude", "QLabel { color: black }")
+			else:
+				view.setStyleSheet("altitude", "QLabel { color: grey }")
+
+			for field, index, unit in (("tempInside", 4, " C"), ("tempOutside", 5, " C"), ("tempBattery", 6, " C"),
+										("voltage", 7, " V"), ("humidity", 8, " %")):
+				if (len(splitMessage[index]) > 0):
+					view.setText(field, splitMessage[index] + unit)
+
+			view.setText("magnitude", "x: {} y: {} z: {}".format(
+						*["%2.1f" % ((int(value) - 127) / 29.0) for value in splitMessage[9:12]]))
+
+			self.totalErrorsReceived += bin(int(splitMessage[12])).count("1")
+			view.setText("errors", str(self.totalErrorsReceived))
+			view.setText("speed", "None")
+			view.setText("ascent", "None")
+		except:
+			pass
+
+	def updateChaseVehicleTelemetry(self, data):
+		try:
+			callsign, timestamp, latitude, longitude = data.split(",")[:4]
+			self.view.setText(("chasePosition", callsign), latitude + ", " + longitude)
+			self.view.setText(("chaseTime", callsign), "{} - {}".format(callsign, timestamp))
+			self.view.setText(("chasePosition", callsign), "{}, {}".format(latitude, longitude))
+			self.view.setStyleSheet(("status", callsign), "QFrame { background-color: Green }")
+		except:
+			pass
+
+	def updateActiveNetwork(self):
+		currMet = datetime.datetime.now() - self.missionStartTime
+		self.view.setText("met", str(currMet).split('.')[0])
+
+		for callsign in NODES:
+			if (self.activeNodes[callsign] > 0):
+				self.view.setStyleSheet(("status", callsign), "QFrame { background-color: Green }")
+			else:
+				self.view.setStyleSheet(("status", callsign), "QFrame { background-color: Salmon }")
+
+	def handleFrame(self, frame):
+		fields = frame.split(",", 2)
+		callsign = fields[0]
+		if (callsign not in self.activeNodes):
+			return
+
+		self.activeNodes[callsign] = 3
+		self.updateActiveNetwork()
+
+		if (len(fields) < 3 or fields[1] != "data"):
+			return
+		if (callsign == "hab"):
+			self.updateBalloonDataTelemetry(fields[2])
+		else:
+			self.updateChaseVehicleTelemetry(callsign + "," + fields[2])
+
+
+def readFrames(fileName):
+	frames = []
+	position = None
+	lastTime = None
+
+	for timestamp, frame in extractFrames(readLogLines(fileName)):
+		if (position is None):
+			position = 0.0
+		elif (timestamp is None):
+			position += UNTIMED_INTERVAL
+		elif (lastTime is not None):
+			position += max(0.0, timestamp - lastTime)
+		if (timestamp is not None):
+			lastTime = timestamp
+		frames.append((position, frame))
+
+	return frames
+
+
+def makeLabels():
+	labels = {}
+	for field in TELEMETRY_FIELDS:
+		labels[field] = countingQLabel() if QtGui is not None else countingLabel()
+	for callsign in NODES:
+		labels[("status", callsign)] = countingQLabel() if QtGui is not None else countingLabel()
+	for callsign in NODES[1:4]:
+		labels[("chaseTime", callsign)] = countingQLabel() if QtGui is not None else countingLabel()
+		labels[("chasePosition", callsign)] = countingQLabel() if QtGui is not None else countingLabel()
+	return labels
+
+
+def runMode(view, frames, speed, interval):
+	labels = makeLabels()
+	for field, label in labels.items():
+		view.addLabel(field, label, "None" if field in TELEMETRY_FIELDS else None)
+
+	gui = labelHandlerMirror(view)
+	nextRefresh = interval
+	refreshes = 0
+
+	startTime = cpuTimer()
+	for position, frame in frames:
+		replayTime = position / speed
+		while (replayTime >= nextRefresh):
+			view.applyChanges()
+			refreshes += 1
+			nextRefresh += interval
+		gui.handleFrame(frame)
+	view.applyChanges()
+	cpuTime = cpuTimer() - startTime
+
+	return {"cpu" : cpuTime,
+			"texts" : sum([label.textCalls for label in labels.values()]),
+			"styles" : sum([label.styleSheetCalls for label in labels.values()]),
+			"refreshes" : refreshes}
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Telemetry label refresh benchmark")
+	parser.add_argument("--log", default = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_telemetry.txt"))
+	parser.add_argument("--speed", type = float, default = 10.0, help = "replay speed")
+	parser.add_argument("--interval", type = float, default = GUI_REFRESH_INTERVAL, help = "refresh interval, ms")
+	parser.add_argument("--repeat", type = int, default = 20, help = "replay the log this many times back to back")
+	args = parser.parse_args()
+
+	if (QtGui is not None):
+		application = QtGui.QApplication(sys.argv)
+
+	frames = readFrames(args.log)
+	length = frames[-1][0] + UNTIMED_INTERVAL
+	frames = [(position + length * index, frame) for index in range(args.repeat) for position, frame in frames]
+
+	print("{} frames, {:.0f} s of replay at {}x, labels: {}".format(
+		len(frames), frames[-1][0] / args.speed, args.speed, "QLabel" if QtGui is not None else "counted calls only"))
+	print("{:<12} {:>9} {:>9} {:>13} {:>10}".format("mode", "setText", "setStyle", "gui cpu ms", "refreshes"))
+
+	results = []
+	for name, view in (("direct", directLabels()), ("view model", telemetryViewModel())):
+		result = runMode(view, frames, args.speed, args.interval / 1000.0)
+		results.append(result)
+		print("{:<12} {texts:9d} {styles:9d} {:13.1f} {refreshes:10d}".format(name, result["cpu"] * 1000, **result))
+
+	direct, viewModel = results
+	print("widget calls cut {:.1f}x, style sheets {:.1f}x, gui cpu {:.1f}x".format(
+		(direct["texts"] + direct["styles"]) / max(1, viewModel["texts"] + viewModel["styles"]),
+		direct["styles"] / max(1, viewModel["styles"]),
+		direct["cpu"] / max(1e-9, viewModel["cpu"])))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,53 @@
+"""
+Times logReader over a directory of logs, in this process and on a process
+pool, and checks both give the same totals.
+
+Usage: python benchmarks/bench_log_reader.py [DIRECTORY] [--processes N]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from logReader import findLogFiles, parseLogFiles, logSummary
+
+
+def timeParse(fileNames, processes):
+	startTime = time.time()
+	summary = logSummary()
+	records = 0
+
+	for fileName, fileRecords, fileSummary in parseLogFiles(fileNames, processes):
+		summary.merge(fileSummary)
+		records += len(fileRecords)
+
+	return time.time() - startTime, summary, records
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Log reader benchmark")
+	parser.add_argument("directory", nargs = "?", default = os.path.join(ROOT, "Old Logs"))
+	parser.add_argument("--processes", type = int, default = None, help = "pool size, default one per CPU")
+	args = parser.parse_args()
+
+	fileNames = findLogFiles(args.directory)
+	megabytes = sum([os.path.getsize(fileName) for fileName in fileNames]) / 1e6
+	print("{} files, {:.1f} MB".format(len(fileNames), megabytes))
+
+	results = []
+	for name, processes in (("serial", 1), ("pool", args.processes)):
+		elapsed, summary, records = timeParse(fileNames, processes)
+		results.append((summary.lines, summary.frames, records))
+		print("{:<7} {:6.2f} s  {:6.1f} MB/s  {} lines  {} records".format(
+			name, elapsed, megabytes / elapsed, summary.lines, records))
+
+	print("totals match: {}".format(results[0] == results[1]))
+
+
+if __name__ == "__main__":
+	main()
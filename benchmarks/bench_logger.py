@@ -0,0 +1,98 @@
+"""
+Compares the original log functions against the background log writer.
+
+	legacy   - open in append mode, strftime and write on every call, as
+	           logRadio used to
+	buffered - logger.logRadio: cached timestamp, bounded queue, writer thread
+
+For each, reports the time the calling thread spends per line and the total
+time until every line is on disk. Logs go to a temporary directory.
+
+Usage: python benchmarks/bench_logger.py [--lines N] [--threads N]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import datetime
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import logger
+
+SAMPLE_LINE = "hab,data,121507,36.59249,-121.87775,10432,21.3,-34.2,19.8,11.0,0.02,0.01,0.98,0,END_TX"
+
+
+# The original logRadio, handle leak included
+def legacyLogRadio(line):
+	try:
+		radioLogFile = open(logger.RADIO_LOG_FILE_LOCATION, "a")
+		for newLine in line.split("\n"):
+			if (len(newLine) > 0):
+				radioLogFile.write(str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")) + ": " + newLine + "\n")
+		radioLogFile.close
+	except:
+		print("WARNING: Unable to log radio operations data")
+
+
+def runWriters(logFunction, lines, threads):
+	callerTimes = []
+
+	def writeLines():
+		startTime = time.time()
+		for index in range(lines // threads):
+			logFunction(SAMPLE_LINE)
+		callerTimes.append(time.time() - startTime)
+
+	workers = [threading.Thread(target = writeLines) for index in range(threads)]
+	startTime = time.time()
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+
+	return startTime, sum(callerTimes)
+
+
+def countLines(fileName):
+	lineCount = 0
+	with open(fileName, "r") as logFile:
+		for line in logFile:
+			lineCount += 1
+	return lineCount
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Log writer benchmark")
+	parser.add_argument("--lines", type = int, default = 50000)
+	parser.add_argument("--threads", type = int, default = 2, help = "threads logging at once")
+	args = parser.parse_args()
+
+	directory = tempfile.mkdtemp()
+	try:
+		for name, logFunction in (("legacy", legacyLogRadio), ("buffered", logger.logRadio)):
+			logger.RADIO_LOG_FILE_LOCATION = os.path.join(directory, name + "_radio_log.txt")
+
+			startTime, callerTime = runWriters(logFunction, args.lines, args.threads)
+			logger.stopLogWriter()
+			totalTime = time.time() - startTime
+
+			written = countLines(logger.RADIO_LOG_FILE_LOCATION)
+			print("{:<9} caller {:7.2f} us/line  on disk after {:6.3f} s  {:7.0f} lines/s  ({} of {} lines)".format(
+				name,
+				callerTime / args.lines * 1e6,
+				totalTime,
+				written / totalTime,
+				written,
+				args.lines))
+	finally:
+		shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,237 @@
+"""
+Measures how many waypoints per second reach the map page, one
+evaluateJavaScript() call per waypoint against mapBridge batches.
+
+The page's script from mogs_map_html.py runs in a Node.js process behind a
+pipe, and every evaluate is a synchronous round trip: the script is written,
+run, and the process answers before the next one goes. That stands in for
+QtWebKit's evaluateJavaScript(), which also parses and runs the script
+before returning. google.maps is replaced by plain objects that only hold
+their options, so the numbers are the cost of getting updates onto the page
+and through its functions, not of Google's rendering, which is the same
+either way.
+
+For each --per-frame count, waypoints for four vehicles are pushed in frames
+of that many points: the direct run formats and evaluates each one as
+run_MoGS.py used to, the bridge run queues them and flushes once per frame.
+
+A long replay follows: --replay-points waypoints through the bridge, 100 per
+frame, with a SPOT fix for each vehicle every 100 of them. Every tenth of
+the way the overlays on the map, the points in their tracks and node's heap
+(after a full GC) are printed; with pooled markers and thinned tracks they
+level off.
+
+Before anything is timed, a note holding a byte that is not valid UTF-8 is
+queued with a waypoint, as a raw string from the radio can be, to check the
+batch still reaches the page with the byte replaced.
+
+Without node on the PATH the evaluate does nothing, so only the Python side
+is measured and there is no replay.
+
+Usage: python benchmarks/bench_map_bridge.py [--points N] [--per-frame 1,10,100,1000] [--replay-points N]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import json
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mogs_map_html import googleMapsHtml
+from mapBridge import mapBridge, MAP_UPDATE_FUNCTION
+
+timer = getattr(time, "perf_counter", time.time)
+
+VEHICLES = 4
+
+# Overlays on the map are held by it, as Google's map holds them, so what the
+# page leaves on the map shows up in the heap
+GOOGLE_MAPS_STAND_IN = """
+var window = {};
+var document = {getElementById: function(id) { return null; }};
+function mapObject(options) { this.overlays = new Set(); this.map = null; this.setOptions(options || {}); }
+mapObject.prototype.setOptions = function(options) {
+	for (var key in options) { if (key != "map") { this[key] = options[key]; } }
+	if ("map" in options) { this.setMap(options.map); }
+};
+mapObject.prototype.setMap = function(map) {
+	if (this.map) { this.map.overlays.delete(this); }
+	this.map = map;
+	if (map) { map.overlays.add(this); }
+};
+mapObject.prototype.getMap = function() { return this.map; };
+mapObject.prototype.setPosition = function(position) { this.position = position; };
+mapObject.prototype.setTitle = function(title) { this.title = title; };
+mapObject.prototype.setPath = function(path) { this.path = path; };
+function mvcArray(items) { this.items = items || []; }
+mvcArray.prototype.push = function(item) { return this.items.push(item); };
+mvcArray.prototype.getLength = function() { return this.items.length; };
+mvcArray.prototype.getArray = function() { return this.items; };
+var google = {maps: {LatLng: function(lat, lng) { this.lat = lat; this.lng = lng; },
+					MVCArray: mvcArray,
+					Marker: mapObject,
+					Polyline: mapObject,
+					Map: mapObject,
+					MapTypeId: {ROADMAP: "roadmap"},
+					event: {addDomListener: function(target, name, handler) { handler(); }}}};
+function getPageStatistics() {
+	global.gc();
+	var points = 0;
+	map.overlays.forEach(function(overlay) { if (overlay.path) { points += overlay.path.getLength ? overlay.path.getLength() : overlay.path.length; } });
+	return [map.overlays.size, points, process.memoryUsage().heapUsed];
+}
+"""
+
+EVALUATOR = """
+var readline = require("readline");
+var globalEval = eval;
+globalEval(process.argv[1]);
+var input = readline.createInterface({input: process.stdin, terminal: false});
+input.on("line", function(line) {
+	var result = globalEval(line);
+	process.stdout.write((result === undefined ? "ok" : JSON.stringify(result)) + "\\n");
+});
+"""
+
+
+def getPageScript():
+	start = googleMapsHtml.index("<script>") + len("<script>")
+	end = googleMapsHtml.index("</script>", start)
+	return googleMapsHtml[start:end]
+
+
+class nodePage(object):
+	def __init__(self):
+		self.process = subprocess.Popen(["node", "--expose-gc", "-e", EVALUATOR, GOOGLE_MAPS_STAND_IN + getPageScript()],
+										stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+										universal_newlines = True)
+
+	def evaluate(self, script):
+		self.process.stdin.write(script + "\n")
+		self.process.stdin.flush()
+
+		result = self.process.stdout.readline()
+		if (len(result) == 0):
+			raise RuntimeError("script failed on the page")
+		if (result != "ok\n"):
+			return json.loads(result)
+
+	def close(self):
+		self.process.stdin.close()
+		self.process.wait()
+
+
+def makePoints(count):
+	points = []
+	for index in range(count):
+		vehicle = index % VEHICLES
+		points.append((vehicle, 36.6 + index * 1e-5, -121.9 + vehicle * 0.01, "12:{:02d}:{:02d}".format(index // 60 % 60, index % 60)))
+	return points
+
+
+def runDirect(evaluate, points):
+	calls = 0
+	startTime = timer()
+	for index, (vehicle, latitude, longitude, timestamp) in enumerate(points):
+		javascriptCommand = "addVehicleWaypoint({}, {}, {}, \"{}\");".format(vehicle, latitude, longitude, timestamp)
+		evaluate(javascriptCommand)
+		calls += 1
+	return timer() - startTime, calls
+
+
+def runBridge(evaluate, points, perFrame):
+	bridge = mapBridge(evaluate)
+	startTime = timer()
+	for index, (vehicle, latitude, longitude, timestamp) in enumerate(points):
+		bridge.addVehicleWaypoint(vehicle, latitude, longitude, timestamp)
+		if ((index + 1) % perFrame == 0):
+			bridge.flush()
+	bridge.flush()
+	return timer() - startTime, bridge.batchesSent
+
+
+def checkUndecodableText(evaluate):
+	scripts = []
+
+	def recordScript(script):
+		scripts.append(script)
+		evaluate(script)
+
+	bridge = mapBridge(recordScript)
+	bridge.addVehicleWaypoint(0, 36.6, -121.9, "12:00:00")
+	bridge.addMarkerManually(36.6, -121.9, b"Landing \xff")
+	bridge.flush()
+
+	updates = json.loads(scripts[0][len(MAP_UPDATE_FUNCTION) + 1:-2])
+	if (len(scripts) != 1 or len(updates) != 2 or updates[1][3] != u"Landing \ufffd"):
+		raise RuntimeError("batch with undecodable text was not sent whole: " + repr(scripts))
+
+
+def runReplay(page, count):
+	bridge = mapBridge(page.evaluate)
+	sampleInterval = max(1, count // 10)
+
+	print("{:>9} {:>9} {:>12} {:>8}".format("points", "overlays", "track points", "heap MB"))
+	for index, (vehicle, latitude, longitude, timestamp) in enumerate(makePoints(count)):
+		bridge.addVehicleWaypoint(vehicle, latitude, longitude, timestamp)
+		if ((index + 1) % 100 == 0):
+			for spotVehicle in range(VEHICLES):
+				bridge.addSpotMarker(spotVehicle, latitude, longitude, "SPOT: " + timestamp)
+			bridge.flush()
+
+		if ((index + 1) % sampleInterval == 0):
+			bridge.flush()
+			overlays, trackPoints, heapUsed = page.evaluate("getPageStatistics();")
+			print("{:9d} {:9d} {:12d} {:8.1f}".format(index + 1, overlays, trackPoints, heapUsed / 1e6))
+			sys.stdout.flush()
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Map bridge throughput benchmark")
+	parser.add_argument("--points", type = int, default = 20000, help = "waypoints per run")
+	parser.add_argument("--per-frame", default = "1,10,100,1000", help = "waypoints queued per GUI frame")
+	parser.add_argument("--replay-points", type = int, default = 400000, help = "waypoints in the long replay")
+	args = parser.parse_args()
+
+	try:
+		page = nodePage()
+		page.evaluate("1;")
+		evaluate = page.evaluate
+		print("page script running in node")
+	except (OSError, RuntimeError):
+		page = None
+		evaluate = lambda script: None
+		print("node not found, measuring the Python side only")
+
+	points = makePoints(args.points)
+
+	try:
+		checkUndecodableText(evaluate)
+		print("undecodable text: sent with the byte replaced")
+
+		# Let node compile the page functions before anything is timed
+		runDirect(evaluate, points[:2000])
+		runBridge(evaluate, points[:2000], 10)
+
+		directTime, directCalls = runDirect(evaluate, points)
+		print("direct: {:.0f} points/s, {} calls".format(len(points) / directTime, directCalls))
+
+		print("{:>9} {:>13} {:>9} {:>8}".format("per frame", "bridge pts/s", "calls", "speedup"))
+		for perFrame in [int(value) for value in args.per_frame.split(",")]:
+			bridgeTime, bridgeCalls = runBridge(evaluate, points, perFrame)
+			print("{:9d} {:13.0f} {:9d} {:7.1f}x".format(perFrame, len(points) / bridgeTime, bridgeCalls, directTime / bridgeTime))
+			sys.stdout.flush()
+
+		if (page is not None):
+			runReplay(page, args.replay_points)
+	finally:
+		if (page is not None):
+			page.close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,100 @@
+"""
+Measures nmeaParser throughput over a captured NMEA stream.
+
+The capture is the $GPGGA sentences logged in "Old Logs". Matching RMC, VTG
+and GSA sentences are generated for each of them so every supported type is
+exercised, and the stream is repeated until it holds --sentences sentences.
+
+Usage: python benchmarks/bench_nmea.py [--sentences N] [--repeat N] [--capture FILE]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+ROOT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from nmeaParser import nmeaParser, parseSentence, computeChecksum, toNativeString
+
+TARGET_RATE = 100000
+
+
+def withChecksum(body):
+	return "${}*{:02X}".format(body, computeChecksum(body))
+
+
+# Pulls logged GGA sentences out of MoGS telemetry logs
+def loadCapturedSentences(paths):
+	sentences = []
+
+	for path in paths:
+		with open(path, "rb") as logFile:
+			for line in logFile:
+				index = line.find(b"$GP")
+				if (index >= 0):
+					sentences.append(toNativeString(line[index:].strip()))
+
+	return sentences
+
+
+def companionSentences(ggaLine):
+	fields = ggaLine.split("*")[0].split(",")
+	timestamp, latitude, northSouth, longitude, eastWest = fields[1:6]
+
+	return [withChecksum("GPRMC,{},A,{},{},{},{},0.13,309.62,210715,,,A".format(
+							timestamp, latitude, northSouth, longitude, eastWest)),
+			withChecksum("GPVTG,309.62,T,,M,0.13,N,0.2,K,A"),
+			withChecksum("GPGSA,A,3,10,07,05,02,29,04,08,13,,,,,1.72,1.03,1.38")]
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "NMEA parser throughput benchmark")
+	parser.add_argument("--sentences", type = int, default = 200000)
+	parser.add_argument("--repeat", type = int, default = 3)
+	parser.add_argument("--capture", action = "append",
+						help = "log or raw NMEA file to read sentences from (default: Old Logs)")
+	args = parser.parse_args()
+
+	capturePaths = args.capture or glob.glob(os.path.join(ROOT_DIRECTORY, "Old Logs", "MoGS_telemetry_log*.txt"))
+	captured = loadCapturedSentences(capturePaths)
+	if (len(captured) == 0):
+		print("No NMEA sentences found in " + ", ".join(capturePaths))
+		return 1
+
+	stream = []
+	for sentence in captured:
+		stream.append(sentence)
+		if (sentence.startswith("$GPGGA") and parseSentence(sentence) is not None):
+			stream.extend(companionSentences(sentence))
+
+	stream = (stream * (args.sentences // len(stream) + 1))[:args.sentences]
+	print("{} sentences ({} captured)".format(len(stream), len(captured)))
+
+	best = None
+	for iteration in range(args.repeat):
+		streamParser = nmeaParser()
+		start = time.time()
+		for record in streamParser.parseStream(stream):
+			pass
+		elapsed = time.time() - start
+		if (best is None or elapsed < best):
+			best = elapsed
+
+	rate = len(stream) / best
+	print("{:10.0f} sentences/s  ({} rejected)".format(rate, streamParser.rejectedSentences))
+	for recordType, count in sorted(streamParser.sentenceCounts.items(), key = lambda item: item[0].__name__):
+		print("  {:<12} {}".format(recordType.__name__, count))
+
+	if (rate < TARGET_RATE):
+		print("Below the target of {} sentences/s".format(TARGET_RATE))
+		return 1
+
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Compares radio loop latency of the legacy 0.75 s polling loop against the
+radioPortReader wait modes, over a pseudo-terminal loopback.
+
+Two latencies are measured for each mode:
+	inbound  - frame written to the "radio" side until the serial loop has read it
+	outbound - item queued by the "GUI" until the serial loop writes it out
+
+Usage: python benchmarks/bench_radio_latency.py [--samples N] [--modes legacy,blocking,select]
+
+POSIX only (needs pty) and pyserial.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import pty
+import time
+import random
+import select
+import argparse
+import threading
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import serial
+from radioReader import radioPortReader, READ_MODE_POLL, READ_MODE_BLOCKING, READ_MODE_SELECT
+
+
+class loopbackSerialLoop(threading.Thread):
+	def __init__(self, port, mode):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.port = port
+		self.mode = mode
+		self.reader = radioPortReader(READ_MODE_POLL if mode == "legacy" else mode)
+		self.reader.setPort(port)
+		self.outbound = deque()
+		self.received = {}
+		self.running = True
+
+	def queueOutbound(self, line):
+		self.outbound.append(line)
+		self.reader.wake()
+
+	# Mirrors the body of serialHandlerThread.run: service outbound items, then read
+	def run(self):
+		while (self.running):
+			while (len(self.outbound) > 0):
+				self.port.write(self.outbound.popleft())
+
+			serialInput = b""
+			if (self.mode == "legacy"):
+				if not (self.port.inWaiting()):
+					time.sleep(0.75)
+			elif not (self.reader.waitForInput()):
+				continue
+			else:
+				serialInput = self.reader.takePendingInput()
+				if (serialInput[-1:] not in (b"", b"\n")):
+					serialInput += self.port.readline()
+
+			while (self.port.inWaiting()):
+				serialInput += self.port.readline()
+
+			now = time.time()
+			for line in serialInput.split(b"\n"):
+				if (line.startswith(b"hab,data,")):
+					self.received[int(line.split(b",")[2])] = now
+
+		self.reader.close()
+
+
+def percentile(values, fraction):
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(name, latencies):
+	if (len(latencies) == 0):
+		return "{:<10} no samples".format(name)
+
+	latencies = [value * 1000.0 for value in latencies]
+	return "{:<10} mean {:7.2f} ms  p50 {:7.2f} ms  p95 {:7.2f} ms  max {:7.2f} ms".format(
+		name,
+		sum(latencies) / len(latencies),
+		percentile(latencies, 0.5),
+		percentile(latencies, 0.95),
+		max(latencies))
+
+
+def runMode(mode, samples):
+	master, slave = pty.openpty()
+	port = serial.Serial(os.ttyname(slave), 38400, timeout = 1)
+	loop = loopbackSerialLoop(port, mode)
+	loop.start()
+
+	inboundLatency = []
+	outboundLatency = []
+	outboundSent = {}
+	outboundSeen = {}
+	masterBuffer = b""
+
+	for sample in range(samples):
+		time.sleep(random.uniform(0.02, 0.2))
+
+		if (sample % 2 == 0):
+			sentTime = time.time()
+			os.write(master, "hab,data,{},,,,36.2,33.2,39.2,11.0,37.3,152,126,130,0,END_TX\n".format(sample).encode("ascii"))
+			deadline = sentTime + 3
+			while (sample not in loop.received and time.time() < deadline):
+				time.sleep(0.0005)
+			if (sample in loop.received):
+				inboundLatency.append(loop.received[sample] - sentTime)
+		else:
+			outboundSent[sample] = time.time()
+			loop.queueOutbound("chase1,chat,{},END_TX\n".format(sample).encode("ascii"))
+			deadline = outboundSent[sample] + 3
+			while (sample not in outboundSeen and time.time() < deadline):
+				if (len(select.select([master], [], [], 0.01)[0]) > 0):
+					masterBuffer += os.read(master, 4096)
+					while (b"\n" in masterBuffer):
+						line, masterBuffer = masterBuffer.split(b"\n", 1)
+						outboundSeen[int(line.split(b",")[2])] = time.time()
+			if (sample in outboundSeen):
+				outboundLatency.append(outboundSeen[sample] - outboundSent[sample])
+
+	loop.running = False
+	loop.join(2)
+	port.close()
+	os.close(master)
+
+	return inboundLatency, outboundLatency
+
+
+def main():
+	parser = argparse.ArgumentParser(description = __doc__.strip().split("\n")[0])
+	parser.add_argument("--samples", type = int, default = 40)
+	parser.add_argument("--modes", default = ",".join(["legacy", READ_MODE_BLOCKING, READ_MODE_SELECT]))
+	args = parser.parse_args()
+
+	for mode in args.modes.split(","):
+		inboundLatency, outboundLatency = runMode(mode, args.samples)
+		print(mode)
+		print("  " + summarize("inbound", inboundLatency))
+		print("  " + summarize("outbound", outboundLatency))
+
+
+if __name__ == "__main__":
+	main()
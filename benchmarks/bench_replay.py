@@ -0,0 +1,87 @@
+"""
+Replays recorded logs through the headless telemetryCore and reports how fast
+frames get through the radio loop (decoder, dispatcher, logs and archive).
+
+With --speed 0 the frames are replayed as fast as the loop takes them, which
+gives the pipeline's throughput. With e.g. --speed 10 the report shows how
+closely playback kept to the recorded timing.
+
+Runs in a temporary directory, so the station's own logs are not touched.
+
+Usage: python benchmarks/bench_replay.py [LOG ...] [--speed X] [--start-offset S] [--limit S]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import logger
+from telemetryCore import telemetryCore
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Replay throughput benchmark")
+	parser.add_argument("logs", nargs = "*", default = [os.path.join(ROOT, "Old Logs", "MoGS_radio_log (2).txt")])
+	parser.add_argument("--speed", type = float, default = 0, help = "replay speed, 0 for as fast as possible")
+	parser.add_argument("--start-offset", type = float, default = 0)
+	parser.add_argument("--limit", type = float, default = 30, help = "stop after this many wall clock seconds")
+	args = parser.parse_args()
+
+	logs = [os.path.abspath(fileName) for fileName in args.logs]
+	directory = tempfile.mkdtemp()
+	workingDirectory = os.getcwd()
+	os.chdir(directory)
+
+	try:
+		core = telemetryCore()
+		core.TEST_MODE = True
+		core.REPLAY_LOG_FILES = logs
+		core.REPLAY_SPEED = args.speed if args.speed > 0 else None
+		core.REPLAY_START_OFFSET = args.start_offset
+		core.GPS_SERIAL_PORT = None
+
+		coreThread = threading.Thread(target = core.run)
+		coreThread.daemon = True
+		startTime = time.time()
+		coreThread.start()
+
+		while (core.radioSerial is None):
+			time.sleep(0.01)
+		port = core.radioSerial
+
+		while (time.time() - startTime < args.limit and
+				not (port.finished and port.inWaiting() == 0)):
+			time.sleep(0.01)
+
+		# Let the loop dispatch what it last read
+		time.sleep(0.1)
+		elapsed = time.time() - startTime - 0.1
+
+		core.stop()
+		coreThread.join(5)
+		logger.stopLogWriter()
+
+		dispatched = core.messageDispatcher.framesDispatched
+		print("{} frames replayed, {} dispatched in {:.2f} s ({:.0f} frames/s)".format(
+			port.framesReplayed, dispatched, elapsed, dispatched / elapsed))
+		print("recorded time covered {:.0f} s".format(port.position - port.playedFrom))
+		if (core.REPLAY_SPEED is not None and elapsed > 0):
+			print("effective speed {:.2f}x (asked for {:.2f}x)".format(
+				(port.position - port.playedFrom) / elapsed, args.speed))
+		if not (port.finished):
+			print("stopped at the {:.0f} s limit".format(args.limit))
+	finally:
+		os.chdir(workingDirectory)
+		shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+	main()
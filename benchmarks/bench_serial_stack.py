@@ -0,0 +1,134 @@
+"""
+Finds the highest balloon frame rate the station keeps up with over real
+serial ports, using the pty simulators in radioSimulator.py.
+
+For each rate the headless telemetryCore is started against a simulated radio
+(balloon data at the rate under test, two chase vehicles at 1 Hz, heartbeats,
+acks) and a simulated GPS at 1 Hz, in a temporary directory. After --duration
+seconds the simulator stops sending and the station gets --drain seconds to
+catch up. A rate is sustained if the simulator sent on schedule and the
+station received every balloon frame that was not lost or corrupted on the
+link (a corrupted frame may still get through, so received can be higher).
+Rates are doubled until one is not sustained.
+
+Usage: python benchmarks/bench_serial_stack.py [--start-rate HZ] [--max-rate HZ] [--duration S]
+                                               [--loss P] [--corrupt P] [--split P]
+
+POSIX only (needs pty) and pyserial. The station code is Python 2.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import logger
+from telemetryCore import telemetryCore
+from radioSimulator import radioSimulator, gpsSimulator, linkImpairments
+
+# The simulator may run this far behind its schedule and still count as on time
+MAX_SEND_LAG = 0.5
+
+
+def runRate(rate, args):
+	radio = radioSimulator(rate, impairments = linkImpairments(args.loss, args.corrupt, args.split, seed = 1))
+	gps = gpsSimulator(1.0)
+
+	core = telemetryCore()
+	core.RADIO_SERIAL_PORT = radio.portName
+	core.GPS_SERIAL_PORT = gps.portName
+
+	received = [0]
+	def countBalloonData(payload):
+		received[0] += 1
+	core.subscribe("balloonData", countBalloonData)
+
+	coreThread = threading.Thread(target = core.run)
+	coreThread.daemon = True
+	coreThread.start()
+
+	# Let the station open its ports before the network starts talking
+	time.sleep(0.5)
+	radio.start()
+	gps.start()
+
+	time.sleep(args.duration)
+	radio.pauseSending()
+	sent = radio.getFramesOffered("hab,data")
+	expected = radio.getFramesIntact("hab,data")
+
+	drainStart = time.time()
+	while (received[0] < expected and time.time() - drainStart < args.drain):
+		time.sleep(0.01)
+	drainTime = time.time() - drainStart
+
+	result = {"rate" : rate,
+			"sent" : sent,
+			"expected" : expected,
+			"received" : received[0],
+			"drainTime" : drainTime,
+			"sendLag" : radio.maxLag,
+			"acks" : radio.acksSent,
+			"discarded" : core.radioFrameDecoder.bytesDiscarded,
+			"gpsFix" : core.gpsHandler.getLatestFix() is not None}
+
+	core.stop()
+	coreThread.join(5)
+	radio.stop()
+	gps.stop()
+
+	return result
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Serial stack frame rate benchmark")
+	parser.add_argument("--start-rate", type = float, default = 25.0, help = "first balloon frame rate, frames per second")
+	parser.add_argument("--max-rate", type = float, default = 102400.0)
+	parser.add_argument("--duration", type = float, default = 5.0, help = "seconds per rate")
+	parser.add_argument("--drain", type = float, default = 2.0, help = "seconds the station gets to catch up")
+	parser.add_argument("--loss", type = float, default = 0.0)
+	parser.add_argument("--corrupt", type = float, default = 0.0)
+	parser.add_argument("--split", type = float, default = 0.0)
+	args = parser.parse_args()
+
+	directory = tempfile.mkdtemp()
+	workingDirectory = os.getcwd()
+	os.chdir(directory)
+
+	try:
+		print("{:>8} {:>8} {:>8} {:>8} {:>9} {:>9} {:>10}".format(
+			"rate", "sent", "expected", "received", "drain s", "lag s", "discarded"))
+
+		bestRate = None
+		rate = args.start_rate
+		while (rate <= args.max_rate):
+			result = runRate(rate, args)
+			print("{rate:8.0f} {sent:8d} {expected:8d} {received:8d} {drainTime:9.3f} {sendLag:9.3f} {discarded:10d}".format(**result))
+			sys.stdout.flush()
+
+			if (result["received"] < result["expected"] or result["sendLag"] > MAX_SEND_LAG or
+				result["sent"] < rate * args.duration * 0.9):
+				break
+
+			bestRate = rate
+			rate *= 2
+
+		logger.stopLogWriter()
+
+		if (bestRate is None):
+			print("no rate sustained")
+		else:
+			print("sustained {:.0f} balloon frames/s".format(bestRate))
+	finally:
+		os.chdir(workingDirectory)
+		shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+	main()
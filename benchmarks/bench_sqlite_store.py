@@ -0,0 +1,126 @@
+"""
+Sustained insert benchmark for telemetryDatabase.
+
+Feeds a mix of balloon data, chase positions, acks and chat at a fixed frame
+rate for a fixed time, as the radio thread would, and reports:
+	- caller cost of addFrame() per frame
+	- frames stored, commits and the largest queue depth seen
+	- latency of the example flight queries while the writer is busy
+A per-frame autocommit baseline (one INSERT and commit per frame, rollback
+journal) is run for comparison.
+
+Usage: python benchmarks/bench_sqlite_store.py [--rate FRAMES_PER_S] [--duration S]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from telemetryDatabase import telemetryDatabase
+
+QUERIES = [("max altitude", "SELECT max(altitude) FROM hab_data", ()),
+			("last chase2 fix", "SELECT * FROM chase2_data ORDER BY receivedTime DESC LIMIT 1", ()),
+			("errors since t", "SELECT receivedTime, errors FROM hab_data WHERE receivedTime > ? AND errors > 0", None)]
+
+
+def generateFrame(index):
+	kind = index % 8
+	if (kind < 4):
+		return "hab,data,{:06d},36.{:05d},-121.87775,{:.1f},21.3,-34.2,19.8,11.0,40.1,0.02,0.01,0.98,{}".format(
+			index % 240000, index % 100000, index * 0.5, index % 3)
+	if (kind < 7):
+		return "chase{},data,{:06d}.000,36.91{:02d},-121.3602".format(kind - 3, index % 240000, index % 100)
+	if (index % 16 == 7):
+		return "hab,ack,SNAPSHOT_UPDATE,5,30"
+	return "chase1,chat,on our way to the landing site"
+
+
+def runDatabase(fileName, rate, duration):
+	database = telemetryDatabase(fileName)
+	database.start()
+
+	callerTime = 0.0
+	maxDepth = 0
+	queryTimes = dict([(name, []) for name, statement, parameters in QUERIES])
+	startTime = time.time()
+	index = 0
+
+	while (time.time() - startTime < duration):
+		# Send every frame that is due, then sleep until the next one
+		due = int((time.time() - startTime) * rate)
+		while (index < due):
+			callStart = time.time()
+			database.addFrame(generateFrame(index))
+			callerTime += time.time() - callStart
+			index += 1
+
+		maxDepth = max(maxDepth, len(database.pendingFrames))
+
+		if (index % 500 < 8 and database.commits > 0):
+			for name, statement, parameters in QUERIES:
+				queryStart = time.time()
+				database.query(statement, parameters if parameters is not None else (startTime,))
+				queryTimes[name].append(time.time() - queryStart)
+
+		time.sleep(0.001)
+
+	stopStart = time.time()
+	database.stop()
+	drainTime = time.time() - stopStart
+
+	return index, callerTime, maxDepth, queryTimes, drainTime, database
+
+
+def runAutocommit(fileName, count):
+	connection = sqlite3.connect(fileName, isolation_level = None)
+	connection.execute("CREATE TABLE frames (receivedTime REAL, callsign TEXT, type TEXT, payload TEXT)")
+
+	startTime = time.time()
+	for index in range(count):
+		fields = generateFrame(index).split(",", 2)
+		connection.execute("INSERT INTO frames VALUES (?, ?, ?, ?)", (time.time(), fields[0], fields[1], fields[2]))
+	elapsed = time.time() - startTime
+
+	connection.close()
+	return elapsed
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "SQLite telemetry store benchmark")
+	parser.add_argument("--rate", type = float, default = 2000.0, help = "frames per second offered")
+	parser.add_argument("--duration", type = float, default = 10.0, help = "seconds")
+	parser.add_argument("--baseline-frames", type = int, default = 2000)
+	args = parser.parse_args()
+
+	directory = tempfile.mkdtemp()
+	try:
+		sent, callerTime, maxDepth, queryTimes, drainTime, database = runDatabase(
+			os.path.join(directory, "telemetry.db"), args.rate, args.duration)
+
+		print("telemetryDatabase: {} frames offered at {:.0f}/s for {:.0f} s".format(sent, args.rate, args.duration))
+		print("  addFrame     {:7.2f} us/frame".format(callerTime / max(1, sent) * 1e6))
+		print("  stored       {} frames in {} commits, {} dropped, {} invalid".format(
+			database.framesStored, database.commits, database.droppedFrames, database.invalidFrames))
+		print("  queue depth  max {} frames, drained {:.3f} s after the last frame".format(maxDepth, drainTime))
+		for name, statement, parameters in QUERIES:
+			samples = queryTimes[name]
+			if (len(samples) > 0):
+				print("  query {:<16} mean {:7.3f} ms  max {:7.3f} ms".format(
+					name, sum(samples) / len(samples) * 1000, max(samples) * 1000))
+
+		elapsed = runAutocommit(os.path.join(directory, "autocommit.db"), args.baseline_frames)
+		print("autocommit baseline: {:.0f} frames/s ({:.2f} ms per frame on the caller)".format(
+			args.baseline_frames / elapsed, elapsed / args.baseline_frames * 1000))
+	finally:
+		shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,162 @@
+"""
+Compares redrawing the offline plot from the old per-vehicle lists with
+redrawing it from trackStore's decimated display points as a flight goes on.
+
+A synthetic balloon track (a drifting ascent with wind shear wiggles) and
+three chase tracks get --rate points per second each for --hours. At each
+tenth of the flight the report shows, per redraw of all four vehicles, the
+time for the old updatePlot's work (turning every stored point of both
+lists into arrays, as PlotDataItem does), the mean cost of
+getDisplayPoints() for all four vehicles after every point as the GUI
+redraws ("redraw"), a from-scratch decimation of every track ("full") and
+getDisplayPoints() zoomed to the last tenth of the balloon's path. It also shows the points drawn, the worst
+distance in metres between the balloon's full track and its drawn line,
+against that of a from-scratch decimation, and the process RSS.
+
+The old lists grow without bound; trackStore holds at most --capacity points
+per vehicle, and with --spill the rest goes to a file in a temporary
+directory, which is read back at the end to show the full track survives.
+
+Usage: python benchmarks/bench_track_store.py [--hours H] [--rate HZ] [--max-points N] [--capacity N] [--spill]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import math
+import shutil
+import argparse
+import tempfile
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from trackStore import trackStore, decimateTrack
+
+timer = getattr(time, "perf_counter", time.time)
+
+CALLSIGNS = ["hab", "chase1", "chase2", "chase3"]
+METRES_PER_DEGREE = 111320.0
+
+
+def getResidentBytes():
+	try:
+		with open("/proc/self/statm") as statm:
+			return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except:
+		return 0
+
+
+def makePosition(vehicle, seconds):
+	drift = seconds / 3600.0
+	latitude = 36.86 + 0.05 * drift + 0.002 * math.sin(seconds / 90.0 + vehicle)
+	longitude = -121.04 + 0.08 * drift + 0.002 * math.cos(seconds / 130.0 + vehicle) + 0.01 * vehicle
+	return latitude, longitude, 30000.0 * min(drift, 1.0)
+
+
+# Worst distance of the full track from the drawn line through the points at
+# drawnIndices, in metres, measured at each full resolution point the line
+# spans (once the ring has wrapped, the drawn line can start a few points
+# after the oldest point held, until the next decimation)
+def getWorstError(latitudes, longitudes, drawnIndices):
+	scale = math.cos(math.radians(numpy.mean(latitudes)))
+	everyIndex = numpy.arange(drawnIndices[0], drawnIndices[-1] + 1)
+	lineLatitudes = numpy.interp(everyIndex, drawnIndices, latitudes[drawnIndices])
+	lineLongitudes = numpy.interp(everyIndex, drawnIndices, longitudes[drawnIndices])
+	error = numpy.hypot(latitudes[everyIndex] - lineLatitudes, (longitudes[everyIndex] - lineLongitudes) * scale)
+	return float(error.max()) * METRES_PER_DEGREE
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Vehicle track store benchmark")
+	parser.add_argument("--hours", type = float, default = 6.0)
+	parser.add_argument("--rate", type = float, default = 1.0, help = "points per second per vehicle")
+	parser.add_argument("--max-points", type = int, default = 300, help = "points drawn per vehicle")
+	parser.add_argument("--capacity", type = int, default = 50000, help = "points held per vehicle")
+	parser.add_argument("--spill", action = "store_true", help = "spill points out of the ring to disk")
+	args = parser.parse_args()
+
+	spillDirectory = None
+	if (args.spill):
+		spillDirectory = tempfile.mkdtemp(prefix = "bench_track_store")
+
+	tracks = trackStore(args.capacity, spillDirectory)
+	locationLists = dict([(callsign, [[], []]) for callsign in CALLSIGNS])
+
+	totalPoints = int(args.hours * 3600 * args.rate)
+	sampleInterval = max(1, totalPoints // 10)
+	appendTime = 0.0
+	redrawTime = 0.0
+
+	print("{:>8} {:>9} {:>8} {:>9} {:>8} {:>8} {:>6} {:>8} {:>8} {:>7}".format("points", "append us", "old ms",
+			"redraw ms", "full ms", "zoom ms", "drawn", "error m", "full err", "RSS MB"))
+
+	try:
+		for index in range(totalPoints):
+			seconds = index / args.rate
+
+			appendStart = timer()
+			for vehicle, callsign in enumerate(CALLSIGNS):
+				latitude, longitude, altitude = makePosition(vehicle, seconds)
+				tracks.append(callsign, seconds, latitude, longitude, altitude)
+			appendTime += timer() - appendStart
+
+			redrawStart = timer()
+			for callsign, track in tracks.items():
+				track.getDisplayPoints(args.max_points)
+			redrawTime += timer() - redrawStart
+
+			for vehicle, callsign in enumerate(CALLSIGNS):
+				latitude, longitude, altitude = makePosition(vehicle, seconds)
+				locationLists[callsign][0].append(latitude)
+				locationLists[callsign][1].append(longitude)
+
+			if ((index + 1) % sampleInterval != 0):
+				continue
+
+			oldStart = timer()
+			for callsign, value in locationLists.items():
+				numpy.array(value[0], dtype = float)
+				numpy.array(value[1], dtype = float)
+			oldTime = timer() - oldStart
+
+			fullStart = timer()
+			for callsign, track in tracks.items():
+				times, latitudes, longitudes, altitudes = track.getColumns()
+				decimateTrack(latitudes, longitudes, args.max_points)
+			fullTime = timer() - fullStart
+
+			drawn = 0
+			for callsign, track in tracks.items():
+				drawn += len(track.getDisplayPoints(args.max_points)[0])
+
+			habTrack = tracks.getTrack("hab")
+			times, latitudes, longitudes, altitudes = habTrack.getColumns()
+			recent = len(latitudes) // 10
+			bounds = (latitudes[-recent:].min(), latitudes[-recent:].max(), longitudes[-recent:].min(), longitudes[-recent:].max())
+			zoomStart = timer()
+			habTrack.getDisplayPoints(args.max_points, bounds)
+			zoomTime = timer() - zoomStart
+
+			fullError = getWorstError(latitudes, longitudes, decimateTrack(latitudes, longitudes, args.max_points))
+			overviewIndices = habTrack.overviewNumbers - (habTrack.totalPoints - len(habTrack))
+			overviewError = getWorstError(latitudes, longitudes, overviewIndices)
+
+			print("{:8d} {:9.2f} {:8.2f} {:9.3f} {:8.2f} {:8.2f} {:6d} {:8.1f} {:8.1f} {:7.1f}".format(index + 1,
+					appendTime / (index + 1) / len(CALLSIGNS) * 1e6, oldTime * 1e3, redrawTime / (index + 1) * 1e3,
+					fullTime * 1e3, zoomTime * 1e3, drawn, overviewError, fullError, getResidentBytes() / 1e6))
+			sys.stdout.flush()
+
+		if (spillDirectory is not None):
+			fullTrack = tracks.getTrack("hab").getFullTrack()
+			print("full hab track: {} points, {} spilled to disk".format(len(fullTrack), tracks.getTrack("hab").spilledPoints))
+	finally:
+		tracks.close()
+		if (spillDirectory is not None):
+			shutil.rmtree(spillDirectory)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,131 @@
+"""
+Simulated-link benchmark for txScheduler.
+
+Drives a virtual radio link with position frames, heartbeats, commands, acks
+and bursts of 180 character chat messages, and reports the queueing delay per
+priority class for:
+	fifo      - frames written in arrival order, as radioSerialOutput used to
+	scheduler - txScheduler priority classes, token bucket and coalescing
+
+Usage: python benchmarks/bench_tx_scheduler.py [--air-rate BPS] [--chat-rate PER_S] [--duration S]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import random
+import argparse
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from txScheduler import txScheduler, getMessagePriority, PRIORITY_NAMES, BITS_PER_BYTE
+
+TICK = 0.001
+
+
+class virtualClock(object):
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+
+# Returns (time, line) for every frame the ground station wants to send
+def generateTraffic(duration, chatRate, seed):
+	generator = random.Random(seed)
+	events = []
+
+	for second in range(int(duration)):
+		events.append((second + 0.0, "data,{:06d},36.59249,-121.87775".format(second)))
+		if (second % 5 == 0):
+			events.append((second + 0.001, "alive"))
+		if (second % 10 == 3):
+			events.append((second + generator.random(), "cmd,SNAPSHOT,5,30"))
+		if (second % 7 == 2):
+			events.append((second + generator.random(), "ack,SNAPSHOT_UPDATE,5,30"))
+
+	chatTime = 0.0
+	while (chatTime < duration):
+		chatTime += generator.expovariate(chatRate)
+		for message in range(generator.randint(1, 4)):
+			events.append((chatTime + message * 0.01, "chat," + "x" * 180))
+
+	events.sort(key = lambda event: event[0])
+	return events
+
+
+def percentile(values, fraction):
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def simulateFifo(events, bytesPerSecond):
+	delays = dict([(name, []) for name in PRIORITY_NAMES])
+	linkFreeTime = 0.0
+
+	for queuedTime, line in events:
+		frame = "chase1," + line + ",END_TX\n"
+		startTime = max(queuedTime, linkFreeTime)
+		linkFreeTime = startTime + len(frame) / bytesPerSecond
+		delays[PRIORITY_NAMES[getMessagePriority(line)]].append(startTime - queuedTime)
+
+	return delays, 0
+
+
+def simulateScheduler(events, bytesPerSecond, duration):
+	clock = virtualClock()
+	scheduler = txScheduler(bytesPerSecond * BITS_PER_BYTE, burstBytes = 256, clock = clock)
+	delays = dict([(name, []) for name in PRIORITY_NAMES])
+	pending = deque(events)
+
+	# Keep ticking after the last event until the queues drain
+	while (len(pending) > 0 or scheduler.getQueueDepth() > 0):
+		while (len(pending) > 0 and pending[0][0] <= clock.now):
+			queuedTime, line = pending.popleft()
+			scheduler.enqueue(line, "chase1," + line + ",END_TX\n")
+
+		item = scheduler.getNextFrame()
+		while (item is not None):
+			delays[PRIORITY_NAMES[item.priority]].append(clock.now - item.queuedTime)
+			item = scheduler.getNextFrame()
+
+		clock.now += TICK
+		if (clock.now > duration * 10):
+			break
+
+	return delays, scheduler.framesCoalesced
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Transmit scheduler benchmark")
+	parser.add_argument("--air-rate", type = float, default = 9600.0,
+						help = "bits per second the radios actually carry")
+	parser.add_argument("--chat-rate", type = float, default = 0.6, help = "chat bursts per second")
+	parser.add_argument("--duration", type = float, default = 120, help = "simulated seconds")
+	parser.add_argument("--seed", type = int, default = 1)
+	args = parser.parse_args()
+
+	bytesPerSecond = args.air_rate / BITS_PER_BYTE
+	events = generateTraffic(args.duration, args.chat_rate, args.seed)
+	offered = sum([len("chase1," + line + ",END_TX\n") for queuedTime, line in events]) / args.duration
+	print("{} frames, offered load {:.0f} B/s on a {:.0f} B/s link".format(len(events), offered, bytesPerSecond))
+
+	for name, (delays, coalesced) in (("fifo", simulateFifo(events, bytesPerSecond)),
+									("scheduler", simulateScheduler(events, bytesPerSecond, args.duration))):
+		print("{} ({} frames coalesced)".format(name, coalesced))
+		for className in PRIORITY_NAMES:
+			samples = delays[className]
+			if (len(samples) == 0):
+				continue
+			print("  {:<10} {:5d} sent  p50 {:8.1f} ms  p95 {:8.1f} ms  max {:8.1f} ms".format(
+				className,
+				len(samples),
+				percentile(samples, 0.5) * 1000,
+				percentile(samples, 0.95) * 1000,
+				max(samples) * 1000))
+
+
+if __name__ == "__main__":
+	main()
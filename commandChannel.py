@@ -0,0 +1,109 @@
+import time
+from collections import deque
+
+"""
+Command channel from the GUI thread to the serial thread.
+
+The GUI puts typed command objects on the channel instead of setting flag
+fields on the serial thread. put() wakes the serial loop so the command is
+handled right away rather than after its next read timeout. The channel is a
+deque, whose append() and popleft() are atomic, so neither side takes a lock.
+"""
+class serialCommand(object):
+	def __init__(self):
+		self.queuedTime = None
+
+
+class releaseBalloonCommand(serialCommand):
+	pass
+
+
+class resetBalloonReleaseCommand(serialCommand):
+	pass
+
+
+class armBalloonReleaseCommand(serialCommand):
+	pass
+
+
+class disarmBalloonReleaseCommand(serialCommand):
+	pass
+
+
+class diskSpaceRequestCommand(serialCommand):
+	pass
+
+
+class snapshotRequestCommand(serialCommand):
+	def __init__(self, burst, interval):
+		serialCommand.__init__(self)
+		self.burst = burst
+		self.interval = interval
+
+
+class chatMessageCommand(serialCommand):
+	def __init__(self, message):
+		serialCommand.__init__(self)
+		self.message = message
+
+
+class openRadioPortCommand(serialCommand):
+	def __init__(self, portName):
+		serialCommand.__init__(self)
+		self.portName = portName
+
+
+class openGpsPortCommand(serialCommand):
+	def __init__(self, portName):
+		serialCommand.__init__(self)
+		self.portName = portName
+
+
+class commandLatencyStatistics(object):
+	def __init__(self):
+		self.count = 0
+		self.totalLatency = 0.0
+		self.maxLatency = 0.0
+		self.lastLatency = None
+
+	def addSample(self, latency):
+		self.count += 1
+		self.totalLatency += latency
+		self.lastLatency = latency
+		if (latency > self.maxLatency):
+			self.maxLatency = latency
+
+	def getMeanLatency(self):
+		if (self.count == 0):
+			return None
+		return self.totalLatency / self.count
+
+
+class commandChannel(object):
+	# wakeFunction is called after every put, e.g. serialHandlerThread.wakeUp
+	def __init__(self, wakeFunction = None, clock = time.time):
+		self.commands = deque()
+		self.wakeFunction = wakeFunction
+		self.clock = clock
+		self.latencyStatistics = commandLatencyStatistics()
+
+	def put(self, command):
+		command.queuedTime = self.clock()
+		self.commands.append(command)
+
+		if (self.wakeFunction is not None):
+			self.wakeFunction()
+
+	# Returns the oldest command, or None if the channel is empty
+	def get(self):
+		try:
+			return self.commands.popleft()
+		except IndexError:
+			return None
+
+	# Records how long a command took from put() to being acted on
+	def commandCompleted(self, command):
+		self.latencyStatistics.addSample(self.clock() - command.queuedTime)
+
+	def __len__(self):
+		return len(self.commands)
@@ -0,0 +1,139 @@
+import time
+
+"""
+Tracks balloon commands until the balloon acknowledges them.
+
+Each "cmd,*" sent gets an outstandingCommand record. Retries are scheduled by
+deadline and sent from the serial loop through serviceRetries(), so the loop
+keeps receiving while a command is outstanding and the retries stop as soon
+as the matching ack arrives.
+"""
+# Command name -> prefixes of the ack messages that complete it
+COMMAND_ACKS = {"SSAG_RELEASE_BALLOON" : ("BRM_ACTIVATED",),
+				"ARM_BRM"              : ("BRM_ARMED",),
+				"DISARM_BRM"           : ("BRM_DISARMED",),
+				"RESET_BRM"            : ("BRM_RESET",),
+				"SNAPSHOT"             : ("SNAPSHOT_UPDATE",),
+				"DISK_SPACE"           : ("DISK",)}
+
+
+class outstandingCommand(object):
+	def __init__(self, command, expectedAcks, maxAttempts, retryInterval, sentTime):
+		self.command = command
+		self.name = command.split(",", 1)[0]
+		self.expectedAcks = expectedAcks
+		self.maxAttempts = maxAttempts
+		self.retryInterval = retryInterval
+		self.attempts = 1
+		self.firstSentTime = sentTime
+		self.lastSentTime = sentTime
+		self.nextRetryTime = sentTime + retryInterval
+
+	def isAcknowledgedBy(self, message):
+		for ack in self.expectedAcks:
+			if (message[:len(ack)] == ack):
+				return True
+		return False
+
+
+class roundTripStatistics(object):
+	def __init__(self):
+		self.acknowledged = 0
+		self.timedOut = 0
+		self.retries = 0
+		self.totalRoundTrip = 0.0
+		self.minRoundTrip = None
+		self.maxRoundTrip = None
+		self.lastRoundTrip = None
+
+	def addRoundTrip(self, roundTrip):
+		self.acknowledged += 1
+		self.totalRoundTrip += roundTrip
+		self.lastRoundTrip = roundTrip
+
+		if (self.minRoundTrip is None or roundTrip < self.minRoundTrip):
+			self.minRoundTrip = roundTrip
+		if (self.maxRoundTrip is None or roundTrip > self.maxRoundTrip):
+			self.maxRoundTrip = roundTrip
+
+	def getMeanRoundTrip(self):
+		if (self.acknowledged == 0):
+			return None
+		return self.totalRoundTrip / self.acknowledged
+
+
+class commandTracker(object):
+	# sendFunction(line) puts "cmd,<command>" on the radio. timeoutHandler, if
+	# given, is called with the command once its last attempt goes unanswered
+	def __init__(self, sendFunction, timeoutHandler = None, clock = time.time):
+		self.sendFunction = sendFunction
+		self.timeoutHandler = timeoutHandler
+		self.clock = clock
+
+		self.outstanding = {}
+		self.statistics = {}
+
+	def getStatistics(self, name):
+		if (name not in self.statistics):
+			self.statistics[name] = roundTripStatistics()
+		return self.statistics[name]
+
+	# Sends a command such as "SNAPSHOT,5,30". Sending a command that is still
+	# outstanding replaces it and restarts its retries
+	def sendCommand(self, command, maxAttempts = 1, retryInterval = 2.0):
+		now = self.clock()
+		name = command.split(",", 1)[0]
+		expectedAcks = COMMAND_ACKS.get(name, ())
+
+		self.sendFunction("cmd," + command)
+
+		# Commands the balloon never acknowledges are fire and forget
+		if (len(expectedAcks) > 0):
+			self.outstanding[name] = outstandingCommand(command, expectedAcks, maxAttempts, retryInterval, now)
+
+	def isOutstanding(self, name):
+		return name in self.outstanding
+
+	# Completes the command an ack message answers. Returns its record, or None
+	# if nothing outstanding was waiting for this ack
+	def processAck(self, message):
+		for name, command in list(self.outstanding.items()):
+			if (command.isAcknowledgedBy(message)):
+				del self.outstanding[name]
+				self.getStatistics(name).addRoundTrip(self.clock() - command.lastSentTime)
+				return command
+
+		return None
+
+	# Resends commands whose retry is due and expires those out of attempts.
+	# Called from the serial loop on every pass
+	def serviceRetries(self):
+		if (len(self.outstanding) == 0):
+			return
+
+		now = self.clock()
+
+		for name, command in list(self.outstanding.items()):
+			if (now < command.nextRetryTime):
+				continue
+
+			if (command.attempts >= command.maxAttempts):
+				del self.outstanding[name]
+				self.getStatistics(name).timedOut += 1
+				if (self.timeoutHandler is not None):
+					self.timeoutHandler(command)
+				continue
+
+			command.attempts += 1
+			command.lastSentTime = now
+			command.nextRetryTime = now + command.retryInterval
+			self.getStatistics(name).retries += 1
+			self.sendFunction("cmd," + command.command)
+
+	# Seconds until the next retry or expiry is due, or None if nothing is outstanding
+	def getNextDeadline(self):
+		if (len(self.outstanding) == 0):
+			return None
+
+		nextRetryTime = min([command.nextRetryTime for command in self.outstanding.values()])
+		return max(0.0, nextRetryTime - self.clock())
@@ -0,0 +1,141 @@
+import time
+from collections import deque
+
+"""
+Fixed-capacity history for the radio console and balloon error windows.
+
+Entries go into a ring buffer (a bounded deque) of CONSOLE_CAPACITY lines;
+once it is full each new line replaces the oldest, so memory and the cost of
+an append stay flat over a whole flight. Every entry is also put in a ring
+per callsign, per message type and per (callsign, type), which is what a
+filtered view reads: switching filters or drawing a filtered view never
+rescans the history. The entry evicted from the main ring is the oldest in
+its filter rings too, so it leaves them at the same time.
+
+Radio input arrives in chunks that may end mid-frame, so addText() keeps the
+unfinished line until the rest arrives. The callsign and type of a line are
+its first two comma-separated fields.
+
+Has no Qt dependency; consoleModel.py puts a buffer behind a list view. Not
+thread safe, use it from the GUI thread.
+"""
+CONSOLE_CAPACITY = 5000
+ERROR_LOG_CAPACITY = 1000
+
+# Unfinished input is shown as a line of its own once it grows past this
+PARTIAL_LINE_LIMIT = 1024
+
+# Callsigns are letters and digits and types are words; lines starting with
+# anything else (a bare payload, line noise) are not indexed
+FIELD_LENGTH_LIMIT = 16
+
+
+def isCallsign(field):
+	return len(field) <= FIELD_LENGTH_LIMIT and field.isalnum()
+
+
+def isMessageType(field):
+	return len(field) <= FIELD_LENGTH_LIMIT and field.isalpha()
+
+
+EMPTY_VIEW = deque(maxlen = 0)
+
+
+class consoleEntry(object):
+	__slots__ = ["revision", "receivedTime", "callsign", "messageType", "text"]
+
+	def __init__(self, revision, receivedTime, callsign, messageType, text):
+		# Buffer revision the entry was added at; later entries have higher
+		self.revision = revision
+		self.receivedTime = receivedTime
+		self.callsign = callsign
+		self.messageType = messageType
+		self.text = text
+
+	def format(self):
+		return time.strftime("%H:%M:%S - ", time.localtime(self.receivedTime)) + self.text
+
+
+class consoleBuffer(object):
+	def __init__(self, capacity = CONSOLE_CAPACITY):
+		self.capacity = capacity
+		self.entries = deque(maxlen = capacity)
+
+		# (callsign, None), (None, type) and (callsign, type) -> deque of entries
+		self.filterIndex = {}
+
+		self.partialLine = ""
+
+		# Bumped on every change, so views can tell if they are out of date
+		self.revision = 0
+
+	def getFilterKeys(self, entry):
+		return ((entry.callsign, None), (None, entry.messageType), (entry.callsign, entry.messageType))
+
+	def addEntry(self, text, callsign = "", messageType = "", receivedTime = None):
+		if (receivedTime is None):
+			receivedTime = time.time()
+
+		if (len(self.entries) == self.capacity):
+			evicted = self.entries[0]
+			for key in self.getFilterKeys(evicted):
+				ring = self.filterIndex[key]
+				ring.popleft()
+				if (len(ring) == 0):
+					del self.filterIndex[key]
+
+		self.revision += 1
+		entry = consoleEntry(self.revision, receivedTime, callsign, messageType, text)
+		self.entries.append(entry)
+
+		for key in self.getFilterKeys(entry):
+			ring = self.filterIndex.get(key)
+			if (ring is None):
+				ring = self.filterIndex[key] = deque()
+			ring.append(entry)
+
+		return entry
+
+	# Adds raw radio traffic, one entry per line
+	def addText(self, text, receivedTime = None):
+		if not (isinstance(text, str)):
+			text = text.decode("latin-1")
+
+		lines = (self.partialLine + text).split("\n")
+		self.partialLine = lines.pop()
+		if (len(self.partialLine) > PARTIAL_LINE_LIMIT):
+			lines.append(self.partialLine)
+			self.partialLine = ""
+
+		for line in lines:
+			line = line.rstrip("\r")
+			if (len(line) == 0):
+				continue
+
+			fields = line.split(",", 2)
+			if (len(fields) > 1 and isCallsign(fields[0]) and isMessageType(fields[1])):
+				self.addEntry(line, fields[0], fields[1], receivedTime)
+			else:
+				self.addEntry(line, "", "", receivedTime)
+
+	def clear(self):
+		self.entries.clear()
+		self.filterIndex = {}
+		self.partialLine = ""
+		self.revision += 1
+
+	# Returns the entries matching the filter, oldest first, as a deque.
+	# None matches anything
+	def getEntries(self, callsign = None, messageType = None):
+		if (callsign is None and messageType is None):
+			return self.entries
+
+		return self.filterIndex.get((callsign, messageType), EMPTY_VIEW)
+
+	def getCallsigns(self):
+		return sorted([callsign for callsign, messageType in self.filterIndex
+					if messageType is None and callsign != ""])
+
+	def getMessageTypes(self):
+		return sorted([messageType for callsign, messageType in self.filterIndex
+					if callsign is None and messageType != ""])
@@ -0,0 +1,158 @@
+from PyQt4 import QtGui, QtCore
+
+"""
+List view over a consoleBuffer, used for the radio console and the balloon
+error log.
+
+The model reads rows straight out of the buffer's ring, newest first, and a
+QListView with uniform row heights only asks for the rows on screen, so the
+cost of drawing does not depend on how much history is kept. Appends only
+touch the buffer; refresh(), called from the GUI's refresh timer, brings the
+view up to date once per tick however many lines came in, and does nothing
+while the window is hidden. It tells the view which rows came in at the top
+and which were evicted at the bottom, so the scroll position and selection
+stay put; only a filter change resets the view.
+"""
+ALL_FILTER = "All"
+
+
+class consoleListModel(QtCore.QAbstractListModel):
+	def __init__(self, buffer, parent = None):
+		QtCore.QAbstractListModel.__init__(self, parent)
+		self.buffer = buffer
+		self.callsignFilter = None
+		self.messageTypeFilter = None
+		self.entries = list(buffer.getEntries())
+		self.shownRevision = buffer.revision
+
+	def rowCount(self, parent = QtCore.QModelIndex()):
+		if (parent.isValid()):
+			return 0
+		return len(self.entries)
+
+	# Row 0 is the newest entry
+	def data(self, index, role = QtCore.Qt.DisplayRole):
+		if (role != QtCore.Qt.DisplayRole or not index.isValid()):
+			return None
+
+		row = index.row()
+		if (row >= len(self.entries)):
+			return None
+		return self.entries[len(self.entries) - 1 - row].format()
+
+	# None shows everything
+	def setFilter(self, callsign, messageType):
+		self.beginResetModel()
+		self.callsignFilter = callsign
+		self.messageTypeFilter = messageType
+		self.entries = list(self.buffer.getEntries(callsign, messageType))
+		self.shownRevision = self.buffer.revision
+		self.endResetModel()
+
+	# The entries shown are a copy, taken here, so the view never sees the
+	# buffer change under it. Entries are in revision order, so the ones
+	# evicted since the last refresh are those older than the oldest now
+	# held, and the new ones those newer than the newest shown
+	def refresh(self):
+		if (self.shownRevision == self.buffer.revision):
+			return
+
+		entries = list(self.buffer.getEntries(self.callsignFilter, self.messageTypeFilter))
+		self.shownRevision = self.buffer.revision
+
+		evicted = len(self.entries)
+		if (len(entries) > 0):
+			evicted = 0
+			while (evicted < len(self.entries) and self.entries[evicted].revision < entries[0].revision):
+				evicted += 1
+
+		if (evicted > 0):
+			# The oldest entries are the last rows
+			rows = len(self.entries)
+			self.beginRemoveRows(QtCore.QModelIndex(), rows - evicted, rows - 1)
+			self.entries = self.entries[evicted:]
+			self.endRemoveRows()
+
+		added = len(entries) - len(self.entries)
+		if (added > 0):
+			self.beginInsertRows(QtCore.QModelIndex(), 0, added - 1)
+			self.entries = entries
+			self.endInsertRows()
+
+
+class consoleViewWidget(QtGui.QWidget):
+	def __init__(self, buffer, title, parent = None):
+		QtGui.QWidget.__init__(self, parent)
+		self.buffer = buffer
+		self.model = consoleListModel(buffer, self)
+
+		self.listView = QtGui.QListView()
+		self.listView.setModel(self.model)
+		self.listView.setUniformItemSizes(True)
+		self.listView.setMinimumSize(300, 200)
+
+		self.callsignComboBox = QtGui.QComboBox()
+		self.callsignComboBox.addItem(ALL_FILTER)
+		self.messageTypeComboBox = QtGui.QComboBox()
+		self.messageTypeComboBox.addItem(ALL_FILTER)
+		self.callsignComboBox.activated.connect(self.updateFilter)
+		self.messageTypeComboBox.activated.connect(self.updateFilter)
+
+		clearButton = QtGui.QPushButton("Clear")
+		clearButton.clicked.connect(self.clear)
+		closeButton = QtGui.QPushButton("Close")
+		closeButton.clicked.connect(self.close)
+
+		layout = QtGui.QGridLayout(self)
+		layout.setSpacing(0)
+		layout.addWidget(QtGui.QLabel("Callsign"), 0, 0)
+		layout.addWidget(self.callsignComboBox, 0, 1)
+		layout.addWidget(QtGui.QLabel("Type"), 0, 2)
+		layout.addWidget(self.messageTypeComboBox, 0, 3)
+		layout.addWidget(self.listView, 1, 0, 10, 5)
+		layout.addWidget(clearButton, 11, 1)
+		layout.addWidget(closeButton, 11, 3)
+
+		self.setLayout(layout)
+		self.setWindowTitle(title)
+
+	def getFilterValue(self, comboBox):
+		value = str(comboBox.currentText())
+		if (value == ALL_FILTER):
+			return None
+		return value
+
+	def updateFilter(self, *args):
+		self.model.setFilter(self.getFilterValue(self.callsignComboBox),
+							self.getFilterValue(self.messageTypeComboBox))
+
+	# Adds callsigns and types seen since the last refresh to the filters
+	def updateFilterChoices(self, comboBox, values):
+		if (comboBox.count() - 1 == len(values)):
+			return
+
+		for value in values:
+			if (comboBox.findText(value) < 0):
+				comboBox.addItem(value)
+
+	def clear(self):
+		self.buffer.clear()
+		self.callsignComboBox.setCurrentIndex(0)
+		self.messageTypeComboBox.setCurrentIndex(0)
+		while (self.callsignComboBox.count() > 1):
+			self.callsignComboBox.removeItem(1)
+		while (self.messageTypeComboBox.count() > 1):
+			self.messageTypeComboBox.removeItem(1)
+		self.updateFilter()
+
+	def refresh(self):
+		if not (self.isVisible()):
+			return
+
+		self.updateFilterChoices(self.callsignComboBox, self.buffer.getCallsigns())
+		self.updateFilterChoices(self.messageTypeComboBox, self.buffer.getMessageTypes())
+		self.model.refresh()
+
+	def showEvent(self, event):
+		QtGui.QWidget.showEvent(self, event)
+		self.refresh()
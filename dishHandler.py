@@ -2,15 +2,18 @@
 import socket
 from time import sleep
 from math import *
-from PyQt4 import QtGui, QtCore
 
 DISH = False
 DISH_ADDRESS = "192.168.101.98"
 DISH_PORT = 5003
 
-class dishHandlerThread(QtCore.QThread):
+# Drives the dish ACU over TCP. Has no Qt dependency so the headless ground
+# station can point the dish as well
+class dishHandlerThread(object):
 	def __init__(self):
-		QtCore.QThread.__init__(self)
+		# Positions handed to point() and move commands sent to the ACU
+		self.pointRequests = 0
+		self.moveCommands = 0
 
 		try:
 			self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -67,6 +70,8 @@ class dishHandlerThread(QtCore.QThread):
 
 	def point(self, az, el):
 
+		self.pointRequests += 1
+
 		# Update positions
 		self.new_az = az
 		self.new_el = el
@@ -106,6 +111,7 @@ class dishHandlerThread(QtCore.QThread):
 		if  az_err >= 0.5 or el_err >= 0.5:
 			try:
 				self.sock.send("AM%0.2f;EM%0.2f;\n" % (az, el))
+				self.moveCommands += 1
 				print("Pointing to %03d %03d" % (az, el))
 
 				# print("Sleeping %f" % max(az_err,el_err)*4 + 1)
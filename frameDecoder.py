@@ -0,0 +1,94 @@
+"""
+Incremental decoder for the ",END_TX\n" framing used on the radio link.
+
+Bytes are fed in whatever chunks the serial port hands back. Only complete
+frames are returned; a partial frame at the end of a chunk is kept in the
+buffer until the rest of it arrives on a later read.
+"""
+FRAME_TERMINATOR = b",END_TX\n"
+
+# A link that never sends a terminator should not grow the buffer forever
+MAX_BUFFER_SIZE = 65536
+
+
+class frameDecoder(object):
+	def __init__(self, terminator = FRAME_TERMINATOR, maxBufferSize = MAX_BUFFER_SIZE):
+		self.terminator = terminator
+		self.maxBufferSize = maxBufferSize
+		self.buffer = bytearray()
+
+		# Offset the next terminator search starts from, so bytes already
+		# scanned on an earlier feed() are not searched again
+		self.scanPosition = 0
+
+		self.framesDecoded = 0
+		self.bytesDiscarded = 0
+
+	# Appends a chunk and returns a list of the complete frames it finished,
+	# without the terminator
+	def feed(self, chunk):
+		frames = []
+
+		if (len(chunk) == 0):
+			return frames
+
+		if not (isinstance(chunk, (bytes, bytearray))):
+			chunk = chunk.encode("latin-1")
+
+		self.buffer.extend(chunk)
+
+		buffer = self.buffer
+		terminator = self.terminator
+		terminatorLength = len(terminator)
+		frameStart = 0
+		searchFrom = self.scanPosition
+
+		while (True):
+			frameEnd = buffer.find(terminator, searchFrom)
+			if (frameEnd < 0):
+				break
+
+			# Text before the last newline is a line that never got a terminator
+			# (a console echo, or the tail of a frame lost on the link). Drop it
+			# so it does not corrupt the frame that follows
+			lineStart = buffer.rfind(b"\n", frameStart, frameEnd) + 1
+			if (lineStart > frameStart):
+				self.bytesDiscarded += lineStart - frameStart
+			else:
+				lineStart = frameStart
+
+			frames.append(decodeText(bytes(buffer[lineStart:frameEnd])))
+			frameStart = frameEnd + terminatorLength
+			searchFrom = frameStart
+
+		if (frameStart > 0):
+			del buffer[:frameStart]
+
+		# Resume the next search where a terminator could still begin
+		self.scanPosition = max(0, len(buffer) - terminatorLength + 1)
+
+		if (len(buffer) > self.maxBufferSize):
+			self.bytesDiscarded += len(buffer)
+			del buffer[:]
+			self.scanPosition = 0
+
+		self.framesDecoded += len(frames)
+
+		return frames
+
+	# Returns whatever partial frame is still waiting for its terminator
+	def getPendingData(self):
+		return decodeText(bytes(self.buffer))
+
+	def reset(self):
+		del self.buffer[:]
+		self.scanPosition = 0
+
+
+# The rest of MoGS handles frames as native strings
+if (str is bytes):
+	def decodeText(data):
+		return data
+else:
+	def decodeText(data):
+		return data.decode("latin-1")
@@ -0,0 +1,143 @@
+import time
+import threading
+from collections import namedtuple
+
+import serial
+from nmeaParser import nmeaParser, ggaSentence, isValidFix
+
+"""
+Reads the GPS serial port continuously on its own thread.
+
+The latest valid fix is kept as an immutable gpsFix record and replaced with a
+single assignment, so the radio thread can read it at any time without locks
+and without touching the GPS port.
+"""
+class gpsFix(namedtuple("gpsFix", ["timestamp", "latitude", "longitude", "altitude",
+									"fixQuality", "receivedTime", "sentence"])):
+	__slots__ = ()
+
+	# Seconds since the sentence this fix came from was read off the port
+	def getAge(self):
+		return time.time() - self.receivedTime
+
+
+# Builds a gpsFix from a GGA record, or returns None if it has no valid lock
+def fixFromGga(record, sentence, receivedTime = None):
+	if not (isValidFix(record)):
+		return None
+
+	if (receivedTime is None):
+		receivedTime = time.time()
+
+	return gpsFix(record.timestamp[:6],
+				record.latitude,
+				record.longitude,
+				record.altitude,
+				record.fixQuality,
+				receivedTime,
+				sentence.strip())
+
+
+class gpsHandlerThread(threading.Thread):
+	def __init__(self, portName = None, baudrate = 4800, portErrorHandler = None):
+		threading.Thread.__init__(self)
+		self.daemon = True
+
+		self.portName = portName
+		self.baudrate = baudrate
+		self.gpsSerial = None
+		self.portChanged = True
+		self.running = True
+		self.RETRY_INTERVAL = 2
+
+		# Called with a message when the port cannot be opened or read
+		self.portErrorHandler = portErrorHandler
+
+		self.latestFix = None
+		self.parser = nmeaParser()
+		self.sentencesRead = 0
+		self.rejectedSentences = 0
+
+	# Requests that the worker (re)open the port on its next pass
+	def openPort(self, portName, baudrate = None):
+		self.portName = portName
+		if (baudrate is not None):
+			self.baudrate = baudrate
+		self.portChanged = True
+
+	# Returns the latest valid fix, or None if there is none younger than maxAge
+	def getLatestFix(self, maxAge = None):
+		fix = self.latestFix
+
+		if (fix is not None and maxAge is not None and fix.getAge() > maxAge):
+			return None
+
+		return fix
+
+	def stop(self):
+		self.running = False
+
+	def run(self):
+		while (self.running):
+			if (self.portChanged):
+				self.portChanged = False
+				self.reopenPort()
+
+			if (self.gpsSerial is None):
+				time.sleep(self.RETRY_INTERVAL)
+				continue
+
+			try:
+				line = self.gpsSerial.readline()
+			except:
+				self.reportPortError("GPS serial port is invalid")
+				self.closePort()
+				self.portChanged = True
+				time.sleep(self.RETRY_INTERVAL)
+				continue
+
+			if (len(line) > 0):
+				self.handleSentence(line)
+
+		self.closePort()
+
+	def handleSentence(self, line):
+		if not (isinstance(line, str)):
+			line = line.decode("ascii", "replace")
+
+		self.sentencesRead += 1
+		record = self.parser.parse(line)
+
+		if (record is None):
+			self.rejectedSentences += 1
+		elif (isinstance(record, ggaSentence)):
+			fix = fixFromGga(record, line)
+			if (fix is not None):
+				self.latestFix = fix
+
+	# Latest decoded RMC, VTG or GSA record, e.g. getLatestRecord(rmcSentence)
+	def getLatestRecord(self, recordType):
+		return self.parser.getLatest(recordType)
+
+	def reopenPort(self):
+		self.closePort()
+
+		if (self.portName is None):
+			return
+
+		try:
+			self.gpsSerial = serial.Serial(port = self.portName, baudrate = self.baudrate, timeout = 1)
+		except:
+			self.gpsSerial = None
+			self.reportPortError("GPS serial port cannot be opened")
+
+	def closePort(self):
+		try:
+			self.gpsSerial.close()
+		except:
+			pass
+		self.gpsSerial = None
+
+	def reportPortError(self, message):
+		if (self.portErrorHandler is not None):
+			self.portErrorHandler(message)
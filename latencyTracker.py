@@ -0,0 +1,333 @@
+import math
+import time
+import threading
+from collections import deque
+
+"""
+Per-frame latency instrumentation for the path from the radio to the screen.
+
+While enabled, each frame is stamped with a monotonic time as it goes:
+
+	arrival       radioSerialInput() sees bytes waiting on the port
+	decode        radioFrameDecoder has cut the frame out
+	emit          the core publishes the frame's first event
+	handlerStart  a GUI handler picks the event up, after the Qt signal hop
+	guiCommit     the handler has finished updating the window
+
+and the time between consecutive stamps goes into rolling histograms, per
+stage and per callsign:
+
+	decode    arrival -> decode        reading the port and decoding
+	dispatch  decode -> emit           dispatcher, archive, database queue
+	signal    emit -> handlerStart     waiting in the Qt event queue
+	handler   handlerStart -> guiCommit
+	total     arrival -> guiCommit
+
+Sections of a handler, such as evaluateJavaScript or dish pointing, are
+timed with measure(). Histograms cover the last LATENCY_WINDOW seconds.
+
+Events cross the signal hop with no room for a stamp, so each publish and
+each handler run of a tracked event is numbered, enabled or not, and a stamp
+waits in a queue under the number of its publish. Qt delivers queued signals
+in order, so handlerStarted() takes the stamp with its own number, if there
+is one: a handler for a signal queued before tracking was enabled, or whose
+stamp was pushed out of a full queue, gets None rather than another frame's
+stamp. Disabled, the hooks only count tracked events.
+"""
+LATENCY_STAGES = ["decode", "dispatch", "signal", "handler", "total"]
+
+# Rolling histograms cover this many seconds, in LATENCY_WINDOW_SLOTS steps
+LATENCY_WINDOW = 60.0
+LATENCY_WINDOW_SLOTS = 6
+
+# Buckets grow by a quarter octave from 1 us, so a percentile is within 19%
+HISTOGRAM_MINIMUM = 1e-6
+HISTOGRAM_BUCKETS_PER_OCTAVE = 4
+HISTOGRAM_BUCKETS = 112
+
+# Stamps waiting for their GUI handler, per event; older ones are dropped
+# and counted in droppedStamps
+PENDING_STAMP_LIMIT = 1024
+
+ALL_CALLSIGNS = "all"
+
+if (hasattr(time, "monotonic")):
+	monotonicTime = time.monotonic
+else:
+	# Python 2 has no monotonic clock; a step of the wall clock shows up as
+	# one odd sample
+	monotonicTime = time.time
+
+
+def getBucket(value):
+	if (value <= HISTOGRAM_MINIMUM):
+		return 0
+
+	bucket = int(math.log(value / HISTOGRAM_MINIMUM, 2) * HISTOGRAM_BUCKETS_PER_OCTAVE) + 1
+	return min(bucket, HISTOGRAM_BUCKETS - 1)
+
+
+# Upper edge of a bucket, in seconds
+def getBucketLimit(bucket):
+	return HISTOGRAM_MINIMUM * 2 ** (bucket / float(HISTOGRAM_BUCKETS_PER_OCTAVE))
+
+
+class rollingHistogram(object):
+	def __init__(self, window = LATENCY_WINDOW, slots = LATENCY_WINDOW_SLOTS):
+		self.slotLength = window / slots
+
+		# [slot number, bucket counts, count, max]
+		self.slots = [[None, None, 0, 0.0] for index in range(slots)]
+
+	def add(self, value, now):
+		slotNumber = int(now / self.slotLength)
+		slot = self.slots[slotNumber % len(self.slots)]
+
+		if (slot[0] != slotNumber):
+			slot[0] = slotNumber
+			slot[1] = [0] * HISTOGRAM_BUCKETS
+			slot[2] = 0
+			slot[3] = 0.0
+
+		slot[1][getBucket(value)] += 1
+		slot[2] += 1
+		if (value > slot[3]):
+			slot[3] = value
+
+	# Returns (count, p50, p95, p99, max) over the window, or None if empty
+	def getSummary(self, now):
+		oldestSlot = int(now / self.slotLength) - len(self.slots) + 1
+		counts = [0] * HISTOGRAM_BUCKETS
+		count = 0
+		maximum = 0.0
+
+		for slotNumber, slotCounts, slotCount, slotMax in self.slots:
+			if (slotNumber is None or slotNumber < oldestSlot):
+				continue
+
+			for bucket in range(HISTOGRAM_BUCKETS):
+				counts[bucket] += slotCounts[bucket]
+			count += slotCount
+			maximum = max(maximum, slotMax)
+
+		if (count == 0):
+			return None
+
+		percentiles = []
+		for fraction in (0.5, 0.95, 0.99):
+			target = fraction * count
+			seen = 0
+			for bucket in range(HISTOGRAM_BUCKETS):
+				seen += counts[bucket]
+				if (seen >= target):
+					percentiles.append(min(getBucketLimit(bucket), maximum))
+					break
+
+		return (count,) + tuple(percentiles) + (maximum,)
+
+
+class frameStamp(object):
+	__slots__ = ["callsign", "arrival", "decode", "emit", "handlerStart", "guiCommit"]
+
+	def __init__(self, callsign, arrival, decode):
+		self.callsign = callsign
+		self.arrival = arrival
+		self.decode = decode
+		self.emit = None
+		self.handlerStart = None
+		self.guiCommit = None
+
+
+class measuredSection(object):
+	def __init__(self, tracker, section, callsign):
+		self.tracker = tracker
+		self.section = section
+		self.callsign = callsign
+		self.startTime = None
+
+	def __enter__(self):
+		self.startTime = monotonicTime()
+		return self
+
+	def __exit__(self, exceptionType, exceptionValue, traceback):
+		now = monotonicTime()
+		self.tracker.record(self.section, self.callsign, now - self.startTime, now)
+		return False
+
+
+class unmeasuredSection(object):
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exceptionType, exceptionValue, traceback):
+		return False
+
+UNMEASURED = unmeasuredSection()
+
+
+class latencyTracker(object):
+	def __init__(self):
+		self.enabled = False
+		self.now = monotonicTime
+
+		# (stage or section, callsign) -> rollingHistogram
+		self.histograms = {}
+		self.histogramLock = threading.Lock()
+
+		# Stamp of the frame the core is handling; only used on its thread
+		self.currentFrame = None
+
+		# Event name -> (publish number, stamp) waiting for a GUI handler
+		self.pendingStamps = {}
+
+		# Event name -> publishes so far, counted on the core thread, and
+		# handler runs so far, counted on the GUI thread
+		self.publishedEvents = {}
+		self.handledEvents = {}
+
+		# Stamps pushed out of a full queue before their handler ran
+		self.droppedStamps = 0
+
+	def setEnabled(self, enabled):
+		self.currentFrame = None
+		for stamps in self.pendingStamps.values():
+			stamps.clear()
+		self.enabled = enabled
+
+	def reset(self):
+		with self.histogramLock:
+			self.histograms = {}
+
+	# Stamps of this event are kept for handlerStarted(). Only for events that
+	# have a handler calling it on every run, or the numbers drift apart and
+	# no stamp is ever taken
+	def trackEvent(self, eventName):
+		self.pendingStamps.setdefault(eventName, deque(maxlen = PENDING_STAMP_LIMIT))
+		self.publishedEvents.setdefault(eventName, 0)
+		self.handledEvents.setdefault(eventName, 0)
+
+	def record(self, stage, callsign, duration, now):
+		with self.histogramLock:
+			for key in ((stage, callsign), (stage, ALL_CALLSIGNS)):
+				histogram = self.histograms.get(key)
+				if (histogram is None):
+					histogram = self.histograms[key] = rollingHistogram()
+				histogram.add(duration, now)
+
+	# Core thread: a frame read at arrivalTime has been decoded
+	def frameDecoded(self, frame, arrivalTime):
+		now = monotonicTime()
+		stamp = frameStamp(frame.split(",", 1)[0], arrivalTime, now)
+		self.record("decode", stamp.callsign, now - arrivalTime, now)
+		self.currentFrame = stamp
+
+	# Core thread: the frame has been handled
+	def frameDone(self):
+		self.currentFrame = None
+
+	# Core thread: an event is being published, for the current frame if
+	# there is one. Called whether enabled or not, to number tracked events
+	def eventPublished(self, eventName):
+		sequence = self.publishedEvents.get(eventName)
+		if (sequence is not None):
+			self.publishedEvents[eventName] = sequence + 1
+
+		stamp = self.currentFrame
+		if not (self.enabled and stamp is not None):
+			return
+
+		if (stamp.emit is None):
+			now = monotonicTime()
+			stamp.emit = now
+			self.record("dispatch", stamp.callsign, now - stamp.decode, now)
+
+		if (sequence is not None):
+			stamps = self.pendingStamps[eventName]
+			if (len(stamps) == PENDING_STAMP_LIMIT):
+				self.droppedStamps += 1
+			stamps.append((sequence, stamp))
+
+	# GUI thread: a handler for eventName has started. Returns the stamp to
+	# pass to guiCommitted(), or None. Called whether enabled or not
+	def handlerStarted(self, eventName):
+		sequence = self.handledEvents.get(eventName)
+		if (sequence is None):
+			return None
+		self.handledEvents[eventName] = sequence + 1
+
+		if not (self.enabled):
+			return None
+
+		# Stamps left by handlers that ran while disabled are passed over
+		stamps = self.pendingStamps[eventName]
+		while (len(stamps) > 0 and stamps[0][0] < sequence):
+			stamps.popleft()
+
+		if (len(stamps) == 0 or stamps[0][0] != sequence):
+			return None
+		stamp = stamps.popleft()[1]
+
+		now = monotonicTime()
+		stamp.handlerStart = now
+		self.record("signal", stamp.callsign, now - stamp.emit, now)
+		return stamp
+
+	# GUI thread: the handler that took stamp has updated the window
+	def guiCommitted(self, stamp):
+		if (stamp is None):
+			return
+
+		now = monotonicTime()
+		stamp.guiCommit = now
+		self.record("handler", stamp.callsign, now - stamp.handlerStart, now)
+		self.record("total", stamp.callsign, now - stamp.arrival, now)
+
+	# Times a block under section, e.g.
+	#	with tracker.measure("evaluateJavaScript", "hab"):
+	def measure(self, section, callsign = ALL_CALLSIGNS):
+		if not (self.enabled):
+			return UNMEASURED
+		return measuredSection(self, section, callsign)
+
+	# Returns [(stage, callsign, count, p50, p95, p99, max)] for everything
+	# recorded in the window, stages first in path order, then sections
+	def getSummaries(self):
+		now = monotonicTime()
+		with self.histogramLock:
+			histograms = list(self.histograms.items())
+
+		summaries = []
+		for (stage, callsign), histogram in histograms:
+			summary = histogram.getSummary(now)
+			if (summary is not None):
+				summaries.append((stage, callsign) + summary)
+
+		def sortKey(summary):
+			stage, callsign = summary[0], summary[1]
+			if (stage in LATENCY_STAGES):
+				stageOrder = (LATENCY_STAGES.index(stage), "")
+			else:
+				stageOrder = (len(LATENCY_STAGES), stage)
+			return stageOrder, callsign != ALL_CALLSIGNS, callsign
+
+		return sorted(summaries, key = sortKey)
+
+	def format(self):
+		lines = ["{:<20} {:<8} {:>8} {:>10} {:>10} {:>10} {:>10}".format(
+					"stage", "callsign", "frames", "p50 ms", "p95 ms", "p99 ms", "max ms")]
+
+		for stage, callsign, count, p50, p95, p99, maximum in self.getSummaries():
+			lines.append("{:<20} {:<8} {:>8d} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+							stage, callsign, count, p50 * 1000, p95 * 1000, p99 * 1000, maximum * 1000))
+
+		if (self.droppedStamps > 0):
+			lines.append("{} stamps dropped waiting for the GUI".format(self.droppedStamps))
+
+		return "\n".join(lines)
+
+	# Appends the current summaries to a text file
+	def dump(self, fileName):
+		with open(fileName, "a") as dumpFile:
+			dumpFile.write("Latency over the last {:.0f} s at {}\n".format(
+							LATENCY_WINDOW, time.strftime("%Y-%m-%d %H:%M:%S")))
+			dumpFile.write(self.format() + "\n\n")
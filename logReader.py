@@ -0,0 +1,299 @@
+from __future__ import print_function
+
+import os
+import sys
+import gzip
+import time
+import multiprocessing
+from collections import namedtuple
+from messageDispatcher import messageDispatcher
+from telemetryArchive import BALLOON_COLUMNS, CHASE_COLUMNS, parseBalloonData, parseChaseData
+
+"""
+Reads MoGS radio and telemetry logs back into typed records.
+
+Every stage is a generator, so a log is never held in memory:
+	readLogLines(fileName)    -> (time, text, isContinuation) with the
+	                             "YYYY-MM-DD HH:MM:SS: " prefix parsed and
+	                             separators dropped
+	logParser.parse(lines)    -> balloonSample, chaseSample and frameRecord,
+	                             routed by the same messageDispatcher the radio
+	                             loop uses
+
+Lines without a prefix continue the line before them and take its time. Raw
+"Serial Input:" dumps are skipped, since every frame in them is logged again
+once decoded. parseLogFiles() fans whole files out over a process pool and
+summarizeLogs() totals the logSummary of each, e.g.
+
+	python logReader.py "Old Logs"
+
+Rotated segments (*.txt.gz) are read as well.
+"""
+LOG_CALLSIGNS = ["chase1", "chase2", "chase3", "chase4", "hab", "nps"]
+LOG_MESSAGE_TYPES = ["ack", "init", "chat", "image", "alive", "cmd"]
+
+# Wrappers older versions of serialHandler put around frames in the radio log
+FRAME_PREFIXES = ["Handling message:"]
+RAW_INPUT_PREFIX = "Serial Input:"
+
+balloonSample = namedtuple("balloonSample", [name for name, dtype in BALLOON_COLUMNS])
+chaseSample = namedtuple("chaseSample", ["callsign"] + [name for name, dtype in CHASE_COLUMNS])
+frameRecord = namedtuple("frameRecord", ["receivedTime", "callsign", "messageType", "payload"])
+
+
+class logSummary(object):
+	def __init__(self, fileName = None):
+		self.fileNames = []
+		if (fileName is not None):
+			self.fileNames.append(fileName)
+
+		self.lines = 0
+		self.separators = 0
+		self.frames = 0
+		self.unhandledFrames = 0
+		self.otherLines = 0
+
+		# "<callsign>,<type>" -> frames
+		self.messageCounts = {}
+		self.firstTime = None
+		self.lastTime = None
+		self.maxAltitude = None
+
+	def addTime(self, timestamp):
+		if (self.firstTime is None or timestamp < self.firstTime):
+			self.firstTime = timestamp
+		if (self.lastTime is None or timestamp > self.lastTime):
+			self.lastTime = timestamp
+
+	def merge(self, other):
+		self.fileNames += other.fileNames
+		self.lines += other.lines
+		self.separators += other.separators
+		self.frames += other.frames
+		self.unhandledFrames += other.unhandledFrames
+		self.otherLines += other.otherLines
+
+		for key, count in other.messageCounts.items():
+			self.messageCounts[key] = self.messageCounts.get(key, 0) + count
+
+		for timestamp in (other.firstTime, other.lastTime):
+			if (timestamp is not None):
+				self.addTime(timestamp)
+
+		if (other.maxAltitude is not None and (self.maxAltitude is None or other.maxAltitude > self.maxAltitude)):
+			self.maxAltitude = other.maxAltitude
+
+	def format(self):
+		lines = ["{} files, {} lines, {} separators, {} frames, {} unhandled frames, {} other lines".format(
+					len(self.fileNames), self.lines, self.separators, self.frames,
+					self.unhandledFrames, self.otherLines)]
+
+		if (self.firstTime is not None):
+			lines.append("from {} to {}".format(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.firstTime)),
+												time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.lastTime))))
+		if (self.maxAltitude is not None):
+			lines.append("max balloon altitude {:.1f} m".format(self.maxAltitude))
+
+		for key in sorted(self.messageCounts):
+			lines.append("  {:<16} {:7d}".format(key, self.messageCounts[key]))
+
+		return "\n".join(lines)
+
+
+def openLogFile(fileName):
+	if (fileName.endswith(".gz")):
+		return gzip.open(fileName, "rb")
+	return open(fileName, "rb")
+
+
+if (bytes is str):
+	def decodeLogLine(line):
+		return line
+else:
+	def decodeLogLine(line):
+		return line.decode("latin-1")
+
+
+# Yields (time, text, isContinuation) for every line of a log. time is None
+# until the first prefixed line. Blank lines and "Starting ... log" banners
+# are counted in summary and skipped
+def readLogLines(fileName, summary = None):
+	if (summary is None):
+		summary = logSummary(fileName)
+
+	timestamp = None
+	cachedPrefix = None
+
+	with openLogFile(fileName) as logFile:
+		for line in logFile:
+			line = decodeLogLine(line).rstrip("\r\n")
+			summary.lines += 1
+			isContinuation = True
+
+			# "YYYY-MM-DD HH:MM:SS: ", parsed once per distinct second
+			if (len(line) >= 21 and line[19:21] == ": " and line[4] == "-" and line[13] == ":"):
+				prefix = line[:19]
+				if (prefix != cachedPrefix):
+					try:
+						timestamp = time.mktime(time.strptime(prefix, "%Y-%m-%d %H:%M:%S"))
+						cachedPrefix = prefix
+					except (ValueError, OverflowError):
+						prefix = None
+
+				if (prefix is not None):
+					line = line[21:]
+					isContinuation = False
+
+			text = line.strip()
+			if (len(text) == 0 or (text.startswith("Starting ") and text.endswith(" log"))):
+				summary.separators += 1
+				continue
+
+			yield timestamp, text, isContinuation
+
+
+class logParser(object):
+	def __init__(self, summary = None):
+		if (summary is None):
+			summary = logSummary()
+		self.summary = summary
+
+		self.records = []
+		self.currentTime = None
+
+		self.dispatcher = messageDispatcher()
+		for callsign in LOG_CALLSIGNS:
+			self.dispatcher.registerCallsign(callsign)
+
+		self.dispatcher.registerHandler("data", self.receivedChaseData)
+		self.dispatcher.registerHandler("data", self.receivedBalloonData, "hab")
+		for messageType in LOG_MESSAGE_TYPES:
+			self.dispatcher.registerHandler(messageType, self.makeFrameHandler(messageType))
+
+	def makeFrameHandler(self, messageType):
+		def receivedFrame(callsign, payload):
+			self.records.append(frameRecord(self.currentTime, callsign, messageType, payload))
+			self.countMessage(callsign, messageType)
+		return receivedFrame
+
+	def countMessage(self, callsign, messageType):
+		key = callsign + "," + messageType
+		self.summary.messageCounts[key] = self.summary.messageCounts.get(key, 0) + 1
+
+	def receivedBalloonData(self, callsign, payload):
+		sample = balloonSample(*parseBalloonData(payload, self.currentTime))
+		self.records.append(sample)
+		self.countMessage(callsign, "data")
+
+		if (sample.altitude == sample.altitude and
+			(self.summary.maxAltitude is None or sample.altitude > self.summary.maxAltitude)):
+			self.summary.maxAltitude = sample.altitude
+
+	def receivedChaseData(self, callsign, payload):
+		self.records.append(chaseSample(callsign, *parseChaseData(payload, self.currentTime)))
+		self.countMessage(callsign, "data")
+
+	# Takes (time, text, isContinuation) from readLogLines() and yields records
+	def parse(self, lines):
+		for timestamp, frame in extractFrames(lines):
+			self.currentTime = timestamp
+			if (timestamp is not None):
+				self.summary.addTime(timestamp)
+
+			if (self.dispatcher.dispatch(frame)):
+				self.summary.frames += 1
+			elif (self.dispatcher.isRegisteredCallsign(frame.split(",", 1)[0])):
+				self.summary.unhandledFrames += 1
+			else:
+				self.summary.otherLines += 1
+
+			for record in self.records:
+				yield record
+			self.records = []
+
+
+# Takes (time, text, isContinuation) from readLogLines() and yields (time, text)
+# for every frame, without ",END_TX". Text that is not a frame, such as
+# "Unable to write to serial port", comes through as well
+def extractFrames(lines):
+	skippingRawInput = False
+
+	for timestamp, text, isContinuation in lines:
+		# Older logs have no prefix at all, so a raw dump runs until the
+		# next line that is recognisably something else
+		if (text.startswith(RAW_INPUT_PREFIX)):
+			skippingRawInput = True
+			continue
+
+		isFrameLine = False
+		for prefix in FRAME_PREFIXES:
+			if (text.startswith(prefix)):
+				text = text[len(prefix):].strip()
+				isFrameLine = True
+				break
+
+		if (isFrameLine or not isContinuation):
+			skippingRawInput = False
+		if (skippingRawInput):
+			continue
+
+		for frame in text.split(",END_TX"):
+			frame = frame.strip()
+			if (len(frame) > 0):
+				yield timestamp, frame
+
+
+# Yields every record in one log
+def readLogRecords(fileName, summary = None):
+	if (summary is None):
+		summary = logSummary(fileName)
+	return logParser(summary).parse(readLogLines(fileName, summary))
+
+
+# Process pool worker: the records and summary of a whole file
+def parseLogFile(fileName):
+	summary = logSummary(fileName)
+	records = list(readLogRecords(fileName, summary))
+	return fileName, records, summary
+
+
+# Returns the radio and telemetry logs (and rotated segments) in a directory
+def findLogFiles(directory):
+	return sorted([os.path.join(directory, name) for name in os.listdir(directory)
+					if (name.startswith("MoGS_radio_log") or name.startswith("MoGS_telemetry_log")) and
+					(name.endswith(".txt") or name.endswith(".txt.gz"))])
+
+
+# Yields (fileName, records, summary) for each file as the pool finishes it.
+# processes = 1 parses in this process
+def parseLogFiles(fileNames, processes = None):
+	if (processes == 1 or len(fileNames) <= 1):
+		for fileName in fileNames:
+			yield parseLogFile(fileName)
+		return
+
+	pool = multiprocessing.Pool(processes)
+	try:
+		for result in pool.imap_unordered(parseLogFile, fileNames):
+			yield result
+	finally:
+		pool.close()
+		pool.join()
+
+
+def summarizeLogs(fileNames, processes = None):
+	summary = logSummary()
+	for fileName, records, fileSummary in parseLogFiles(fileNames, processes):
+		summary.merge(fileSummary)
+	return summary
+
+
+if __name__ == "__main__":
+	directory = "Old Logs"
+	if (len(sys.argv) > 1):
+		directory = sys.argv[1]
+
+	startTime = time.time()
+	summary = summarizeLogs(findLogFiles(directory))
+	print(summary.format())
+	print("parsed in {:.2f} s".format(time.time() - startTime))
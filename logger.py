@@ -1,34 +1,469 @@
-
-import datetime
+import os
+import gzip
+import json
+import time
+import atexit
+import shutil
+import threading
+from collections import deque
 
 TELEMETRY_LOG_FILE_LOCATION = r"MoGS_telemetry_log.txt"
 RADIO_LOG_FILE_LOCATION = r"MoGS_radio_log.txt"
 GUI_LOG_FILE_LOCATION = r"MoGS_gui_log.txt"
 
-def logTelemetry(line):
+"""
+Log files are written by a background thread.
+
+The log functions only format the line and put it on a bounded queue, so the
+serial and GUI threads never touch the disk. The writer keeps one handle open
+per file, writes whatever has been queued in one batch per file and flushes
+every LOG_FLUSH_INTERVAL seconds, or sooner once LOG_FLUSH_BYTES are
+waiting. If the queue is full the line is dropped and counted rather than
+blocking the caller. Everything queued is written out when the program
+exits.
+
+Each log is rotated once it reaches LOG_ROTATE_BYTES, or when a
+LOG_ROTATE_INTERVAL boundary (e.g. the top of the hour) passes. The closed
+segment is renamed with the time of its first line, e.g.
+MoGS_radio_log.20150721-092458.txt, and gzipped on a background thread. Each
+finished segment gets a line in the log's manifest (MoGS_radio_log.manifest)
+with its time range and its byte offsets within the whole uncompressed log.
+With the manifest, tools can open just the segments that cover a time
+window; see findLogSegments().
+
+The queue, flush and rotation settings below are read when the writer
+starts, with the first line logged, so a program can change them before it
+logs anything.
+"""
+LOG_QUEUE_SIZE = 10000
+LOG_FLUSH_INTERVAL = 1.0
+LOG_FLUSH_BYTES = 64 * 1024
+LOG_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Set either to None to turn that kind of rotation off
+LOG_ROTATE_BYTES = 16 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 60 * 60
+LOG_COMPRESS_SEGMENTS = True
+LOG_SEGMENT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+
+# Formats the current time once per second instead of once per line
+class timestampCache(object):
+	def __init__(self, timestampFormat = LOG_TIMESTAMP_FORMAT):
+		self.timestampFormat = timestampFormat
+		self.cached = (None, "")
+
+	def getTimestamp(self, now = None):
+		if (now is None):
+			now = time.time()
+
+		second = int(now)
+		cached = self.cached
+
+		# A single tuple is swapped in, so callers on other threads always see a
+		# matching second and string
+		if (cached[0] != second):
+			cached = (second, time.strftime(self.timestampFormat, time.localtime(second)))
+			self.cached = cached
+
+		return cached[1]
+
+
+# Returns the time of a "YYYY-mm-dd HH:MM:SS: ..." log line, or None
+def parseLogTimestamp(line):
 	try:
-		telemetryLogFile = open(TELEMETRY_LOG_FILE_LOCATION, "a")
-		for newLine in line.split("\n"):
-			telemetryLogFile.write(str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")) + ": " + newLine + "\n")
-		telemetryLogFile.close
-	except:
-		print("WARNING: Unable to log telemetry data")
+		return time.mktime(time.strptime(line[:19], LOG_TIMESTAMP_FORMAT))
+	except (ValueError, OverflowError):
+		return None
+
+
+def getManifestFileName(fileName):
+	return os.path.splitext(fileName)[0] + ".manifest"
+
+
+# Returns the manifest entries for a log, oldest segment first
+def readLogManifest(fileName):
+	segments = []
 
-def logGui(line):
 	try:
-		guiLogFile = open(GUI_LOG_FILE_LOCATION, "a")
-		for newLine in line.split("\n"):
-			guiLogFile.write(str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")) + ": " + newLine + "\n")
-		guiLogFile.close
-	except:
-		print("WARNING: Unable to log GUI data")
+		manifestFile = open(getManifestFileName(fileName), "r")
+	except IOError:
+		return segments
 
-def logRadio(line):
+	for line in manifestFile:
+		try:
+			segments.append(json.loads(line))
+		except ValueError:
+			pass
+	manifestFile.close()
+
+	return segments
+
+
+# Returns the paths of the segments of a log with lines between startTime and
+# endTime (either may be None), oldest first. The active log file is last,
+# since its time range is not in the manifest yet
+def findLogSegments(fileName, startTime = None, endTime = None):
+	directory = os.path.dirname(fileName)
+	paths = []
+
+	for segment in readLogManifest(fileName):
+		if (startTime is not None and segment["endTime"] < startTime):
+			continue
+		if (endTime is not None and segment["startTime"] > endTime):
+			continue
+		paths.append(os.path.join(directory, segment["file"]))
+
+	if (os.path.exists(fileName)):
+		paths.append(fileName)
+
+	return paths
+
+
+# Gzips a closed segment, then records it in the manifest. Run on its own
+# thread by logSegment.rotate()
+def compressLogSegment(segmentFileName, manifestEntry, manifestFileName, compress):
+	if (compress):
+		try:
+			with open(segmentFileName, "rb") as segmentFile:
+				compressedFile = gzip.open(segmentFileName + ".gz.tmp", "wb")
+				shutil.copyfileobj(segmentFile, compressedFile)
+				compressedFile.close()
+			os.rename(segmentFileName + ".gz.tmp", segmentFileName + ".gz")
+			os.remove(segmentFileName)
+			manifestEntry["file"] += ".gz"
+		except (IOError, OSError):
+			print("WARNING: Unable to compress " + segmentFileName)
+
+	with manifestLock:
+		try:
+			manifestFile = open(manifestFileName, "a")
+			manifestFile.write(json.dumps(manifestEntry, sort_keys = True) + "\n")
+			manifestFile.close()
+		except IOError:
+			print("WARNING: Unable to update " + manifestFileName)
+
+manifestLock = threading.Lock()
+
+
+# Logs are written as bytes, so sizes and manifest offsets are byte offsets
+# on every platform. Python 3 text goes out as latin-1, as logReader reads it
+if (bytes is str):
+	def encodeLogText(text):
+		return text
+else:
+	def encodeLogText(text):
+		return text.encode("latin-1", "replace")
+
+
+# The active file of one log, plus what the manifest needs to know about it
+class logSegment(object):
+	def __init__(self, fileName, rotateBytes, rotateInterval, compress):
+		self.fileName = fileName
+		self.manifestFileName = getManifestFileName(fileName)
+		self.rotateBytes = rotateBytes
+		self.rotateInterval = rotateInterval
+		self.compress = compress
+		self.compressionThreads = []
+
+		# Offset of this segment within the whole log, following the last
+		# segment in the manifest
+		self.startOffset = 0
+		segments = readLogManifest(fileName)
+		if (len(segments) > 0):
+			self.startOffset = segments[-1]["endOffset"]
+
+		self.open()
+
+		# Picking up a file left by an earlier run: take its time range from
+		# its first and last lines
+		if (self.size > 0):
+			self.setTimeRange(*self.readTimeRange())
+
+	def open(self):
+		self.logFile = open(self.fileName, "ab")
+		self.size = os.path.getsize(self.fileName)
+		self.firstTime = None
+		self.lastTime = None
+		self.nextRotateTime = None
+
+	def readTimeRange(self):
+		with open(self.fileName, "rb") as logFile:
+			firstTime = parseLogTimestamp(logFile.readline().decode("latin-1"))
+			logFile.seek(max(0, self.size - 4096))
+			lastLines = logFile.read().decode("latin-1").split("\n")
+
+		lastTime = None
+		for line in reversed(lastLines):
+			lastTime = parseLogTimestamp(line)
+			if (lastTime is not None):
+				break
+
+		modifiedTime = os.path.getmtime(self.fileName)
+		return (firstTime or lastTime or modifiedTime), (lastTime or modifiedTime)
+
+	def setTimeRange(self, firstTime, lastTime):
+		if (self.firstTime is None):
+			self.firstTime = firstTime
+			if (self.rotateInterval is not None):
+				self.nextRotateTime = (int(firstTime // self.rotateInterval) + 1) * self.rotateInterval
+		self.lastTime = lastTime
+
+	# text holds whole lines logged between firstTime and lastTime
+	def write(self, text, firstTime, lastTime):
+		data = encodeLogText(text)
+		self.logFile.write(data)
+		self.size += len(data)
+		self.setTimeRange(firstTime, lastTime)
+
+	def needsRotation(self, now):
+		if (self.size == 0):
+			return False
+		if (self.rotateBytes is not None and self.size >= self.rotateBytes):
+			return True
+		return (self.nextRotateTime is not None and now >= self.nextRotateTime)
+
+	def getSegmentFileName(self):
+		base, extension = os.path.splitext(self.fileName)
+		stamp = time.strftime(LOG_SEGMENT_TIME_FORMAT, time.localtime(self.firstTime))
+		segmentFileName = base + "." + stamp + extension
+
+		suffix = 1
+		while (os.path.exists(segmentFileName) or os.path.exists(segmentFileName + ".gz")):
+			segmentFileName = "{}.{}-{}{}".format(base, stamp, suffix, extension)
+			suffix += 1
+
+		return segmentFileName
+
+	# Closes the active file, renames it to a segment and starts a new file.
+	# Compression and the manifest update happen on a background thread
+	def rotate(self):
+		self.logFile.close()
+
+		segmentFileName = self.getSegmentFileName()
+		os.rename(self.fileName, segmentFileName)
+
+		manifestEntry = {"file"        : os.path.basename(segmentFileName),
+						"startTime"   : self.firstTime,
+						"endTime"     : self.lastTime,
+						"startOffset" : self.startOffset,
+						"endOffset"   : self.startOffset + self.size}
+
+		# Not a daemon, so a compression in progress finishes before exit
+		compressionThread = threading.Thread(target = compressLogSegment,
+											args = (segmentFileName, manifestEntry,
+													self.manifestFileName, self.compress))
+		compressionThread.start()
+		self.compressionThreads = [thread for thread in self.compressionThreads if thread.is_alive()]
+		self.compressionThreads.append(compressionThread)
+
+		self.startOffset += self.size
+		self.open()
+
+	def flush(self):
+		self.logFile.flush()
+
+	def close(self):
+		self.logFile.close()
+
+		for thread in self.compressionThreads:
+			thread.join()
+
+
+class logWriterThread(threading.Thread):
+	# Settings left as None are taken from the module's LOG_ constants
+	def __init__(self, queueSize = None, flushInterval = None, flushBytes = None):
+		threading.Thread.__init__(self)
+		self.daemon = True
+
+		if (queueSize is None):
+			queueSize = LOG_QUEUE_SIZE
+		if (flushInterval is None):
+			flushInterval = LOG_FLUSH_INTERVAL
+		if (flushBytes is None):
+			flushBytes = LOG_FLUSH_BYTES
+
+		# deque append() and popleft() are atomic, so callers never take a lock.
+		# The writer is woken early once a quarter of the queue is used
+		self.pendingLines = deque()
+		self.queueSize = queueSize
+		self.wakeupThreshold = max(1, queueSize // 4)
+		self.wakeupRequested = threading.Event()
+
+		self.flushInterval = flushInterval
+		self.flushBytes = flushBytes
+
+		# None turns that kind of rotation off, so these are always the constants
+		self.rotateBytes = LOG_ROTATE_BYTES
+		self.rotateInterval = LOG_ROTATE_INTERVAL
+		self.compressSegments = LOG_COMPRESS_SEGMENTS
+
+		# File name -> logSegment, only touched by the writer thread
+		self.logFiles = {}
+		self.unflushedBytes = 0
+		self.lastFlushTime = time.time()
+
+		self.linesWritten = 0
+		self.droppedLines = 0
+
+	# Queues text logged at loggedTime for a log file. Returns False if the
+	# queue is full and the text was dropped. Safe to call from any thread
+	def write(self, fileName, text, loggedTime):
+		queued = len(self.pendingLines)
+
+		if (queued >= self.queueSize):
+			self.droppedLines += 1
+			return False
+
+		self.pendingLines.append((fileName, text, loggedTime))
+
+		if (queued + 1 == self.wakeupThreshold):
+			self.wakeupRequested.set()
+
+		return True
+
+	def getLogFile(self, fileName):
+		if (fileName not in self.logFiles):
+			self.logFiles[fileName] = logSegment(fileName, self.rotateBytes, self.rotateInterval, self.compressSegments)
+		return self.logFiles[fileName]
+
+	def run(self):
+		stopping = False
+
+		while not (stopping):
+			self.wakeupRequested.wait(self.flushInterval)
+			self.wakeupRequested.clear()
+
+			# Everything queued so far goes out as one write per file
+			batches = {}
+			while (True):
+				try:
+					fileName, text, loggedTime = self.pendingLines.popleft()
+				except IndexError:
+					break
+
+				# (None, None, None) is queued by stop()
+				if (fileName is None):
+					stopping = True
+					break
+
+				if (fileName in batches):
+					batches[fileName][0].append(text)
+					batches[fileName][2] = loggedTime
+				else:
+					batches[fileName] = [[text], loggedTime, loggedTime]
+
+			for fileName, (texts, firstTime, lastTime) in batches.items():
+				self.writeText(fileName, "".join(texts), firstTime, lastTime)
+
+			# Logs that have gone quiet still rotate on their time boundary
+			if not (stopping):
+				now = time.time()
+				for fileName, logFile in list(self.logFiles.items()):
+					if (logFile.needsRotation(now)):
+						self.rotate(logFile)
+
+			if (self.unflushedBytes > 0 and
+				(stopping or self.unflushedBytes >= self.flushBytes or
+				time.time() - self.lastFlushTime >= self.flushInterval)):
+				self.flush()
+
+		self.closeFiles()
+
+	def writeText(self, fileName, text, firstTime, lastTime):
+		try:
+			logFile = self.getLogFile(fileName)
+			if (logFile.needsRotation(firstTime)):
+				self.rotate(logFile)
+
+			logFile.write(text, firstTime, lastTime)
+			self.unflushedBytes += len(text)
+			self.linesWritten += text.count("\n")
+		except:
+			print("WARNING: Unable to write to " + fileName)
+
+	def rotate(self, logFile):
+		try:
+			logFile.rotate()
+		except (IOError, OSError):
+			print("WARNING: Unable to rotate " + logFile.fileName)
+			logFile.open()
+
+	def flush(self):
+		for fileName, logFile in self.logFiles.items():
+			try:
+				logFile.flush()
+			except:
+				print("WARNING: Unable to flush " + fileName)
+
+		self.unflushedBytes = 0
+		self.lastFlushTime = time.time()
+
+	def closeFiles(self):
+		for logFile in self.logFiles.values():
+			try:
+				logFile.close()
+			except:
+				pass
+		self.logFiles = {}
+
+	# Writes out everything queued so far and closes the files
+	def stop(self, timeout = 5):
+		if (self.is_alive()):
+			self.pendingLines.append((None, None, None))
+			self.wakeupRequested.set()
+			self.join(timeout)
+
+
+logTimestamps = timestampCache()
+logWriter = None
+logWriterLock = threading.Lock()
+
+
+# Starts the writer on first use, so importing this module has no side effects
+def getLogWriter():
+	global logWriter
+
+	if (logWriter is None):
+		with logWriterLock:
+			if (logWriter is None):
+				writer = logWriterThread()
+				writer.start()
+				logWriter = writer
+
+	return logWriter
+
+
+def stopLogWriter():
+	global logWriter
+
+	with logWriterLock:
+		writer = logWriter
+		logWriter = None
+
+	if (writer is not None):
+		writer.stop()
+
+atexit.register(stopLogWriter)
+
+
+def writeLogLines(fileName, line, skipEmptyLines = False):
 	try:
-		radioLogFile = open(RADIO_LOG_FILE_LOCATION, "a")
-		for newLine in line.split("\n"):
-			if (len(newLine) > 0):
-				radioLogFile.write(str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")) + ": " + newLine + "\n")
-		radioLogFile.close
+		now = time.time()
+		prefix = logTimestamps.getTimestamp(now) + ": "
+		text = "".join([prefix + newLine + "\n" for newLine in line.split("\n")
+						if not (skipEmptyLines and len(newLine) == 0)])
+
+		if (len(text) > 0):
+			getLogWriter().write(fileName, text, now)
 	except:
-		print("WARNING: Unable to log radio operations data")
+		print("WARNING: Unable to log to " + fileName)
+
+def logTelemetry(line):
+	writeLogLines(TELEMETRY_LOG_FILE_LOCATION, line)
+
+def logGui(line):
+	writeLogLines(GUI_LOG_FILE_LOCATION, line)
+
+def logRadio(line):
+	writeLogLines(RADIO_LOG_FILE_LOCATION, line, True)
@@ -0,0 +1,82 @@
+import json
+
+"""
+Batches map updates into one JavaScript call per GUI frame.
+
+Every waypoint, SPOT fix, prediction point and manual marker used to be its
+own evaluateJavaScript() call, a synchronous round trip into WebKit with a
+script to parse each time. The bridge queues them instead, as
+[function name, arguments...], and flush() sends the whole queue as one JSON
+array to applyMapUpdates() on the page (see mogs_map_html.py), which applies
+it in order in one pass. The GUI flushes on its refresh timer.
+
+Text from the radio can arrive as raw bytes in any encoding, so byte strings
+are decoded as UTF-8 as they are queued, with undecodable bytes replaced;
+one bad note cannot then stop the batch it is in from being sent.
+
+Has no Qt dependency: evaluate is any function that runs a script on the
+page. Not thread safe, use it from the GUI thread.
+"""
+MAP_UPDATE_FUNCTION = "applyMapUpdates"
+
+# Beyond this many queued updates the queue is flushed straight away, to keep
+# the payload small while a whole flight is being replayed
+MAP_BATCH_LIMIT = 2000
+
+try:
+	textType = unicode
+except NameError:
+	textType = str
+
+
+# Returns value as text for the page, decoding byte strings
+def getText(value):
+	if (isinstance(value, bytes)):
+		return value.decode("utf-8", "replace")
+	return textType(value)
+
+
+class mapBridge(object):
+	def __init__(self, evaluate, batchLimit = MAP_BATCH_LIMIT):
+		self.evaluate = evaluate
+		self.batchLimit = batchLimit
+		self.pendingUpdates = []
+
+		self.updatesSent = 0
+		self.batchesSent = 0
+
+	def queueUpdate(self, update):
+		self.pendingUpdates.append([getText(value) if isinstance(value, bytes) else value for value in update])
+		if (len(self.pendingUpdates) >= self.batchLimit):
+			self.flush()
+
+	def addVehicleWaypoint(self, index, latitude, longitude, timestamp):
+		self.queueUpdate(["addVehicleWaypoint", index, float(latitude), float(longitude), getText(timestamp)])
+
+	def addSpotMarker(self, index, latitude, longitude, timestamp):
+		self.queueUpdate(["addSpotMarker", index, float(latitude), float(longitude), getText(timestamp)])
+
+	def plotPredictionLine(self, latitude, longitude, note):
+		self.queueUpdate(["plotPredictionLine", float(latitude), float(longitude), getText(note)])
+
+	def addMarkerManually(self, latitude, longitude, note):
+		self.queueUpdate(["addMarkerManually", float(latitude), float(longitude), getText(note)])
+
+	def clearManualMarkers(self):
+		self.queueUpdate(["clearManualMarkers"])
+
+	def getScript(self, updates):
+		return "{}({});".format(MAP_UPDATE_FUNCTION, json.dumps(updates, separators = (",", ":")))
+
+	# Sends everything queued since the last flush. Returns the number of updates sent
+	def flush(self):
+		if (len(self.pendingUpdates) == 0):
+			return 0
+
+		updates = self.pendingUpdates
+		self.pendingUpdates = []
+		self.evaluate(self.getScript(updates))
+
+		self.updatesSent += len(updates)
+		self.batchesSent += 1
+		return len(updates)
@@ -0,0 +1,131 @@
+"""
+Routes decoded radio frames to handlers.
+
+Every frame on the link has the form "<callsign>,<type>[,<payload>]". The
+frame is split once and the handler is looked up by (callsign, type), then
+by type alone, so a new node only needs registerCallsign() and a new message
+type only needs registerHandler().
+"""
+
+
+# Frames handled for one (callsign, type). Kept across routing table
+# rebuilds, so counts survive registering new nodes and handlers
+class frameCounter(object):
+	__slots__ = ["count"]
+
+	def __init__(self):
+		self.count = 0
+
+
+class messageDispatcher(object):
+	def __init__(self):
+		# Callsign -> name shown to the user, e.g. "chase1" -> "Chase 1"
+		self.callsigns = {}
+
+		# (callsign, type) -> handler(callsign, payload). A callsign of None
+		# matches any registered callsign
+		self.handlers = {}
+
+		# callsign -> {type: (handler, frameCounter)}, resolved from the two
+		# tables above so a frame costs one split and two dictionary lookups
+		self.routingTable = {}
+
+		# (callsign, type) -> frameCounter
+		self.frameCounters = {}
+
+		# Called with the callsign of every frame from a registered node
+		self.nodeHeardHandler = None
+
+		self.unknownCallsignFrames = 0
+		self.unhandledFrames = 0
+
+	# (callsign, type) -> frames handled
+	@property
+	def frameCounts(self):
+		return dict([(key, counter.count) for key, counter in self.frameCounters.items() if counter.count > 0])
+
+	@property
+	def framesDispatched(self):
+		return sum([counter.count for counter in self.frameCounters.values()])
+
+	def registerCallsign(self, callsign, displayName = None):
+		if (displayName is None):
+			displayName = callsign
+		self.callsigns[callsign] = displayName
+		self.rebuildRoutingTable()
+
+	def unregisterCallsign(self, callsign):
+		self.callsigns.pop(callsign, None)
+		self.rebuildRoutingTable()
+
+	def isRegisteredCallsign(self, callsign):
+		return callsign in self.callsigns
+
+	def getDisplayName(self, callsign):
+		return self.callsigns.get(callsign, callsign)
+
+	def registerHandler(self, messageType, handler, callsign = None):
+		self.handlers[(callsign, messageType)] = handler
+		self.rebuildRoutingTable()
+
+	def unregisterHandler(self, messageType, callsign = None):
+		self.handlers.pop((callsign, messageType), None)
+		self.rebuildRoutingTable()
+
+	# Callsign-specific handlers take precedence over the generic ones
+	def rebuildRoutingTable(self):
+		routingTable = {}
+
+		for callsign in self.callsigns:
+			handlers = {}
+			for (handlerCallsign, messageType), handler in self.handlers.items():
+				if (handlerCallsign is None and messageType not in handlers):
+					handlers[messageType] = handler
+				elif (handlerCallsign == callsign):
+					handlers[messageType] = handler
+
+			routes = {}
+			for messageType, handler in handlers.items():
+				counter = self.frameCounters.get((callsign, messageType))
+				if (counter is None):
+					counter = self.frameCounters[(callsign, messageType)] = frameCounter()
+				routes[messageType] = (handler, counter)
+			routingTable[callsign] = routes
+
+		# Swap in one assignment so a dispatch on another thread never sees a
+		# half-built table
+		self.routingTable = routingTable
+
+	def setNodeHeardHandler(self, handler):
+		self.nodeHeardHandler = handler
+
+	# Returns True if a handler accepted the frame (without ",END_TX")
+	def dispatch(self, frame):
+		fields = frame.split(",", 2)
+		callsign = fields[0]
+
+		routes = self.routingTable.get(callsign)
+		if (routes is None):
+			self.unknownCallsignFrames += 1
+			return False
+
+		nodeHeardHandler = self.nodeHeardHandler
+		if (nodeHeardHandler is not None):
+			nodeHeardHandler(callsign)
+
+		route = None
+		if (len(fields) > 1):
+			route = routes.get(fields[1])
+
+		if (route is None):
+			self.unhandledFrames += 1
+			return False
+
+		handler, counter = route
+		if (len(fields) == 3):
+			handler(callsign, fields[2])
+		else:
+			handler(callsign, "")
+
+		counter.count += 1
+		return True
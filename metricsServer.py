@@ -0,0 +1,232 @@
+import time
+import threading
+import logger
+from txScheduler import PRIORITY_NAMES
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+	from socketserver import ThreadingMixIn
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+	from SocketServer import ThreadingMixIn
+
+"""
+Serves the station's counters as a Prometheus text exposition page.
+
+	curl http://127.0.0.1:9180/metrics
+
+Everything is read from the core when the page is requested, so serving it
+adds nothing to the radio loop; the counters it reads are plain attributes
+the loop keeps anyway. Latency percentiles come from the latencyTracker and
+are only there while it is recording.
+
+The server binds to localhost. To scrape several stations from one
+dashboard, forward the port (ssh -L) or set METRICS_ADDRESS to the
+interface the dashboard can reach.
+"""
+METRICS_ADDRESS = "127.0.0.1"
+METRICS_PORT = 9180
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escapeLabelValue(value):
+	return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def formatValue(value):
+	if (value is None or value != value):
+		return "NaN"
+	if (isinstance(value, float)):
+		return repr(value)
+	return str(value)
+
+
+class metricsPage(object):
+	def __init__(self):
+		self.lines = []
+
+	# samples is a list of (labels, value); labels a list of (name, value)
+	def addMetric(self, name, metricType, helpText, samples):
+		if (len(samples) == 0):
+			return
+
+		self.lines.append("# HELP {} {}".format(name, helpText))
+		self.lines.append("# TYPE {} {}".format(name, metricType))
+
+		for labels, value in samples:
+			if (len(labels) > 0):
+				labelText = ",".join(["{}=\"{}\"".format(labelName, escapeLabelValue(labelValue))
+									for labelName, labelValue in labels])
+				self.lines.append("{}{{{}}} {}".format(name, labelText, formatValue(value)))
+			else:
+				self.lines.append("{} {}".format(name, formatValue(value)))
+
+	def format(self):
+		return "\n".join(self.lines) + "\n"
+
+
+def addFrameMetrics(page, core):
+	dispatcher = core.messageDispatcher
+
+	page.addMetric("mogs_frames_received_total", "counter", "Frames handled, by callsign and message type",
+				[([("callsign", callsign), ("type", messageType)], count)
+				for (callsign, messageType), count in sorted(dispatcher.frameCounts.items())])
+	page.addMetric("mogs_frames_unhandled_total", "counter", "Frames from known nodes with no handler for their type",
+				[([], dispatcher.unhandledFrames)])
+	page.addMetric("mogs_frames_unknown_callsign_total", "counter", "Frames from callsigns not on the network",
+				[([], dispatcher.unknownCallsignFrames)])
+	page.addMetric("mogs_decoder_bytes_discarded_total", "counter", "Bytes dropped by the frame decoder as unframed or overflow",
+				[([], core.radioFrameDecoder.bytesDiscarded)])
+	page.addMetric("mogs_invalid_packets_total", "counter", "Frames whose payload could not be processed, by handler",
+				[([("source", source)], count) for source, count in sorted(core.invalidPackets.items())])
+
+
+def addOutboundMetrics(page, core):
+	scheduler = core.radioTxScheduler
+
+	page.addMetric("mogs_tx_queue_depth", "gauge", "Frames waiting for the radio, by priority",
+				[([("priority", name)], scheduler.getQueueDepth(priority)) for priority, name in enumerate(PRIORITY_NAMES)])
+	page.addMetric("mogs_tx_queue_delay_seconds_sum", "counter", "Total time sent frames waited in the queue, by priority",
+				[([("priority", name)], scheduler.delayStatistics[priority].totalDelay) for priority, name in enumerate(PRIORITY_NAMES)])
+	page.addMetric("mogs_tx_queue_delay_seconds_count", "counter", "Frames sent, by priority",
+				[([("priority", name)], scheduler.delayStatistics[priority].count) for priority, name in enumerate(PRIORITY_NAMES)])
+	page.addMetric("mogs_tx_frames_coalesced_total", "counter", "Queued frames replaced or dropped as redundant",
+				[([], scheduler.framesCoalesced)])
+	page.addMetric("mogs_tx_bytes_sent_total", "counter", "Bytes written to the radio",
+				[([], scheduler.bytesSent)])
+
+	statistics = sorted(core.commandTracker.statistics.items())
+	page.addMetric("mogs_commands_acknowledged_total", "counter", "Balloon commands acknowledged",
+				[([("command", name)], entry.acknowledged) for name, entry in statistics])
+	page.addMetric("mogs_commands_timed_out_total", "counter", "Balloon commands never acknowledged",
+				[([("command", name)], entry.timedOut) for name, entry in statistics])
+	page.addMetric("mogs_commands_retried_total", "counter", "Balloon command retries",
+				[([("command", name)], entry.retries) for name, entry in statistics])
+
+
+def addNodeMetrics(page, core, now):
+	page.addMetric("mogs_node_heartbeat_credits", "gauge", "Heartbeat intervals left before a node is shown as inactive",
+				[([("callsign", callsign)], credits) for callsign, credits in sorted(core.activeNodes.items())])
+	page.addMetric("mogs_node_last_heard_seconds", "gauge", "Seconds since the last frame from a node",
+				[([("callsign", callsign)], now - heardTime) for callsign, heardTime in sorted(core.nodeLastHeard.items())])
+
+
+def addGpsMetrics(page, core):
+	gpsHandler = core.gpsHandler
+	fix = gpsHandler.latestFix
+
+	page.addMetric("mogs_gps_fix_age_seconds", "gauge", "Age of the latest GPS fix, NaN if there is none",
+				[([], fix.getAge() if fix is not None else None)])
+	page.addMetric("mogs_gps_sentences_total", "counter", "NMEA sentences read from the GPS",
+				[([], gpsHandler.sentencesRead)])
+	page.addMetric("mogs_gps_rejected_sentences_total", "counter", "NMEA sentences that failed to parse",
+				[([], gpsHandler.rejectedSentences)])
+
+
+def addLogMetrics(page, core):
+	writer = logger.logWriter
+	if (writer is not None):
+		page.addMetric("mogs_log_queue_depth", "gauge", "Log lines waiting for the writer thread",
+					[([], len(writer.pendingLines))])
+		page.addMetric("mogs_log_lines_written_total", "counter", "Log lines written",
+					[([], writer.linesWritten)])
+		page.addMetric("mogs_log_lines_dropped_total", "counter", "Log lines dropped because the queue was full",
+					[([], writer.droppedLines)])
+
+	database = core.telemetryDatabase
+	if (database is not None):
+		page.addMetric("mogs_database_queue_depth", "gauge", "Frames waiting for the SQLite writer",
+					[([], len(database.pendingFrames))])
+		page.addMetric("mogs_database_frames_stored_total", "counter", "Frames stored in SQLite",
+					[([], database.framesStored)])
+		page.addMetric("mogs_database_frames_dropped_total", "counter", "Frames dropped because the SQLite queue was full",
+					[([], database.droppedFrames)])
+
+
+def addDishMetrics(page, core):
+	dishHandler = core.dishHandler
+	if (dishHandler is None):
+		return
+
+	page.addMetric("mogs_dish_point_requests_total", "counter", "Positions handed to the dish",
+				[([], getattr(dishHandler, "pointRequests", 0))])
+	page.addMetric("mogs_dish_move_commands_total", "counter", "Move commands sent to the dish ACU",
+				[([], getattr(dishHandler, "moveCommands", 0))])
+
+
+def addLatencyMetrics(page, core):
+	if not (core.latencyTracker.enabled):
+		return
+
+	summaries = core.latencyTracker.getSummaries()
+	samples = []
+	for stage, callsign, count, p50, p95, p99, maximum in summaries:
+		for quantile, value in (("0.5", p50), ("0.95", p95), ("0.99", p99), ("1", maximum)):
+			samples.append(([("stage", stage), ("callsign", callsign), ("quantile", quantile)], value))
+
+	page.addMetric("mogs_frame_latency_seconds", "gauge", "Per-stage frame latency over the tracker's window", samples)
+	page.addMetric("mogs_frame_latency_window_frames", "gauge", "Frames in the latency tracker's window",
+				[([("stage", stage), ("callsign", callsign)], count)
+				for stage, callsign, count, p50, p95, p99, maximum in summaries])
+
+
+METRIC_GROUPS = [addFrameMetrics, addOutboundMetrics, addGpsMetrics, addLogMetrics, addDishMetrics, addLatencyMetrics]
+
+
+# Returns the whole page as text
+def collectMetrics(core):
+	page = metricsPage()
+	now = time.time()
+
+	page.addMetric("mogs_info", "gauge", "This station", [([("callsign", core.RADIO_CALLSIGN)], 1)])
+	page.addMetric("mogs_uptime_seconds", "gauge", "Seconds since the core was created",
+				[([], now - core.missionStartTime)])
+	addNodeMetrics(page, core, now)
+
+	# A group that fails (e.g. a port being reopened) leaves out its own metrics only
+	for addMetrics in METRIC_GROUPS:
+		try:
+			addMetrics(page, core)
+		except:
+			logger.logRadio("Unable to collect metrics from " + addMetrics.__name__)
+
+	return page.format()
+
+
+class threadingHttpServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+
+class metricsServer(threading.Thread):
+	def __init__(self, core, address = METRICS_ADDRESS, port = METRICS_PORT):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.core = core
+
+		class metricsRequestHandler(BaseHTTPRequestHandler):
+			def do_GET(handler):
+				if (handler.path.split("?", 1)[0] not in ("/", "/metrics")):
+					handler.send_error(404)
+					return
+
+				body = collectMetrics(core).encode("utf-8")
+				handler.send_response(200)
+				handler.send_header("Content-Type", METRICS_CONTENT_TYPE)
+				handler.send_header("Content-Length", str(len(body)))
+				handler.end_headers()
+				handler.wfile.write(body)
+
+			# Scrapes every few seconds would fill the console
+			def log_message(handler, format, *args):
+				pass
+
+		self.server = threadingHttpServer((address, port), metricsRequestHandler)
+
+	def run(self):
+		self.server.serve_forever()
+
+	def stop(self):
+		if (self.is_alive()):
+			self.server.shutdown()
+		self.server.server_close()
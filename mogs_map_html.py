@@ -15,10 +15,17 @@ googleMapsHtml = """
 		var VEHICLES_TO_PLOT = 4
 		var myCenter = new google.maps.LatLng(36.8623, -121.0413);
 		
-		var vehicleWaypointArray = [];
+		// Points kept per vehicle track; past this the older half is thinned
+		// to every other point, so a long flight keeps its whole shape
+		var VEHICLE_PATH_LIMIT = 10000;
+		
+		// Markers shown at once; past this the oldest one is moved
+		var SPOT_MARKER_LIMIT = 50;
+		var MANUAL_MARKER_LIMIT = 200;
+		
+		var vehiclePathArray = [];
+		var vehiclePolylineArray = [];
 		var vehicleMarkerArray = [];
-		var spotMarkerArray = [];
-		var manualMarkerArray = [];
 		
 		var vehiclePathColors = ["#FF0000",
 								 "#007FFF",
@@ -35,10 +42,60 @@ googleMapsHtml = """
 								"http://fryarludwig.com/wp-content/uploads/2015/07/number_2.png",
 								"http://fryarludwig.com/wp-content/uploads/2015/07/number_3.png"];
 		
+		// Markers are reused: hidden ones are kept as spares, and once limit are
+		// shown the oldest is moved instead of a new one being made
+		function markerPool(limit)
+		{
+			this.limit = limit;
+			this.shownMarkers = [];
+			this.spareMarkers = [];
+		}
+		
+		markerPool.prototype.show = function(options)
+		{
+			var marker;
+			
+			if (this.shownMarkers.length >= this.limit)
+			{
+				marker = this.shownMarkers.shift();
+			}
+			else if (this.spareMarkers.length > 0)
+			{
+				marker = this.spareMarkers.pop();
+			}
+			else
+			{
+				marker = new google.maps.Marker();
+			}
+			
+			options.map = map;
+			marker.setOptions(options);
+			this.shownMarkers.push(marker);
+			return marker;
+		};
+		
+		markerPool.prototype.clear = function()
+		{
+			for (var i = 0; i < this.shownMarkers.length; i++)
+			{
+				this.shownMarkers[i].setMap(null);
+			}
+			
+			this.spareMarkers = this.spareMarkers.concat(this.shownMarkers);
+			this.shownMarkers = [];
+		};
+		
+		var spotMarkerPool = new markerPool(SPOT_MARKER_LIMIT);
+		var manualMarkerPool = new markerPool(MANUAL_MARKER_LIMIT);
+		
 		for (i = 0; i < VEHICLES_TO_PLOT; i++)
 		{
-			vehicleWaypointArray.push([]);
-			vehicleMarkerArray.push(new google.maps.Marker());
+			vehiclePathArray.push(new google.maps.MVCArray());
+			vehiclePolylineArray.push(new google.maps.Polyline({path:vehiclePathArray[i],
+																strokeColor:vehiclePathColors[i],
+																strokeOpacity:0.8,
+																strokeWeight:2}));
+			vehicleMarkerArray.push(new google.maps.Marker({icon:vehicleIconNames[i]}));
 		}
 		
 		function initialize() 
@@ -53,83 +110,91 @@ googleMapsHtml = """
 			map = new google.maps.Map(document.getElementById('map-canvas'), mapOptions);
 		}
 				
+		// Thins the older half of a track to every other point
+		function thinVehiclePath(index)
+		{
+			var points = vehiclePathArray[index].getArray();
+			var half = Math.floor(points.length / 2);
+			var thinnedPoints = [];
+			
+			for (var i = 0; i < half; i += 2)
+			{
+				thinnedPoints.push(points[i]);
+			}
+			
+			vehiclePathArray[index] = new google.maps.MVCArray(thinnedPoints.concat(points.slice(half)));
+			vehiclePolylineArray[index].setPath(vehiclePathArray[index]);
+		}
+		
+		// Extends the vehicle's track and moves its marker. Both are made once
+		// and put on the map with the first waypoint
 		function addVehicleWaypoint(index, lat, lng, time)
 		{
 			var vehiclePosition = new google.maps.LatLng(lat, lng);
 			
-			if (vehicleWaypointArray[index].length > 1)
+			if (vehiclePathArray[index].getLength() >= VEHICLE_PATH_LIMIT)
 			{
-				vehicleWaypointArray[index].shift();
+				thinVehiclePath(index);
 			}
 			
-			vehicleWaypointArray[index].push(vehiclePosition);
-			
-			vehicleMarkerArray[index].setMap(null);
+			vehiclePathArray[index].push(vehiclePosition);
 			
-			vehicleMarkerArray[index] = new google.maps.Marker(
-												{position:vehiclePosition,
-												icon: vehicleIconNames[index],
-												title: time,
-												map:map});
-												
-			vehicleMarkerArray[index].setMap(map);
+			vehicleMarkerArray[index].setPosition(vehiclePosition);
+			vehicleMarkerArray[index].setTitle(time);
 			
-			var line = new google.maps.Polyline
-			({
-				path:vehicleWaypointArray[index],
-				strokeColor:vehiclePathColors[index],
-				strokeOpacity:0.8,
-				strokeWeight:2,
-				map:map
-			});
-		}		
-					
+			if (vehicleMarkerArray[index].getMap() != map)
+			{
+				vehicleMarkerArray[index].setMap(map);
+				vehiclePolylineArray[index].setMap(map);
+			}
+		}
+		
 		function addSpotMarker(index, lat, lng, timestamp)
 		{
-			var spotMarkerPosition = new google.maps.LatLng(lat, lng);
-			
-			spotMarker = new google.maps.Marker({position:spotMarkerPosition,
-												icon:vehicleSpotIcons[index],
-												title:timestamp,
-												map:map});
-			
-			spotMarker.setMap(map);
+			spotMarkerPool.show({position:new google.maps.LatLng(lat, lng),
+								icon:vehicleSpotIcons[index],
+								title:timestamp});
 		}
 		
 		function plotPredictionLine(lat, lng, note)
 		{
-			var pos = new google.maps.LatLng(lat, lng);
-			
-			var currMarker = new google.maps.Marker({position:pos,
-												title:note,
-												map:map});
-			
-			currMarker.setMap(map);
-			
-			manualMarkerArray.push(currMarker);
+			manualMarkerPool.show({position:new google.maps.LatLng(lat, lng),
+								icon:null,
+								title:note});
 		}
 		
 		function addMarkerManually(lat, lng, note)
 		{
-			var pos = new google.maps.LatLng(lat, lng);
-			
-			var currMarker = new google.maps.Marker({position:pos,
-												title:note,
-												map:map});
-			
-			currMarker.setMap(map);
-			
-			manualMarkerArray.push(currMarker);
+			manualMarkerPool.show({position:new google.maps.LatLng(lat, lng),
+								icon:null,
+								title:note});
 		}
 		
 		function clearManualMarkers()
 		{
-			for (i = 0; i < manualMarkerArray.length; i++)
+			manualMarkerPool.clear();
+		}
+		
+		var mapUpdateFunctions = {addVehicleWaypoint: addVehicleWaypoint,
+								  addSpotMarker: addSpotMarker,
+								  plotPredictionLine: plotPredictionLine,
+								  addMarkerManually: addMarkerManually,
+								  clearManualMarkers: clearManualMarkers};
+		
+		// Applies a batch queued by mapBridge.py, in order. Each update is
+		// [function name, arguments...]
+		function applyMapUpdates(updates)
+		{
+			for (var i = 0; i < updates.length; i++)
 			{
-				manualMarkerArray[i].setMap(null);
+				var update = updates[i];
+				var updateFunction = mapUpdateFunctions[update[0]];
+				
+				if (updateFunction)
+				{
+					updateFunction.apply(null, update.slice(1));
+				}
 			}
-			
-			manualMarkerArray = [];
 		}
 		
 		google.maps.event.addDomListener(window, 'load', initialize);
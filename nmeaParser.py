@@ -0,0 +1,231 @@
+from collections import namedtuple
+
+"""
+NMEA 0183 sentence parser for the GPS receivers used by MoGS.
+
+Sentences are checked against their *hh checksum and decoded into typed
+records. Any talker ID is accepted ($GPGGA, $GNGGA, ...). Empty numeric
+fields decode to None. parseSentence() returns None for anything that is
+malformed, fails its checksum or is not one of the supported types.
+"""
+ggaSentence = namedtuple("ggaSentence", ["timestamp", "latitude", "longitude", "fixQuality",
+										"satellites", "hdop", "altitude", "geoidSeparation"])
+
+rmcSentence = namedtuple("rmcSentence", ["timestamp", "status", "latitude", "longitude",
+										"speedKnots", "course", "date", "magneticVariation"])
+
+vtgSentence = namedtuple("vtgSentence", ["trueCourse", "magneticCourse", "speedKnots",
+										"speedKph", "mode"])
+
+gsaSentence = namedtuple("gsaSentence", ["selectionMode", "fixType", "satellites",
+										"pdop", "hdop", "vdop"])
+
+# GSA fix types
+FIX_TYPE_NONE = 1
+FIX_TYPE_2D = 2
+FIX_TYPE_3D = 3
+
+
+if (str is bytes):
+	def toNativeString(line):
+		if (isinstance(line, str)):
+			return line
+		return line.encode("latin-1")
+
+	def computeChecksum(body):
+		checksum = 0
+		for character in bytearray(body):
+			checksum ^= character
+		return checksum
+else:
+	def toNativeString(line):
+		if (isinstance(line, str)):
+			return line
+		return line.decode("latin-1")
+
+	def computeChecksum(body):
+		checksum = 0
+		for character in body.encode("latin-1"):
+			checksum ^= character
+		return checksum
+
+
+# Returns the sentence between "$" and "*" if its checksum matches, else None.
+# Sentences without a checksum are only accepted when requireChecksum is False
+def validateChecksum(line, requireChecksum = True):
+	line = toNativeString(line).strip()
+
+	if (line[:1] != "$"):
+		return None
+
+	starIndex = line.rfind("*")
+	if (starIndex < 0):
+		if (requireChecksum):
+			return None
+		return line[1:]
+
+	body = line[1:starIndex]
+	try:
+		expected = int(line[starIndex + 1:starIndex + 3], 16)
+	except ValueError:
+		return None
+
+	if (computeChecksum(body) != expected):
+		return None
+
+	return body
+
+
+def toFloat(value):
+	if (len(value) == 0):
+		return None
+	return float(value)
+
+
+def toInt(value):
+	if (len(value) == 0):
+		return None
+	return int(value)
+
+
+# Converts a ddmm.mmmm / dddmm.mmmm field and its hemisphere to signed degrees
+def toDegrees(value, hemisphere):
+	if (len(value) == 0):
+		return None
+
+	pointIndex = value.find(".")
+	if (pointIndex < 0):
+		pointIndex = len(value)
+
+	degrees = float(value[:pointIndex - 2])
+	minutes = float(value[pointIndex - 2:])
+	decimalDegrees = degrees + (minutes / 60)
+
+	if (hemisphere == "S" or hemisphere == "W"):
+		decimalDegrees = -decimalDegrees
+
+	return decimalDegrees
+
+
+def parseGga(fields):
+	return ggaSentence(fields[1],
+					toDegrees(fields[2], fields[3]),
+					toDegrees(fields[4], fields[5]),
+					toInt(fields[6]) or 0,
+					toInt(fields[7]),
+					toFloat(fields[8]),
+					toFloat(fields[9]),
+					toFloat(fields[11]))
+
+
+def parseRmc(fields):
+	magneticVariation = toFloat(fields[10])
+	if (magneticVariation is not None and fields[11] == "W"):
+		magneticVariation = -magneticVariation
+
+	return rmcSentence(fields[1],
+					fields[2],
+					toDegrees(fields[3], fields[4]),
+					toDegrees(fields[5], fields[6]),
+					toFloat(fields[7]),
+					toFloat(fields[8]),
+					fields[9],
+					magneticVariation)
+
+
+def parseVtg(fields):
+	# NMEA 2.3 adds a mode indicator after the speed fields
+	if (len(fields) > 9):
+		mode = fields[9]
+	else:
+		mode = ""
+
+	return vtgSentence(toFloat(fields[1]),
+					toFloat(fields[3]),
+					toFloat(fields[5]),
+					toFloat(fields[7]),
+					mode)
+
+
+def parseGsa(fields):
+	satellites = tuple([int(prn) for prn in fields[3:15] if len(prn) > 0])
+
+	return gsaSentence(fields[1],
+					toInt(fields[2]) or FIX_TYPE_NONE,
+					satellites,
+					toFloat(fields[15]),
+					toFloat(fields[16]),
+					toFloat(fields[17]))
+
+
+# Sentence type -> (parser, minimum number of fields)
+SENTENCE_PARSERS = {"GGA" : (parseGga, 12),
+					"RMC" : (parseRmc, 12),
+					"VTG" : (parseVtg, 9),
+					"GSA" : (parseGsa, 18)}
+
+
+def parseSentence(line, requireChecksum = True):
+	body = validateChecksum(line, requireChecksum)
+	if (body is None):
+		return None
+
+	fields = body.split(",")
+	parser = SENTENCE_PARSERS.get(fields[0][2:])
+	if (parser is None or len(fields) < parser[1]):
+		return None
+
+	try:
+		return parser[0](fields)
+	except ValueError:
+		return None
+
+
+# True if the record describes a usable position lock
+def isValidFix(record):
+	if (isinstance(record, ggaSentence)):
+		return (record.fixQuality > 0 and
+				record.latitude is not None and
+				record.longitude is not None)
+	elif (isinstance(record, rmcSentence)):
+		return (record.status == "A" and
+				record.latitude is not None and
+				record.longitude is not None)
+	elif (isinstance(record, gsaSentence)):
+		return record.fixType >= FIX_TYPE_2D
+
+	return False
+
+
+"""
+Stream parser that keeps the most recent record of each type along with
+per-type counts, for the GPS thread and for offline analysis of captures.
+"""
+class nmeaParser(object):
+	def __init__(self, requireChecksum = True):
+		self.requireChecksum = requireChecksum
+		self.latestRecords = {}
+		self.sentenceCounts = {}
+		self.rejectedSentences = 0
+
+	def parse(self, line):
+		record = parseSentence(line, self.requireChecksum)
+
+		if (record is None):
+			self.rejectedSentences += 1
+		else:
+			recordType = type(record)
+			self.latestRecords[recordType] = record
+			self.sentenceCounts[recordType] = self.sentenceCounts.get(recordType, 0) + 1
+
+		return record
+
+	# Yields the records decoded from an iterable of lines, skipping rejects
+	def parseStream(self, lines):
+		for line in lines:
+			record = self.parse(line)
+			if (record is not None):
+				yield record
+
+	def getLatest(self, recordType):
+		return self.latestRecords.get(recordType)
@@ -0,0 +1,138 @@
+import os
+import time
+import select
+import threading
+
+"""
+Waits on the radio serial port for incoming bytes.
+
+The original serial loop slept for a fixed interval whenever nothing was
+waiting on the port, so both received frames and queued outbound messages
+could sit for most of a second. The reader below instead waits until bytes
+arrive, the timeout expires, or another thread calls wake().
+
+Modes:
+	READ_MODE_POLL     - legacy behaviour, sleeps pollInterval when idle
+	READ_MODE_BLOCKING - blocks in the port read with a short timeout
+	READ_MODE_SELECT   - POSIX only, select() on the port and a wakeup pipe
+"""
+READ_MODE_POLL = "poll"
+READ_MODE_BLOCKING = "blocking"
+READ_MODE_SELECT = "select"
+
+if (os.name == "posix"):
+	DEFAULT_READ_MODE = READ_MODE_SELECT
+else:
+	DEFAULT_READ_MODE = READ_MODE_BLOCKING
+
+
+class radioPortReader(object):
+	def __init__(self, mode = DEFAULT_READ_MODE, timeout = 0.05, pollInterval = 0.75):
+		self.mode = mode
+		self.timeout = timeout
+		self.pollInterval = pollInterval
+		self.port = None
+
+		# Bytes pulled off the port by a blocking read, handed back on the next read
+		self.pendingInput = b""
+		self.wakeupRequested = threading.Event()
+
+		self.wakeupPipe = None
+		if (mode == READ_MODE_SELECT and os.name == "posix"):
+			self.wakeupPipe = os.pipe()
+
+	# Attaches a freshly opened serial port. In blocking mode the port timeout
+	# is shortened so a read returns quickly when the line is idle
+	def setPort(self, port):
+		self.port = port
+		self.pendingInput = b""
+
+		if (self.getActiveMode() == READ_MODE_BLOCKING):
+			try:
+				self.port.timeout = self.timeout
+			except:
+				pass
+
+	# Select mode needs a real file descriptor; anything else (Windows COM ports,
+	# replay sources) falls back to a blocking read
+	def getActiveMode(self):
+		if (self.mode == READ_MODE_SELECT):
+			try:
+				if (self.wakeupPipe is not None and self.port.fileno() >= 0):
+					return READ_MODE_SELECT
+			except:
+				pass
+			return READ_MODE_BLOCKING
+
+		return self.mode
+
+	# Interrupts a wait in progress. Safe to call from any thread
+	def wake(self):
+		self.wakeupRequested.set()
+
+		if (self.wakeupPipe is not None):
+			try:
+				os.write(self.wakeupPipe[1], b"w")
+			except OSError:
+				pass
+
+	def clearWakeup(self):
+		self.wakeupRequested.clear()
+
+		if (self.wakeupPipe is not None):
+			try:
+				while (len(select.select([self.wakeupPipe[0]], [], [], 0)[0]) > 0):
+					os.read(self.wakeupPipe[0], 512)
+			except (OSError, select.error):
+				pass
+
+	# Blocks until input is waiting on the port, the timeout expires or wake()
+	# is called. Returns True if there is input to read. A shorter timeout can
+	# be passed in select mode, e.g. when queued output is due soon
+	def waitForInput(self, timeout = None):
+		if (len(self.pendingInput) > 0 or self.port.inWaiting() > 0):
+			return True
+
+		mode = self.getActiveMode()
+
+		# An outbound item queued since the last wait is serviced immediately
+		if (self.wakeupRequested.is_set()):
+			self.clearWakeup()
+			return False
+
+		if (timeout is None or timeout > self.timeout):
+			timeout = self.timeout
+
+		if (mode == READ_MODE_SELECT):
+			try:
+				readable = select.select([self.port.fileno(), self.wakeupPipe[0]], [], [], timeout)[0]
+			except select.error:
+				readable = []
+
+			if (self.wakeupPipe[0] in readable):
+				self.clearWakeup()
+
+		elif (mode == READ_MODE_BLOCKING):
+			self.pendingInput = self.port.read(1)
+			self.wakeupRequested.clear()
+
+		else:
+			time.sleep(self.pollInterval)
+
+		return (len(self.pendingInput) > 0 or self.port.inWaiting() > 0)
+
+	# Returns the byte consumed by a blocking wait, if any, so it can be
+	# prepended to the next read from the port
+	def takePendingInput(self):
+		pendingInput = self.pendingInput
+		self.pendingInput = b""
+		return pendingInput
+
+	def close(self):
+		if (self.wakeupPipe is not None):
+			for fd in self.wakeupPipe:
+				try:
+					os.close(fd)
+				except OSError:
+					pass
+			self.wakeupPipe = None
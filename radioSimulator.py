@@ -0,0 +1,425 @@
+from __future__ import print_function
+
+import os
+import pty
+import sys
+import tty
+import math
+import time
+import heapq
+import random
+import select
+import argparse
+import threading
+from frameDecoder import frameDecoder
+from commandTracker import COMMAND_ACKS
+from nmeaParser import computeChecksum
+
+"""
+Simulated radio network and GPS receiver on pseudo-terminals (Linux/POSIX).
+
+radioSimulator plays the rest of the network on the far side of the radio:
+the balloon sends "hab,data" at habRate frames per second, each chase vehicle
+sends "data" at chaseRate, every node sends "alive" each heartbeatInterval,
+and every "cmd,*" the station sends is acknowledged by the balloon after
+ackDelay. gpsSimulator sends $GPGGA and $GPRMC sentences for a vehicle
+driving a circle. Each opens a pty pair; point the station at portName
+exactly as at COM7 or COM4 and the real pyserial, radioPortReader,
+frameDecoder and gpsHandlerThread stack does the reading.
+
+linkImpairments drops, corrupts or splits what is written, e.g.
+
+	python radioSimulator.py --hab-rate 20 --loss 0.05 --corrupt 0.01 --split 0.1
+
+prints the two port names to hand to run_headless.py or the settings window.
+See benchmarks/bench_serial_stack.py for finding the highest frame rate the
+station keeps up with.
+"""
+SIMULATOR_LATITUDE = 36.9145
+SIMULATOR_LONGITUDE = -121.3602
+BALLOON_ASCENT_RATE = 5.0  # m/s
+GPS_CIRCLE_PERIOD = 600.0  # seconds per lap of the simulated drive
+GPS_CIRCLE_RADIUS = 0.01   # degrees
+
+SIMULATED_DISK_SPACE = "6.4G"
+
+# Bytes a corrupted frame gets one of in place of a random byte
+CORRUPTION_BYTES = b"#%&*?@~"
+
+
+class linkImpairments(object):
+	def __init__(self, lossRate = 0.0, corruptionRate = 0.0, splitRate = 0.0, splitDelay = 0.005, seed = None):
+		self.lossRate = lossRate
+		self.corruptionRate = corruptionRate
+		self.splitRate = splitRate
+		self.splitDelay = splitDelay
+		self.random = random.Random(seed)
+
+		self.framesLost = 0
+		self.framesCorrupted = 0
+		self.framesSplit = 0
+
+	# Returns the chunks a frame reaches the far end in: none if it was lost,
+	# two if it was split. The second chunk follows splitDelay later
+	def apply(self, data):
+		if (self.lossRate > 0 and self.random.random() < self.lossRate):
+			self.framesLost += 1
+			return []
+
+		if (self.corruptionRate > 0 and self.random.random() < self.corruptionRate):
+			data = bytearray(data)
+			position = self.random.randrange(len(data))
+			data[position] = self.random.choice(bytearray(CORRUPTION_BYTES))
+			data = bytes(data)
+			self.framesCorrupted += 1
+
+		if (self.splitRate > 0 and len(data) > 1 and self.random.random() < self.splitRate):
+			position = self.random.randrange(1, len(data))
+			self.framesSplit += 1
+			return [data[:position], data[position:]]
+
+		return [data]
+
+
+class ptyEndpoint(object):
+	def __init__(self):
+		self.master, self.slave = pty.openpty()
+
+		# No echo or line editing until pyserial configures the port, and the
+		# slave stays open here so the master never sees a hangup when the
+		# station closes and reopens the port
+		tty.setraw(self.slave)
+		self.portName = os.ttyname(self.slave)
+		self.closed = False
+
+	# Writes all of data, waiting while the station leaves the pty buffer full.
+	# Returns False if the endpoint was closed first
+	def write(self, data):
+		while (len(data) > 0):
+			if (self.closed):
+				return False
+
+			readable, writable, exceptional = select.select([], [self.master], [], 0.1)
+			if (len(writable) > 0):
+				data = data[os.write(self.master, data):]
+
+		return True
+
+	def read(self, timeout):
+		readable, writable, exceptional = select.select([self.master], [], [], max(0.0, timeout))
+		if (len(readable) == 0):
+			return b""
+		return os.read(self.master, 4096)
+
+	def close(self):
+		self.closed = True
+		os.close(self.master)
+		os.close(self.slave)
+
+
+if (bytes is str):
+	def encodeText(text):
+		return text
+else:
+	def encodeText(text):
+		return text.encode("latin-1")
+
+
+# Shared by both simulators: a pty, a deadline-ordered schedule of periodic
+# transmissions and whatever impairments apply to the link
+class ptySimulator(threading.Thread):
+	def __init__(self, impairments = None):
+		threading.Thread.__init__(self)
+		self.daemon = True
+
+		if (impairments is None):
+			impairments = linkImpairments()
+		self.impairments = impairments
+
+		self.endpoint = ptyEndpoint()
+		self.portName = self.endpoint.portName
+
+		# (due time, sequence, function, interval); interval None runs once
+		self.schedule = []
+		self.scheduleLock = threading.Lock()
+		self.sequence = 0
+
+		self.running = True
+		self.sending = True
+		self.startTime = time.time()
+
+		# "<callsign>,<type>" or sentence type -> count
+		self.framesOffered = {}
+		self.framesIntact = {}
+		self.bytesWritten = 0
+
+		# Largest delay between when a frame was due and when it went out
+		self.maxLag = 0.0
+
+	def addEvent(self, delay, function, interval = None):
+		with self.scheduleLock:
+			self.sequence += 1
+			heapq.heappush(self.schedule, (time.time() + delay, self.sequence, function, interval))
+
+	# Adds a transmission repeated rate times a second; rate 0 never sends it
+	def addPeriodic(self, rate, function):
+		if (rate > 0):
+			self.addEvent(self.impairments.random.random() / rate, function, 1.0 / rate)
+
+	def send(self, key, data):
+		self.framesOffered[key] = self.framesOffered.get(key, 0) + 1
+
+		damagedBefore = self.impairments.framesLost + self.impairments.framesCorrupted
+		chunks = self.impairments.apply(data)
+		if (self.impairments.framesLost + self.impairments.framesCorrupted == damagedBefore):
+			self.framesIntact[key] = self.framesIntact.get(key, 0) + 1
+
+		for index, chunk in enumerate(chunks):
+			if (index > 0):
+				time.sleep(self.impairments.splitDelay)
+			if not (self.endpoint.write(chunk)):
+				return
+			self.bytesWritten += len(chunk)
+
+	def getFramesOffered(self, key = None):
+		if (key is None):
+			return sum(self.framesOffered.values())
+		return self.framesOffered.get(key, 0)
+
+	# Frames sent that were neither lost nor corrupted on the way
+	def getFramesIntact(self, key = None):
+		if (key is None):
+			return sum(self.framesIntact.values())
+		return self.framesIntact.get(key, 0)
+
+	def handleInput(self, data):
+		pass
+
+	def run(self):
+		# The schedule starts from when the thread does, not from construction
+		with self.scheduleLock:
+			now = time.time()
+			offset = now - self.startTime
+			self.schedule = [(dueTime + offset, sequence, function, interval)
+							for dueTime, sequence, function, interval in self.schedule]
+			heapq.heapify(self.schedule)
+			self.startTime = now
+
+		try:
+			while (self.running):
+				with self.scheduleLock:
+					waitTime = 0.5
+					if (len(self.schedule) > 0):
+						waitTime = min(waitTime, self.schedule[0][0] - time.time())
+
+				data = self.endpoint.read(waitTime)
+				if (len(data) > 0):
+					self.handleInput(data)
+
+				self.runDueEvents()
+		except (OSError, select.error):
+			if (self.running):
+				raise
+
+	def runDueEvents(self):
+		now = time.time()
+
+		while (self.running):
+			with self.scheduleLock:
+				if (len(self.schedule) == 0 or self.schedule[0][0] > now):
+					return
+				dueTime, sequence, function, interval = heapq.heappop(self.schedule)
+
+				# Rescheduled from when it was due, so a stalled link falls
+				# behind and catches up rather than quietly sending less
+				if (interval is not None):
+					self.sequence += 1
+					heapq.heappush(self.schedule, (dueTime + interval, self.sequence, function, interval))
+
+			if (self.sending or interval is None):
+				self.maxLag = max(self.maxLag, time.time() - dueTime)
+				function()
+
+	# Keeps the port open but sends nothing periodic, e.g. to let the station
+	# drain what it was sent
+	def pauseSending(self):
+		self.sending = False
+
+	def stop(self):
+		self.running = False
+		self.endpoint.closed = True
+		if (self.is_alive() and threading.current_thread() is not self):
+			self.join(2)
+		self.endpoint.close()
+
+
+class radioSimulator(ptySimulator):
+	def __init__(self, habRate = 1.0, chaseCallsigns = ("chase2", "chase3"), chaseRate = 1.0,
+				heartbeatInterval = 5.0, ackDelay = 0.5, impairments = None):
+		ptySimulator.__init__(self, impairments)
+
+		self.ackDelay = ackDelay
+		self.decoder = frameDecoder()
+
+		self.commandsReceived = 0
+		self.acksSent = 0
+
+		self.addPeriodic(habRate, self.sendBalloonData)
+
+		for callsign in chaseCallsigns:
+			self.addPeriodic(chaseRate, self.makeChaseSender(callsign))
+
+		if (heartbeatInterval > 0):
+			for callsign in ("hab",) + tuple(chaseCallsigns):
+				self.addPeriodic(1.0 / heartbeatInterval, self.makeHeartbeatSender(callsign))
+
+	def sendFrame(self, callsign, messageType, payload = None):
+		frame = callsign + "," + messageType
+		if (payload is not None):
+			frame += "," + payload
+		self.send(callsign + "," + messageType, encodeText(frame + ",END_TX\n"))
+
+	def sendBalloonData(self):
+		self.sendFrame("hab", "data", formatBalloonData(time.time() - self.startTime, self.impairments.random))
+
+	def makeChaseSender(self, callsign):
+		def sendChaseData():
+			self.sendFrame(callsign, "data", formatChaseData(time.time() - self.startTime))
+		return sendChaseData
+
+	def makeHeartbeatSender(self, callsign):
+		def sendHeartbeat():
+			self.sendFrame(callsign, "alive")
+		return sendHeartbeat
+
+	# Frames from the station: commands get their ack from the balloon
+	def handleInput(self, data):
+		for frame in self.decoder.feed(data):
+			fields = frame.split(",", 2)
+			if (len(fields) < 3 or fields[1] != "cmd"):
+				continue
+
+			self.commandsReceived += 1
+			ack = getCommandAck(fields[2])
+			self.addEvent(self.ackDelay, lambda ack = ack: self.sendAck(ack))
+
+	def sendAck(self, ack):
+		self.acksSent += 1
+		self.sendFrame("hab", "ack", ack)
+
+
+class gpsSimulator(ptySimulator):
+	def __init__(self, rate = 1.0, impairments = None):
+		ptySimulator.__init__(self, impairments)
+		self.addPeriodic(rate, self.sendFix)
+
+	def sendFix(self):
+		now = time.time()
+		latitude, longitude = getCirclePosition(now - self.startTime)
+		timestamp = time.strftime("%H%M%S", time.gmtime(now)) + ".000"
+
+		self.sendSentence("GPGGA", "{},{},{},1,08,0.9,12.0,M,-32.0,M,,".format(
+			timestamp, formatNmeaLatitude(latitude), formatNmeaLongitude(longitude)))
+		self.sendSentence("GPRMC", "{},A,{},{},15.0,090.0,{},,".format(
+			timestamp, formatNmeaLatitude(latitude), formatNmeaLongitude(longitude),
+			time.strftime("%d%m%y", time.gmtime(now))))
+
+	def sendSentence(self, sentenceType, fields):
+		body = sentenceType + "," + fields
+		self.send(sentenceType, encodeText("${}*{:02X}\r\n".format(body, computeChecksum(body))))
+
+
+# "hab,data" payload elapsed seconds into the flight. Accelerations are raw
+# counts, 127 at 0 g and 29 per g, as the balloon sends them
+def formatBalloonData(elapsed, noise, gpsTime = None):
+	return "{},{:.5f},{:.5f},{:.1f},{:.1f},{:.1f},{:.1f},{:.1f},{:.1f},{:d},{:d},{:d},0".format(
+		time.strftime("%H%M%S", time.gmtime(gpsTime)),
+		SIMULATOR_LATITUDE + elapsed * 1e-5,
+		SIMULATOR_LONGITUDE + elapsed * 2e-5,
+		elapsed * BALLOON_ASCENT_RATE,
+		25.0 - elapsed * 0.01,
+		20.0 - elapsed * 0.03,
+		24.0,
+		11.1 - elapsed * 1e-4,
+		40.0 + noise.uniform(-1, 1),
+		127 + noise.randint(-1, 1),
+		127 + noise.randint(-1, 1),
+		156 + noise.randint(-1, 1))
+
+
+# Chase vehicle "data" payload elapsed seconds into its drive
+def formatChaseData(elapsed, gpsTime = None):
+	latitude, longitude = getCirclePosition(elapsed)
+	return "{}.000,{:.4f},{:.4f}".format(time.strftime("%H%M%S", time.gmtime(gpsTime)), latitude, longitude)
+
+
+# The ack the balloon answers a command ("SNAPSHOT,5,30") with
+def getCommandAck(command):
+	fields = command.split(",", 1)
+	name = fields[0]
+
+	if (name == "SNAPSHOT" and len(fields) > 1):
+		return "SNAPSHOT_UPDATE," + fields[1]
+	if (name == "DISK_SPACE"):
+		return "DISK," + SIMULATED_DISK_SPACE
+	if (name in COMMAND_ACKS):
+		return COMMAND_ACKS[name][0]
+	return "NO_OP"
+
+
+# (latitude, longitude) of a vehicle driving a circle around the start point
+def getCirclePosition(elapsed):
+	angle = 2 * math.pi * elapsed / GPS_CIRCLE_PERIOD
+	return (SIMULATOR_LATITUDE + GPS_CIRCLE_RADIUS * math.sin(angle),
+			SIMULATOR_LONGITUDE + GPS_CIRCLE_RADIUS * math.cos(angle))
+
+
+def formatNmeaLatitude(latitude):
+	degrees = int(abs(latitude))
+	return "{:02d}{:07.4f},{}".format(degrees, (abs(latitude) - degrees) * 60, "N" if latitude >= 0 else "S")
+
+
+def formatNmeaLongitude(longitude):
+	degrees = int(abs(longitude))
+	return "{:03d}{:07.4f},{}".format(degrees, (abs(longitude) - degrees) * 60, "E" if longitude >= 0 else "W")
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Simulated MoGS radio network and GPS on pseudo-terminals")
+	parser.add_argument("--hab-rate", type = float, default = 1.0, help = "balloon data frames per second")
+	parser.add_argument("--chase", nargs = "*", default = ["chase2", "chase3"], help = "chase vehicle callsigns")
+	parser.add_argument("--chase-rate", type = float, default = 1.0, help = "data frames per second per chase vehicle")
+	parser.add_argument("--heartbeat", type = float, default = 5.0, help = "seconds between alive frames, 0 for none")
+	parser.add_argument("--ack-delay", type = float, default = 0.5, help = "seconds before the balloon acks a command")
+	parser.add_argument("--gps-rate", type = float, default = 1.0, help = "GPS fixes per second")
+	parser.add_argument("--loss", type = float, default = 0.0, help = "fraction of frames lost")
+	parser.add_argument("--corrupt", type = float, default = 0.0, help = "fraction of frames with a corrupted byte")
+	parser.add_argument("--split", type = float, default = 0.0, help = "fraction of frames written in two pieces")
+	parser.add_argument("--seed", type = int, default = None)
+	args = parser.parse_args()
+
+	radio = radioSimulator(args.hab_rate, tuple(args.chase), args.chase_rate, args.heartbeat, args.ack_delay,
+							linkImpairments(args.loss, args.corrupt, args.split, seed = args.seed))
+	gps = gpsSimulator(args.gps_rate, linkImpairments(args.loss, args.corrupt, args.split, seed = args.seed))
+	radio.start()
+	gps.start()
+
+	print("Radio on {}, GPS on {}".format(radio.portName, gps.portName))
+	print("python run_headless.py --radio-port {} --gps-port {}".format(radio.portName, gps.portName))
+
+	try:
+		while (True):
+			time.sleep(5)
+			print("{} frames offered, {} lost, {} corrupted, {} split, {} commands acked, {} GPS sentences".format(
+				radio.getFramesOffered(), radio.impairments.framesLost, radio.impairments.framesCorrupted,
+				radio.impairments.framesSplit, radio.acksSent, gps.getFramesOffered()))
+			sys.stdout.flush()
+	except KeyboardInterrupt:
+		pass
+
+	radio.stop()
+	gps.stop()
+
+
+if __name__ == "__main__":
+	main()
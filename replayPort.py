@@ -0,0 +1,182 @@
+import time
+import threading
+from logReader import readLogLines, extractFrames, LOG_CALLSIGNS
+
+"""
+Stands in for the radio serial port and plays back recorded frames.
+
+Frames come from radio or telemetry logs (anything logReader reads) or from a
+plain file of frames such as test_telemetry.txt. They are released with their
+recorded spacing, divided by speed; speed None plays them as fast as the
+serial loop takes them. startOffset skips that many recorded seconds from the
+start. Lines without a timestamp are spaced untimedInterval apart.
+
+The port has the calls telemetryCore makes on a serial.Serial (inWaiting,
+read, write, close, timeout), so everything downstream of the port runs as it
+does live. It has no file descriptor, so radioReader uses its blocking mode.
+"""
+REPLAY_BUFFER_LIMIT = 64 * 1024
+
+if (bytes is str):
+	def encodeFrame(frame):
+		return frame + ",END_TX\n"
+else:
+	def encodeFrame(frame):
+		return (frame + ",END_TX\n").encode("latin-1")
+
+
+class replayPort(object):
+	def __init__(self, fileNames, speed = 1.0, startOffset = 0.0, untimedInterval = 0.5):
+		if (isinstance(fileNames, str)):
+			fileNames = [fileNames]
+
+		self.fileNames = fileNames
+		self.speed = speed
+		self.startOffset = startOffset
+		self.untimedInterval = untimedInterval
+		self.timeout = 1
+
+		self.inputBuffer = bytearray()
+		self.condition = threading.Condition()
+
+		self.paused = False
+		self.pausedTime = None
+		self.totalPausedTime = 0.0
+		self.seekOffset = None
+		self.closed = False
+		self.finished = False
+
+		# Recorded seconds since the first frame, of the last frame released
+		self.position = 0.0
+		self.playedFrom = 0.0
+		self.framesReplayed = 0
+		self.bytesWritten = 0
+
+		self.replayThread = threading.Thread(target = self.run)
+		self.replayThread.daemon = True
+		self.replayThread.start()
+
+	# Yields (recorded seconds since the first frame, frame). Time only moves
+	# forward, so frames logged out of order are released together
+	def readFrames(self):
+		position = None
+		lastTime = None
+
+		for fileName in self.fileNames:
+			for timestamp, frame in extractFrames(readLogLines(fileName)):
+				if (frame.split(",", 1)[0] not in LOG_CALLSIGNS):
+					continue
+
+				if (position is None):
+					position = 0.0
+				elif (timestamp is None):
+					position += self.untimedInterval
+				elif (lastTime is not None):
+					position += max(0.0, timestamp - lastTime)
+
+				if (timestamp is not None):
+					lastTime = timestamp
+
+				yield position, frame
+
+	def run(self):
+		while not (self.closed):
+			with self.condition:
+				startOffset = self.startOffset
+				if (self.seekOffset is not None):
+					startOffset = self.seekOffset
+					self.seekOffset = None
+				self.finished = False
+				self.totalPausedTime = 0.0
+
+			# Wall clock time that recorded time startOffset plays at, not
+			# counting time spent paused
+			replayStartTime = time.time()
+			replayedBefore = self.framesReplayed
+
+			for position, frame in self.readFrames():
+				if (position < startOffset):
+					continue
+				# Seeking into a quiet spell plays from the next frame at once
+				if (self.framesReplayed == replayedBefore):
+					startOffset = position
+					self.playedFrom = position
+
+				with self.condition:
+					while not (self.closed or self.seekOffset is not None):
+						if (self.paused):
+							self.condition.wait(0.1)
+							continue
+
+						# The serial loop has fallen behind; let it catch up
+						if (len(self.inputBuffer) >= REPLAY_BUFFER_LIMIT):
+							self.condition.wait(0.1)
+							continue
+
+						if (self.speed is None):
+							break
+
+						waitTime = (replayStartTime + self.totalPausedTime +
+									(position - startOffset) / self.speed - time.time())
+						if (waitTime <= 0):
+							break
+						self.condition.wait(min(waitTime, 0.1))
+
+					if (self.closed or self.seekOffset is not None):
+						break
+
+					self.inputBuffer += encodeFrame(frame)
+					self.position = position
+					self.framesReplayed += 1
+					self.condition.notify_all()
+
+			# Played to the end: wait for a seek or close
+			with self.condition:
+				if (self.seekOffset is None):
+					self.finished = True
+				while not (self.closed or self.seekOffset is not None):
+					self.condition.wait(0.5)
+
+	def pause(self):
+		with self.condition:
+			if not (self.paused):
+				self.paused = True
+				self.pausedTime = time.time()
+				self.condition.notify_all()
+
+	def resume(self):
+		with self.condition:
+			if (self.paused):
+				self.paused = False
+				self.totalPausedTime += time.time() - self.pausedTime
+				self.condition.notify_all()
+
+	# Restarts playback at offset recorded seconds from the first frame
+	def seek(self, offset):
+		with self.condition:
+			self.seekOffset = offset
+			self.condition.notify_all()
+
+	def inWaiting(self):
+		return len(self.inputBuffer)
+
+	def read(self, size = 1):
+		with self.condition:
+			if (len(self.inputBuffer) == 0 and not self.closed):
+				self.condition.wait(self.timeout)
+
+			data = bytes(self.inputBuffer[:size])
+			del self.inputBuffer[:size]
+			self.condition.notify_all()
+
+		return data
+
+	# What the station transmits goes nowhere
+	def write(self, data):
+		self.bytesWritten += len(data)
+		return len(data)
+
+	def close(self):
+		with self.condition:
+			self.closed = True
+			self.condition.notify_all()
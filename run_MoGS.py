@@ -28,6 +28,12 @@ from collections import OrderedDict
 
 from mogs_map_html import googleMapsHtml
 from serialHandler import serialHandlerThread
+from telemetryViewModel import telemetryViewModel, GUI_REFRESH_INTERVAL
+from consoleBuffer import consoleBuffer, ERROR_LOG_CAPACITY
+from consoleModel import consoleViewWidget
+from mapBridge import mapBridge
+from trackStore import trackStore
+from commandChannel import *
 from dishHandler import dishHandlerThread
 from logger import *
 
@@ -40,7 +46,6 @@ SPOT_API_URL = r"https://api.findmespot.com/spot-main-web/consumer/rest-api/2.0/
 """
 Handles GUI operations, as well as all user input. 
 
-TODO: Filter out GPS locks that aren't valid
 TODO: Refactor code base
 TODO: Change old GPS to grey
 
@@ -56,11 +61,11 @@ class mogsMainWindow(QtGui.QMainWindow):
 		super(mogsMainWindow, self).__init__()
 		self.commandStatusLabel = QtGui.QLabel()
 
+		# Points drawn per vehicle track; the full track is kept in vehicleTracks
 		self.MAX_LOCATIONS = 300
-		self.vehicleLocationList = {"hab"    : [[], []],
-									"chase1" : [[], []],
-									"chase2" : [[], []],
-									"chase3" : [[], []]}
+		self.vehicleTracks = trackStore()
+		for callsign in ["hab", "chase1", "chase2", "chase3"]:
+			self.vehicleTracks.getTrack(callsign)
 
 		self.vehiclePlotColor = {"hab"   : pg.mkPen("#FF0000"),
 								"chase1" : pg.mkPen("#007FFF"),
@@ -77,8 +82,9 @@ class mogsMainWindow(QtGui.QMainWindow):
 		self.sendMessageEntryBox = QtGui.QLineEdit()
 		self.notifyOnSerialError = True
 
-		self.radioConsoleWidget = QtGui.QWidget()
-		self.radioConsoleTextEdit = QtGui.QTextEdit()
+		# Console and error log keep a fixed number of lines, see consoleBuffer.py
+		self.radioConsoleBuffer = consoleBuffer()
+		self.radioConsoleWidget = consoleViewWidget(self.radioConsoleBuffer, "Radio Console Viewer")
 		self.viewRadioConsoleButton = QtGui.QPushButton()
 
 		self.offlineModeEnabled = False
@@ -154,6 +160,22 @@ class mogsMainWindow(QtGui.QMainWindow):
 		self.chaseVehicleGpsLabel["chase2"] = [QtGui.QLabel(), QtGui.QLabel()]
 		self.chaseVehicleGpsLabel["chase3"] = [QtGui.QLabel(), QtGui.QLabel()]
 
+		# Handlers set label values here; refreshTelemetryLabels() applies the
+		# ones that changed every GUI_REFRESH_INTERVAL ms
+		self.telemetryView = telemetryViewModel()
+		for key, label in self.telemetryLabelDictionary.items():
+			self.telemetryView.addLabel(key, label, str(label.text()))
+		for callsign, label in self.statusLabelList.items():
+			self.telemetryView.addLabel(("status", callsign), label)
+		for callsign, labels in self.chaseVehicleGpsLabel.items():
+			self.telemetryView.addLabel(("chaseTime", callsign), labels[0])
+			self.telemetryView.addLabel(("chasePosition", callsign), labels[1])
+		self.guiRefreshTimer = QtCore.QTimer()
+		self.guiRefreshTimer.timeout.connect(self.refreshTelemetryLabels)
+
+		# Map updates are queued and sent to the page once per refresh, see mapBridge.py
+		self.mapBridge = mapBridge(self.evaluateMapScript)
+
 		self.armBrmButton = QtGui.QPushButton()
 		self.releaseBalloonButton = QtGui.QPushButton()
 		self.balloonReleaseArmed = False
@@ -161,13 +183,23 @@ class mogsMainWindow(QtGui.QMainWindow):
 
 		self.balloonUptime = "None"
 
-		self.latestErrorsWidget = QtGui.QWidget()
-		self.latestErrorsTextEdit = QtGui.QTextEdit()
+		self.latestErrorsBuffer = consoleBuffer(ERROR_LOG_CAPACITY)
+		self.latestErrorsWidget = consoleViewWidget(self.latestErrorsBuffer, "Balloon Error Messages")
 		self.totalErrorsReceived = 0
 
 		# Offline mode variables here
 		self.offlineMapGraphWidget = pg.PlotWidget()
-		self.offlinePlotDataItem = pg.PlotDataItem()
+
+		# One curve per vehicle, given new points on the refresh tick. In clip
+		# to view mode the points are picked from what is in view, so zooming
+		# in shows the full detail
+		self.offlinePlotCurves = {}
+		for callsign, pen in self.vehiclePlotColor.items():
+			self.offlinePlotCurves[callsign] = self.offlineMapGraphWidget.plot(pen = pen)
+		self.offlinePlotShown = {}
+		self.offlinePlotPending = set()
+		self.offlinePlotClipToView = True
+		self.offlineMapGraphWidget.getViewBox().sigRangeChanged.connect(self.offlinePlotViewChanged)
 
 		self.serialHandler = serialHandlerThread()
 		self.serialHandler.balloonDataSignalReceived.connect(self.updateBalloonDataTelemetry)
@@ -178,8 +210,17 @@ class mogsMainWindow(QtGui.QMainWindow):
 		self.serialHandler.chatMessageReceived.connect(self.updateChat)
 		self.serialHandler.radioConsoleUpdateSignal.connect(self.updateRadioConsole)
 		self.serialHandler.updateNetworkStatusSignal.connect(self.updateActiveNetwork)
+		self.serialHandler.commandTimedOut.connect(self.processCommandTimeout)
 		# add the other handlers here
 
+		# Handlers that report their frames to the latency diagnostics
+		self.latencyTracker = self.serialHandler.latencyTracker
+		self.latencyTracker.trackEvent("balloonData")
+		self.latencyTracker.trackEvent("vehicleData")
+		self.latencyDiagnosticsWidget = QtGui.QWidget()
+		self.latencyTable = QtGui.QTableWidget()
+		self.latencyRefreshTimer = QtCore.QTimer()
+
 		try:
 			settingsFile = open("mogsSettings.db", "r")
 			self.serialHandler.HEARTBEAT_INTERVAL = int(settingsFile.readline()[:-1])
@@ -199,6 +240,8 @@ class mogsMainWindow(QtGui.QMainWindow):
 				self.serialHandler.TEST_MODE = True
 			else:
 				self.serialHandler.TEST_MODE = False
+			if (settingsFile.readline()[:-1] == "False"):
+				self.offlinePlotClipToView = False
 
 			metPersistentFile = open("./time.db", 'r')
 			timeString = metPersistentFile.readline()[:-1]
@@ -214,6 +257,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 			self.dishHandler = dishHandlerThread()
 		else:
 			self.dishHandler = None
+		self.serialHandler.dishHandler = self.dishHandler
 
 		self.serialHandler.start()
 		self.initUI()
@@ -231,6 +275,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 
 		self.createRadioConsole()
 		self.createBalloonErrorsWidget()
+		self.createLatencyDiagnosticsWidget()
 		self.aboutMogsWidget = QtGui.QWidget()
 
 		self.col = QtGui.QColor(0, 0, 0)
@@ -245,6 +290,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 		if (self.offlineModeEnabled):
 			print("OfflineMode!")
 			mapWidget = self.offlineMapGraphWidget
+			self.guiRefreshTimer.timeout.connect(self.updatePlot)
 		else:
 			mapWidget = QWidget()
 			self.mapView = QWebView(mapWidget)
@@ -253,6 +299,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 			self.theMap = self.mapView.page().mainFrame()
 			self.theMap.addToJavaScriptWindowObject('self', self)
 			self.mapView.setHtml(googleMapsHtml)
+			self.guiRefreshTimer.timeout.connect(self.mapBridge.flush)
 
 		telemetryWidget = self.createTelemetryWidget()
 		messagingWidget = self.createMessagingWidget()
@@ -274,6 +321,8 @@ class mogsMainWindow(QtGui.QMainWindow):
 		self.setCentralWidget(self.interfaceWidget)
 		self.show()
 
+		self.guiRefreshTimer.start(GUI_REFRESH_INTERVAL)
+
 		logGui("GUI created.")
 
 	"""
@@ -314,6 +363,10 @@ class mogsMainWindow(QtGui.QMainWindow):
 		resetMetAction = QtGui.QAction("&Start Mission Timer", self)
 		resetMetAction.triggered.connect(self.resetMissionElapsedTime)
 
+		latencyAction = QtGui.QAction("&Latency Diagnostics", self)
+		latencyAction.setStatusTip("Show where received frames spend their time")
+		latencyAction.triggered.connect(self.showLatencyDiagnostics)
+
 		fileMenu = menuBar.addMenu("&File")
 		fileMenu.addAction(exitAction)
 
@@ -321,6 +374,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 		toolsMenu.addAction(clearYourMarkersAction)
 		toolsMenu.addAction(resetMetAction)
 		toolsMenu.addAction(settingsAction)
+		toolsMenu.addAction(latencyAction)
 		toolsMenu.addAction(helpAction)
 		toolsMenu.addAction(aboutAction)
 
@@ -355,7 +409,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 
 	def updateMissionElapsedTime(self):
 		currMet = (datetime.datetime.now() - self.serialHandler.missionStartTime)
-		self.telemetryLabelDictionary["met"].setText(str(currMet).split('.')[0])
+		self.telemetryView.setText("met", str(currMet).split('.')[0])
 
 	"""
 	Populates a "Messaging" widget.
@@ -597,60 +651,92 @@ class mogsMainWindow(QtGui.QMainWindow):
 		return widget
 
 	def createBalloonErrorsWidget(self):
-		layout = QtGui.QGridLayout(self.latestErrorsWidget)
-		layout.setSpacing(0)
-
-		# Set up labels
-		errorsCloseButton = QtGui.QPushButton("Close")
-		errorsCloseButton.clicked.connect(self.latestErrorsWidget.close)
-
-		self.radioConsoleTextEdit.setMinimumSize(300, 200)
-		self.radioConsoleTextEdit.setReadOnly(True)
-
-		layout.addWidget(self.latestErrorsTextEdit, 1, 0, 10, 5)
-		layout.addWidget(errorsCloseButton, 11, 2)
-
-		self.latestErrorsWidget.setLayout(layout)
-		self.latestErrorsWidget.setWindowTitle("Balloon Error Messages")
+		self.guiRefreshTimer.timeout.connect(self.latestErrorsWidget.refresh)
 
 	"""
 	Populates a "Balloon Errors" widget.
 	"""
 	def updateBalloonErrors(self, message):
-		timestamp = datetime.datetime.now().strftime("%H:%M - ")
-
-		self.latestErrorsTextEdit.moveCursor(QTextCursor.Start, 0)
-		self.latestErrorsTextEdit.insertPlainText(timestamp + message)
+		# Shown with the time received, "%H:%M:%S - ", by consoleEntry.format()
+		message = message.rstrip("\n")
+		self.latestErrorsBuffer.addEntry(message, "hab", "error")
 
 	"""
-	Populates a "Console" widget.
+	Populates the "Latency Diagnostics" widget: per stage and callsign latency
+	percentiles from the latency tracker, refreshed every second while shown.
 	"""
-	def createRadioConsole(self):
-		layout = QtGui.QGridLayout(self.radioConsoleWidget)
+	def createLatencyDiagnosticsWidget(self):
+		layout = QtGui.QGridLayout(self.latencyDiagnosticsWidget)
 		layout.setSpacing(0)
 
-		# Set up labels
-		radioConsoleCloseButton = QtGui.QPushButton("Close")
-		radioConsoleCloseButton.clicked.connect(self.radioConsoleWidget.close)
+		recordCheckBox = QtGui.QCheckBox("Record latencies")
+		recordCheckBox.setChecked(self.latencyTracker.enabled)
+		recordCheckBox.toggled.connect(self.latencyTracker.setEnabled)
+
+		resetButton = QtGui.QPushButton("Reset")
+		resetButton.clicked.connect(self.latencyTracker.reset)
+
+		dumpButton = QtGui.QPushButton("Dump to File")
+		dumpButton.clicked.connect(self.dumpLatencyDiagnostics)
+
+		closeButton = QtGui.QPushButton("Close")
+		closeButton.clicked.connect(self.latencyDiagnosticsWidget.close)
+
+		self.latencyTable.setColumnCount(7)
+		self.latencyTable.setHorizontalHeaderLabels(["Stage", "Callsign", "Frames", "p50 ms", "p95 ms", "p99 ms", "Max ms"])
+		self.latencyTable.verticalHeader().setVisible(False)
+		self.latencyTable.setEditTriggers(QtGui.QAbstractItemView.NoEditTriggers)
+		self.latencyTable.setMinimumSize(560, 300)
+
+		layout.addWidget(recordCheckBox, 0, 0)
+		layout.addWidget(self.latencyTable, 1, 0, 10, 4)
+		layout.addWidget(resetButton, 11, 0)
+		layout.addWidget(dumpButton, 11, 1)
+		layout.addWidget(closeButton, 11, 3)
 
-		self.radioConsoleTextEdit.setMinimumSize(300, 200)
-		self.radioConsoleTextEdit.setReadOnly(True)
+		self.latencyRefreshTimer.timeout.connect(self.updateLatencyDiagnostics)
 
-		layout.addWidget(self.radioConsoleTextEdit, 1, 0, 10, 5)
-		layout.addWidget(radioConsoleCloseButton, 11, 2)
+		self.latencyDiagnosticsWidget.setLayout(layout)
+		self.latencyDiagnosticsWidget.setWindowTitle("Latency Diagnostics")
+
+	def showLatencyDiagnostics(self):
+		self.updateLatencyDiagnostics()
+		self.latencyRefreshTimer.start(1000)
+		self.latencyDiagnosticsWidget.show()
+
+	def updateLatencyDiagnostics(self):
+		if not (self.latencyDiagnosticsWidget.isVisible()):
+			self.latencyRefreshTimer.stop()
+
+		summaries = self.latencyTracker.getSummaries()
+		self.latencyTable.setRowCount(len(summaries))
+
+		for row, (stage, callsign, count, p50, p95, p99, maximum) in enumerate(summaries):
+			values = [stage, callsign, str(count)] + ["%.3f" % (value * 1000) for value in (p50, p95, p99, maximum)]
+			for column, value in enumerate(values):
+				self.latencyTable.setItem(row, column, QtGui.QTableWidgetItem(value))
+
+	def dumpLatencyDiagnostics(self):
+		fileName = QtGui.QFileDialog.getSaveFileName(self, "Dump Latency Diagnostics", "MoGS_latency_dump.txt")
+		if (len(fileName) > 0):
+			try:
+				self.latencyTracker.dump(str(fileName))
+				logGui("Latency diagnostics written to " + str(fileName))
+			except:
+				logGui("Unable to write latency diagnostics to " + str(fileName))
 
-		self.radioConsoleWidget.setLayout(layout)
-		self.radioConsoleWidget.setWindowTitle("Radio Console Viewer")
+	"""
+	Populates a "Console" widget.
+	"""
+	def createRadioConsole(self):
+		self.guiRefreshTimer.timeout.connect(self.radioConsoleWidget.refresh)
 
 	"""
-	Populates and displays a "Console" widget.
+	Adds raw radio traffic to the console. The window catches up on its next
+	refresh.
 	"""
 	def updateRadioConsole(self, message):
-		timestamp = datetime.datetime.now().strftime("%H:%M - ")
-
-		self.radioConsoleTextEdit.moveCursor(QTextCursor.Start, 0)
-		self.radioConsoleTextEdit.insertPlainText(timestamp + message)
-		self.radioConsoleTextEdit.show()
+		self.radioConsoleBuffer.addText(message)
 
 	def utcToLocalTime(self, timestamp):
 		hours = int(timestamp[:2])
@@ -673,8 +759,9 @@ class mogsMainWindow(QtGui.QMainWindow):
 	No return value
 	"""
 	def updateBalloonDataTelemetry(self, data):
+		latencyStamp = self.latencyTracker.handlerStarted("balloonData")
 		logTelemetry(data)
-		self.statusLabelList["hab"].setStyleSheet("QFrame { background-color: Green }")
+		self.telemetryView.setStyleSheet(("status", "hab"), "QFrame { background-color: Green }")
 
 		while (len(self.dataTelemetryList) > self.telemetryValuesToInclude):
 			self.dataTelemetryList.pop(0)
@@ -685,58 +772,55 @@ class mogsMainWindow(QtGui.QMainWindow):
 			timestamp = splitMessage[0]
 			if (len(timestamp) > 0):
 				timestamp = self.utcToLocalTime(timestamp)
-				self.telemetryLabelDictionary["timestamp"].setText(timestamp)
+				self.telemetryView.setText("timestamp", timestamp)
 
 			latitude = splitMessage[1]
 			longitude = splitMessage[2]
 			if (len(latitude) > 0 and len(longitude) > 0):
-				self.telemetryLabelDictionary["gps"].setText(latitude + ", " + longitude)
-				self.telemetryLabelDictionary["gps"].setStyleSheet("QLabel { color: black }")
+				self.telemetryView.setText("gps", latitude + ", " + longitude)
+				self.telemetryView.setStyleSheet("gps", "QLabel { color: black }")
 
-				self.vehicleLocationList["hab"][0].append(float(latitude))
-				self.vehicleLocationList["hab"][1].append(float(longitude))
+				trackAltitude = float("nan")
+				if (len(splitMessage[3]) > 0):
+					trackAltitude = float(splitMessage[3])
+				self.vehicleTracks.append("hab", time.time(), float(latitude), float(longitude), trackAltitude)
 
 				if (self.offlineModeEnabled):
-					self.updatePlot()
+					self.offlinePlotPending.add("hab")
 
 				else:
 					# Update the map to show new waypoint
-					javascriptCommand = "addVehicleWaypoint({}, {}, {}, \"{}\");".format(
-										self.javaArrayPosition["hab"],
-										latitude,
-										longitude,
-										timestamp)
-					self.theMap.documentElement().evaluateJavaScript(javascriptCommand)
+					self.mapBridge.addVehicleWaypoint(self.javaArrayPosition["hab"], latitude, longitude, timestamp)
 			else:
-				self.telemetryLabelDictionary["gps"].setStyleSheet("QLabel { color: grey }")
+				self.telemetryView.setStyleSheet("gps", "QLabel { color: grey }")
 
 			altitude = splitMessage[3]
 			if (len(altitude) > 0):
-				self.telemetryLabelDictionary["altitude"].setText(altitude + " m")
-				self.telemetryLabelDictionary["altitude"].setStyleSheet("QLabel { color: black }")
+				self.telemetryView.setText("altitude", altitude + " m")
+				self.telemetryView.setStyleSheet("altitude", "QLabel { color: black }")
 			else:
-				self.telemetryLabelDictionary["altitude"].setStyleSheet("QLabel { color: grey }")
+				self.telemetryView.setStyleSheet("altitude", "QLabel { color: grey }")
 
 
 			innerTemp = splitMessage[4]
 			if (len(innerTemp) > 0):
-				self.telemetryLabelDictionary["tempInside"].setText(innerTemp + " C")
+				self.telemetryView.setText("tempInside", innerTemp + " C")
 
 			outerTemp = splitMessage[5]
 			if (len(outerTemp) > 0):
-				self.telemetryLabelDictionary["tempOutside"].setText(outerTemp + " C")
+				self.telemetryView.setText("tempOutside", outerTemp + " C")
 
 			batteryTemp = splitMessage[6]
 			if (len(batteryTemp) > 0):
-				self.telemetryLabelDictionary["tempBattery"].setText(batteryTemp + " C")
+				self.telemetryView.setText("tempBattery", batteryTemp + " C")
 
 			voltage = splitMessage[7]
 			if (len(voltage) > 0):
-				self.telemetryLabelDictionary["voltage"].setText(voltage + " V")
+				self.telemetryView.setText("voltage", voltage + " V")
 
 			humidity = splitMessage[8]
 			if (len(humidity) > 0):
-				self.telemetryLabelDictionary["humidity"].setText(humidity + " %")
+				self.telemetryView.setText("humidity", humidity + " %")
 
 			accelX = splitMessage[9]
 			accelY = splitMessage[10]
@@ -745,29 +829,30 @@ class mogsMainWindow(QtGui.QMainWindow):
 			magnitude = self.computeMagnitude(accelX, accelY, accelZ)
 
 			self.parseReportedErrors(int(splitMessage[12]))
-			self.telemetryLabelDictionary["errors"].setText(str(self.totalErrorsReceived))
+			self.telemetryView.setText("errors", str(self.totalErrorsReceived))
 
 			if (len(magnitude) > 0):
-				self.telemetryLabelDictionary["magnitude"].setText(magnitude)
+				self.telemetryView.setText("magnitude", magnitude)
 
 			try:
 				groundSpeed, ascentRate = self.calculateRates()
-				self.telemetryLabelDictionary["speed"].setText(groundSpeed + " m/s")
-				self.telemetryLabelDictionary["ascent"].setText(ascentRate + " m/s")
+				self.telemetryView.setText("speed", groundSpeed + " m/s")
+				self.telemetryView.setText("ascent", ascentRate + " m/s")
 			except:
 				logGui("Could not parse lat and long from HAB telemetry packet")
-				self.telemetryLabelDictionary["speed"].setText("None")
-				self.telemetryLabelDictionary["ascent"].setText("None")
+				self.telemetryView.setText("speed", "None")
+				self.telemetryView.setText("ascent", "None")
 
 			# Update for the dish driving/pointing
 			if self.serialHandler.RADIO_CALLSIGN == "nps":
 				try:
 					print("Starting the pointing")
-					(az, el) = self.dishHandler.compute_bearing(float(latitude),
-																float(longitude),
-																float(altitude))
-					print("Computed, starting pointing")
-					self.dishHandler.point(az, el)
+					with self.latencyTracker.measure("dishPointing", "hab"):
+						(az, el) = self.dishHandler.compute_bearing(float(latitude),
+																	float(longitude),
+																	float(altitude))
+						print("Computed, starting pointing")
+						self.dishHandler.point(az, el)
 					print("Done pointing")
 				except:
 					print("Error in computing or pointing")
@@ -777,8 +862,12 @@ class mogsMainWindow(QtGui.QMainWindow):
 
 		except:
 			logTelemetry("Invalid data packet - data was not processed.")
+			self.serialHandler.reportInvalidPacket("balloonData")
+
+		self.latencyTracker.guiCommitted(latencyStamp)
 
 	def updateChaseVehicleTelemetry(self, data):
+		latencyStamp = self.latencyTracker.handlerStarted("vehicleData")
  		logTelemetry(data)
 
  		try:
@@ -792,48 +881,58 @@ class mogsMainWindow(QtGui.QMainWindow):
 			latitude = splitMessage[2]
 			longitude = splitMessage[3]
 			if (len(latitude) > 0 and len(longitude) > 0):
-				self.chaseVehicleGpsLabel[callsign][1].setText(latitude + ", " + longitude)
-
-				self.vehicleLocationList[callsign][0].append(float(latitude))
-				self.vehicleLocationList[callsign][1].append(float(longitude))
+				self.vehicleTracks.append(callsign, time.time(), float(latitude), float(longitude))
 
 				if (self.offlineModeEnabled):
-					self.updatePlot()
+					self.offlinePlotPending.add(callsign)
 
 				else:
 					# Update the map to show new waypoint
-					javascriptCommand = "addVehicleWaypoint({}, {}, {}, \"{}\");".format(
-										self.javaArrayPosition[callsign],
-										latitude,
-										longitude,
-										timestamp)
-
-					self.theMap.documentElement().evaluateJavaScript(javascriptCommand)
+					self.mapBridge.addVehicleWaypoint(self.javaArrayPosition[callsign], latitude, longitude, timestamp)
 
-				self.chaseVehicleGpsLabel[callsign][0].setText("{} - {}".format(self.callsignToString[callsign], timestamp))
-				self.chaseVehicleGpsLabel[callsign][1].setText("{}, {}".format(latitude, longitude))
+				self.telemetryView.setText(("chaseTime", callsign), "{} - {}".format(self.callsignToString[callsign], timestamp))
+				self.telemetryView.setText(("chasePosition", callsign), "{}, {}".format(latitude, longitude))
 
-			self.statusLabelList[callsign].setStyleSheet("QFrame { background-color: Green }")
+			self.telemetryView.setStyleSheet(("status", callsign), "QFrame { background-color: Green }")
 #
 		except:
 			print("Failure to parse chase vehicle telemetry")
 			logTelemetry("Invalid data packet - data was not processed.")
+			self.serialHandler.reportInvalidPacket("vehicleData")
 
+		self.latencyTracker.guiCommitted(latencyStamp)
+
+	# Runs on the refresh tick and redraws the curves of vehicles with new
+	# points, or all of them once the view has moved
 	def updatePlot(self):
-		try:
-			self.offlineMapGraphWidget.clear()
-
-			for key, value in self.vehicleLocationList.items():
-				print("Key: " + key)
-				print("Value " + str(value))
-				itemsToGraph = pg.PlotDataItem(value[0], value[1])
-				print("Created plotdataitem")
-				itemsToGraph.setPen(self.vehiclePlotColor[key])
-				print("Set pen color")
-				self.offlineMapGraphWidget.addItem(itemsToGraph)
-				print("Added plot to widget")
-		except:
-			print("Unable to plot data due to exception")
+		if (len(self.offlinePlotPending) == 0):
+			return
+
+		pendingCallsigns = self.offlinePlotPending
+		self.offlinePlotPending = set()
+
+		with self.latencyTracker.measure("updatePlot"):
+			bounds = None
+			if (self.offlinePlotClipToView):
+				(south, north), (west, east) = self.offlineMapGraphWidget.getViewBox().viewRange()
+				bounds = (south, north, west, east)
+
+			for callsign in pendingCallsigns:
+				curve = self.offlinePlotCurves.get(callsign)
+				if (curve is None):
+					continue
+
+				try:
+					displayPoints = self.vehicleTracks.getTrack(callsign).getDisplayPoints(self.MAX_LOCATIONS, bounds)
+					if (displayPoints[0] is not self.offlinePlotShown.get(callsign)):
+						curve.setData(displayPoints[0], displayPoints[1])
+						self.offlinePlotShown[callsign] = displayPoints[0]
+				except:
+					print("Unable to plot data for " + callsign + " due to exception")
+
+	def offlinePlotViewChanged(self, viewBox = None, viewRange = None):
+		if (self.offlinePlotClipToView):
+			self.offlinePlotPending.update(self.offlinePlotCurves.keys())
 
 	def parseReportedErrors(self, errors):
 		reportedErrors = []
@@ -887,9 +986,9 @@ class mogsMainWindow(QtGui.QMainWindow):
 	def processBalloonInitMessage(self, message):
 		self.balloonUptime = datetime.datetime.now().strftime("%H:%M - ")
 		try:
-			self.telemetryLabelDictionary["startup"].setText(message.split(",")[1])
+			self.telemetryView.setText("startup", message.split(",")[1])
 		except:
-			self.telemetryLabelDictionary["startup"].setText("Unknown")
+			self.telemetryView.setText("startup", "Unknown")
 
 	def processBalloonCommandResponse(self, message):
 		if (message == "BRM_ARMED"):
@@ -943,7 +1042,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 
 		elif (message[:4] == "DISK"):
 			try:
-				self.telemetryLabelDictionary["disk"].setText(message[5:])
+				self.telemetryView.setText("disk", message[5:])
 				self.commandStatusLabel.setText("Balloon disk space updated")
 			except:
 				self.commandStatusLabel.setText("Unable to parse disk space. Try again.")
@@ -952,6 +1051,10 @@ class mogsMainWindow(QtGui.QMainWindow):
 			self.commandStatusLabel.setText("Unknown command response received")
 			print("Unknown: " + str(message))
 
+	def processCommandTimeout(self, commandName):
+		self.commandStatusLabel.setText("No response to " + commandName + " - try again")
+		logGui("Command timed out: " + commandName)
+
 	def addMarker(self):
 		dialogWindow = QtGui.QDialog()
 		layout = QtGui.QGridLayout()
@@ -994,9 +1097,8 @@ class mogsMainWindow(QtGui.QMainWindow):
 					long = float(str(longLineEdit.text()))
 					note = str(noteLineEdit.text())
 
-					jsCommand = "addMarkerManually({}, {}, \"{}\");".format(lat, long, note)
-					logGui(jsCommand)
-					self.theMap.documentElement().evaluateJavaScript(jsCommand)
+					logGui("Manual marker at {}, {}: {}".format(lat, long, note))
+					self.mapBridge.addMarkerManually(lat, long, note)
 
 				except:
 					self.commandStatusLabel.setText("Unable to process GPS coordinates")
@@ -1056,33 +1158,32 @@ class mogsMainWindow(QtGui.QMainWindow):
 				try:
 					messageLabelString = "Requesting "
 
-					self.serialHandler.requestedSnapshotBurst = int(str(photosPerBurstSpinBox.value()))
-					self.serialHandler.requestedSnapshotInterval = int(str(intervalLengthSpinBox.value()))
+					requestedBurst = int(str(photosPerBurstSpinBox.value()))
+					requestedInterval = int(str(intervalLengthSpinBox.value()))
 
-					messageLabelString += ("updated burst of " + str(self.serialHandler.requestedSnapshotBurst) +
-										" images every " + str(self.serialHandler.requestedSnapshotInterval) +
+					messageLabelString += ("updated burst of " + str(requestedBurst) +
+										" images every " + str(requestedInterval) +
 										" seconds")
 
 					self.commandStatusLabel.setText(messageLabelString)
-					self.serialHandler.changeSnapshotIntervalFlag = True
+					self.serialHandler.commandChannel.put(snapshotRequestCommand(requestedBurst, requestedInterval))
 				except:
 					self.commandStatusLabel.setText("Unable to process supplied information")
 
 	def takeBurstNow(self):
 		messageLabelString = "Requesting "
 
-		self.serialHandler.requestedSnapshotBurst = 10
-		self.serialHandler.requestedSnapshotInterval = -1
+		requestedBurst = 10
 
 		messageLabelString += ("single burst of " +
-							str(self.serialHandler.requestedSnapshotBurst) + " images now")
+							str(requestedBurst) + " images now")
 
 		self.commandStatusLabel.setText(messageLabelString)
-		self.serialHandler.changeSnapshotIntervalFlag = True
+		self.serialHandler.commandChannel.put(snapshotRequestCommand(requestedBurst, -1))
 
 
 	def requestDiskSpace(self):
-		self.serialHandler.requestDiskSpaceFlag = True
+		self.serialHandler.commandChannel.put(diskSpaceRequestCommand())
 		self.commandStatusLabel.setText("Requesting disk space available...")
 
 	def armBalloonRelease(self):
@@ -1126,13 +1227,11 @@ class mogsMainWindow(QtGui.QMainWindow):
 
 		if (popupWidget.exec_()):
 			if (armButton.isChecked()):
-				self.serialHandler.armBalloonFlag = True
-				self.serialHandler.disarmBalloonFlag = False
+				self.serialHandler.commandChannel.put(armBalloonReleaseCommand())
 				self.releaseBalloonButton.setDisabled(False)
 				self.commandStatusLabel.setText("Sent arming command, waiting for response...")
 			elif (disarmButton.isChecked()):
-				self.serialHandler.disarmBalloonFlag = True
-				self.serialHandler.armBalloonFlag = False
+				self.serialHandler.commandChannel.put(disarmBalloonReleaseCommand())
 				self.releaseBalloonButton.setDisabled(True)
 				self.releaseBalloonButton.setStyleSheet("background-color: Salmon")
 				self.commandStatusLabel.setText("Sent command to disarm the BRM, waiting for response...")
@@ -1140,8 +1239,8 @@ class mogsMainWindow(QtGui.QMainWindow):
 	"""
 	Shows popup window that confirms the release of the balloon.
 	If not confirmed, does not release the balloon.
-	If confirmed, sets the "releaseBalloonFlag" to true, which will be 
-	handled by the Radio class on its next operation.
+	If confirmed, puts a releaseBalloonCommand on the serial handler's
+	command channel.
 	"""
 	def confirmAndReleaseBalloon(self):
 		confirmStatement = "Would you like to activate the balloon release mechanism?"
@@ -1149,7 +1248,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 				confirmStatement, QtGui.QMessageBox.Yes, QtGui.QMessageBox.No)
 
 		if (response == QtGui.QMessageBox.Yes):
-			self.serialHandler.releaseBalloonFlag = True
+			self.serialHandler.commandChannel.put(releaseBalloonCommand())
 			self.commandStatusLabel.setText("Commanding balloon release. Waiting for confirmation...")
 		else:
 			print("Negative response - Not releasing balloon")
@@ -1158,8 +1257,8 @@ class mogsMainWindow(QtGui.QMainWindow):
 	"""
 	Shows popup window that confirms the release of the balloon.
 	If not confirmed, does not release the balloon.
-	If confirmed, sets the "releaseBalloonFlag" to true, which will be 
-	handled by the Radio class on its next operation.
+	If confirmed, puts a resetBalloonReleaseCommand on the serial handler's
+	command channel.
 	"""
 	def resetBalloonRelease(self):
 		confirmStatement = "Are you sure you want to reset the BRM?"
@@ -1167,7 +1266,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 				confirmStatement, QtGui.QMessageBox.Yes, QtGui.QMessageBox.No)
 
 		if (response == QtGui.QMessageBox.Yes):
-			self.serialHandler.resetBalloonReleaseFlag = True
+			self.serialHandler.commandChannel.put(resetBalloonReleaseCommand())
 			self.commandStatusLabel.setText("Commanding BRM reset. Waiting for response...")
 
 	"""
@@ -1176,7 +1275,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 	"""
 	def sendMessage(self):
 		userMessage = str(self.sendMessageEntryBox.text())
-		self.serialHandler.userMessagesToSend.append(userMessage)
+		self.serialHandler.commandChannel.put(chatMessageCommand(userMessage))
 		self.sendMessageEntryBox.clear()
 
 	"""
@@ -1197,9 +1296,8 @@ class mogsMainWindow(QtGui.QMainWindow):
 			self.changeSettings()
 
 	def clearManualMarkers(self):
-		javascriptCommand = "clearManualMarkers();"
-		logGui(javascriptCommand)
-		self.theMap.documentElement().evaluateJavaScript(javascriptCommand)
+		logGui("Clearing manual markers")
+		self.mapBridge.clearManualMarkers()
 
 	def precisionSpinBoxHelp(self):
 		helpString = ("To calculate the ascent rate and ground speed\n" +
@@ -1281,14 +1379,12 @@ class mogsMainWindow(QtGui.QMainWindow):
 					landingLat, landingLong, unused = landingLine[20:-23].split(",")
 
 					# Update the map to show new waypoint
-					javascriptCommand = "plotPredictionLine({}, {}, \"Cheese\");".format(
-										float(launchLat), float(launchLong))
+					self.mapBridge.plotPredictionLine(launchLat, launchLong, "Cheese")
 # 					javascriptCommand = "plotPredictionLine({}, {}, {}, {}, {}, {});".format(
 # 										launchLat, launchLong,
 # 										burstLat, burstLong,
 # 										landingLat, landingLong)
-					self.theMap.documentElement().evaluateJavaScript(javascriptCommand)
-					print(javascriptCommand)
+					print("Prediction launch point {}, {}".format(launchLat, launchLong))
 
 				except:
 					QtGui.QMessageBox.information(self, "Error", "Could not open image",
@@ -1372,6 +1468,10 @@ class mogsMainWindow(QtGui.QMainWindow):
 		if (self.offlineModeEnabled):
 			offlineModeCheckBox.setChecked(True)
 
+		clipToViewCheckBox = QtGui.QCheckBox("Offline map detail follows zoom")
+		if (self.offlinePlotClipToView):
+			clipToViewCheckBox.setChecked(True)
+
 		testModeCheckBox = QtGui.QCheckBox("DEV ONLY: Enable test mode")
 		if (self.serialHandler.TEST_MODE):
 			testModeCheckBox.setChecked(True)
@@ -1396,6 +1496,7 @@ class mogsMainWindow(QtGui.QMainWindow):
 		windowLayout.addWidget(offlineModeCheckBox, 6, 1, 1, 2)
 		windowLayout.addWidget(openDialogOnFailureCheckBox, 7, 1, 1, 2)
 		windowLayout.addWidget(testModeCheckBox, 8, 1, 1, 2)
+		windowLayout.addWidget(clipToViewCheckBox, 9, 1, 1, 2)
 
 		windowLayout.addWidget(selectButton, 10, 1)
 		windowLayout.addWidget(cancelButton, 10, 2)
@@ -1407,11 +1508,11 @@ class mogsMainWindow(QtGui.QMainWindow):
 			if (len(radioPortTextBox.text()) > 0 and
 				str(radioPortTextBox.text()) != self.serialHandler.RADIO_SERIAL_PORT):
 				self.serialHandler.RADIO_SERIAL_PORT = str(radioPortTextBox.text().replace("\n", ""))
-				self.serialHandler.radioSerialPortChanged = True
+				self.serialHandler.commandChannel.put(openRadioPortCommand(self.serialHandler.RADIO_SERIAL_PORT))
 			if (len(gpsPortTextBox.text()) > 0 and
 				str(gpsPortTextBox.text()) != self.serialHandler.GPS_SERIAL_PORT):
 				self.serialHandler.GPS_SERIAL_PORT = str(gpsPortTextBox.text().replace("\n", ""))
-				self.serialHandler.gpsSerialPortChanged = True
+				self.serialHandler.commandChannel.put(openGpsPortCommand(self.serialHandler.GPS_SERIAL_PORT))
 			if (len(gpsRateLineEdit.text()) > 0 and
 				str(gpsRateLineEdit.text()) != self.serialHandler.HEARTBEAT_INTERVAL):
 				self.serialHandler.HEARTBEAT_INTERVAL = int(gpsRateLineEdit.text().replace("\n", ""))
@@ -1433,6 +1534,9 @@ class mogsMainWindow(QtGui.QMainWindow):
 				self.serialHandler.TEST_MODE = True
 			else:
 				self.serialHandler.TEST_MODE = False
+			if (clipToViewCheckBox.isChecked() != self.offlinePlotClipToView):
+				self.offlinePlotClipToView = clipToViewCheckBox.isChecked()
+				self.offlinePlotPending.update(self.offlinePlotCurves.keys())
 
 
 			self.telemetryValuesToInclude = int(precisionSpinBox.value())
@@ -1455,6 +1559,10 @@ class mogsMainWindow(QtGui.QMainWindow):
 				settingsFile.write("True\n")
 			else:
 				settingsFile.write("False\n")
+			if (self.offlinePlotClipToView):
+				settingsFile.write("True\n")
+			else:
+				settingsFile.write("False\n")
 
 		self.serialHandler.settingsWindowOpen = False
 
@@ -1465,11 +1573,35 @@ class mogsMainWindow(QtGui.QMainWindow):
 			self.updateSpotButton.setEnabled(True)
 
 
-		for callsign, label in self.statusLabelList.items():
+		for callsign in self.statusLabelList:
 			if (self.serialHandler.activeNodes[callsign] > 0):
-				label.setStyleSheet("QFrame { background-color: Green }")
+				self.telemetryView.setStyleSheet(("status", callsign), "QFrame { background-color: Green }")
 			else:
-				label.setStyleSheet("QFrame { background-color: Salmon }")
+				self.telemetryView.setStyleSheet(("status", callsign), "QFrame { background-color: Salmon }")
+
+	def evaluateMapScript(self, script):
+		with self.latencyTracker.measure("evaluateJavaScript"):
+			self.theMap.documentElement().evaluateJavaScript(script)
+
+	# Ends the radio loop, which closes the archive, the SQLite writer and the
+	# ports on its way out, then writes out the queued log lines
+	def closeEvent(self, event):
+		self.guiRefreshTimer.stop()
+		self.serialHandler.stop()
+
+		# The loop wakes within a read timeout; if it is stuck, close what it
+		# owns from here so the last batch is still written
+		if not (self.serialHandler.wait(5000)):
+			logGui("Radio loop did not stop, closing its files from the GUI")
+			self.serialHandler.closePorts()
+
+		self.vehicleTracks.close()
+		stopLogWriter()
+		event.accept()
+
+	def refreshTelemetryLabels(self):
+		with self.latencyTracker.measure("labelRefresh"):
+			self.telemetryView.applyChanges()
 
 	def updateSpotPositions(self):
 		spotXmlFile = urllib2.urlopen(SPOT_API_URL)
@@ -1489,13 +1621,9 @@ class mogsMainWindow(QtGui.QMainWindow):
 
 			if (self.spotToVehicleDictionary[name] != "nps"):
 				# Update the map to show new waypoint
-				javascriptCommand = "addSpotMarker({}, {}, {}, \"{}\");".format(
-									self.javaArrayPosition[self.spotToVehicleDictionary[name]],
-									lat,
-									long,
-									"SPOT: " + timestamp)
-				logGui(javascriptCommand)
-				self.theMap.documentElement().evaluateJavaScript(javascriptCommand)
+				logGui("SPOT {}: {}, {} at {}".format(name, lat, long, timestamp))
+				self.mapBridge.addSpotMarker(self.javaArrayPosition[self.spotToVehicleDictionary[name]],
+											lat, long, "SPOT: " + timestamp)
 
 		self.updateSpotButton.setDisabled(True)
 		self.spotButtonDisabledTime = time.time()
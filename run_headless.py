@@ -0,0 +1,158 @@
+"""
+Runs a ground station node without the GUI.
+
+Uses the same telemetryCore as run_MoGS.py, so radio, GPS, logging and
+command handling behave the same. Settings are read from mogsSettings.db if
+it exists and can be overridden on the command line. Received traffic is
+printed to the console. A node with the "nps" callsign also points the dish
+at the balloon.
+
+Usage: python run_headless.py [--radio-port PORT] [--gps-port PORT] [--callsign NAME]
+       python run_headless.py --replay LOG [LOG ...] [--speed X] [--start-offset S]
+
+--latency-dump FILE records how long each frame takes from the port to its
+handlers (see latencyTracker.py) and writes the percentiles to FILE on exit.
+
+Counters for a dashboard are served at http://127.0.0.1:9180/metrics, see
+metricsServer.py. --metrics-port 0 turns this off.
+"""
+from __future__ import print_function
+
+import sys
+import argparse
+import threading
+from logger import *
+from telemetryCore import telemetryCore
+
+
+# Points the dish at the newest balloon position. Pointing blocks until the
+# dish has moved, so it runs on its own thread and skips positions that
+# arrived in the meantime
+class dishPointingThread(threading.Thread):
+	def __init__(self, dishHandler, latencyTracker):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.dishHandler = dishHandler
+		self.latencyTracker = latencyTracker
+		self.latestPosition = None
+		self.positionReceived = threading.Event()
+
+	# Subscribed to "balloonData"
+	def updateBalloonPosition(self, payload):
+		try:
+			splitMessage = payload.split(",")
+			self.latestPosition = (float(splitMessage[1]), float(splitMessage[2]), float(splitMessage[3]))
+			self.positionReceived.set()
+		except:
+			logTelemetry("Invalid data packet - no position to point the dish at.")
+
+	def run(self):
+		while (True):
+			self.positionReceived.wait()
+			self.positionReceived.clear()
+			latitude, longitude, altitude = self.latestPosition
+
+			try:
+				with self.latencyTracker.measure("dishPointing", "hab"):
+					(az, el) = self.dishHandler.compute_bearing(latitude, longitude, altitude)
+					self.dishHandler.point(az, el)
+			except:
+				print("Error in computing or pointing")
+
+
+def readSettings(core, settingsFileName):
+	try:
+		settingsFile = open(settingsFileName, "r")
+		core.HEARTBEAT_INTERVAL = int(settingsFile.readline()[:-1])
+		core.RADIO_SERIAL_PORT = settingsFile.readline()[:-1]
+		core.RADIO_CALLSIGN = settingsFile.readline()[:-1]
+		core.GPS_SERIAL_PORT = settingsFile.readline()[:-1]
+		settingsFile.close()
+	except:
+		logGui("No Settings found")
+
+
+def printEvent(prefix):
+	def printValue(value):
+		print(prefix + str(value).rstrip())
+	return printValue
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Headless MoGS ground station")
+	parser.add_argument("--settings", default = "mogsSettings.db", help = "settings file written by the GUI")
+	parser.add_argument("--radio-port", help = "radio serial port, e.g. /dev/ttyUSB0")
+	parser.add_argument("--gps-port", help = "GPS serial port")
+	parser.add_argument("--callsign", help = "this node's radio callsign")
+	parser.add_argument("--heartbeat-interval", type = int, help = "seconds between heartbeats")
+	parser.add_argument("--database", help = "also store every frame in this SQLite file")
+	parser.add_argument("--replay", nargs = "+", help = "replay these logs instead of using the radio")
+	parser.add_argument("--speed", type = float, default = 1.0, help = "replay speed, 0 for as fast as possible")
+	parser.add_argument("--start-offset", type = float, default = 0, help = "seconds into the replay to start at")
+	parser.add_argument("--latency-dump", help = "record per-frame latencies and write them to this file on exit")
+	parser.add_argument("--metrics-port", type = int, help = "serve Prometheus metrics on this port, 0 for none")
+	parser.add_argument("--metrics-address", help = "address to serve metrics on, 127.0.0.1 by default")
+	parser.add_argument("--quiet", action = "store_true", help = "only print errors")
+	args = parser.parse_args()
+
+	core = telemetryCore()
+	readSettings(core, args.settings)
+
+	if (args.radio_port is not None):
+		core.RADIO_SERIAL_PORT = args.radio_port
+	if (args.gps_port is not None):
+		core.GPS_SERIAL_PORT = args.gps_port
+	if (args.callsign is not None):
+		core.RADIO_CALLSIGN = args.callsign
+	if (args.heartbeat_interval is not None):
+		core.HEARTBEAT_INTERVAL = args.heartbeat_interval
+	if (args.database is not None):
+		core.TELEMETRY_DATABASE_FILE = args.database
+	if (args.latency_dump is not None):
+		core.latencyTracker.setEnabled(True)
+	if (args.metrics_port is not None):
+		core.METRICS_PORT = args.metrics_port if args.metrics_port > 0 else None
+	if (args.metrics_address is not None):
+		core.METRICS_ADDRESS = args.metrics_address
+	if (args.replay is not None):
+		core.TEST_MODE = True
+		core.REPLAY_LOG_FILES = args.replay
+		core.REPLAY_SPEED = args.speed if args.speed > 0 else None
+		core.REPLAY_START_OFFSET = args.start_offset
+
+	core.subscribe("invalidSerialPort", printEvent("ERROR: "))
+	core.subscribe("commandTimedOut", printEvent("No acknowledgement for "))
+
+	if not (args.quiet):
+		core.subscribe("chatMessage", printEvent(""))
+		core.subscribe("balloonData", printEvent("HAB data: "))
+		core.subscribe("balloonAck", printEvent("HAB ack: "))
+		core.subscribe("balloonInit", printEvent("HAB init: "))
+		core.subscribe("vehicleData", printEvent("Vehicle: "))
+
+	if (core.RADIO_CALLSIGN == "nps"):
+		try:
+			from dishHandler import dishHandlerThread
+			dishPointer = dishPointingThread(dishHandlerThread(), core.latencyTracker)
+			core.dishHandler = dishPointer.dishHandler
+			core.subscribe("balloonData", dishPointer.updateBalloonPosition)
+			dishPointer.start()
+		except:
+			print("Unable to connect to the dish, not pointing")
+
+	print("{} on radio {}, GPS {}".format(core.RADIO_CALLSIGN, core.RADIO_SERIAL_PORT, core.GPS_SERIAL_PORT))
+
+	try:
+		core.run()
+	except KeyboardInterrupt:
+		core.closePorts()
+
+	if (args.latency_dump is not None):
+		core.latencyTracker.dump(args.latency_dump)
+		print(core.latencyTracker.format())
+
+
+if __name__ == '__main__':
+	logRadio("\n\nStarting Radio log\n")
+	logTelemetry("\n\nStarting telemetry log\n")
+	main()
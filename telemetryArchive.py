@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import struct
+
+"""
+Append-only binary archive of balloon and chase vehicle telemetry.
+
+Each node gets a directory under the archive with one file per column. The
+file holds that column's values back to back as fixed-width little-endian
+numbers, and schema.json lists every column and its NumPy dtype. A whole
+flight loads into NumPy with one memmap per column, with no parsing or copy:
+
+	columns = loadArchive("MoGS_archive", "hab")
+	maxAltitude = numpy.nanmax(columns["altitude"])
+
+Missing or unparseable fields are stored as NaN, or -1 for the error mask. If
+a write is cut short the column files can differ in length by a record;
+loadArchive() trims them all to the shortest.
+"""
+ARCHIVE_DIRECTORY = r"MoGS_archive"
+ARCHIVE_FLUSH_INTERVAL = 1.0
+
+MISSING_ERRORS = -1
+
+# (column, dtype) in the order the fields appear in a "hab,data" payload,
+# after receivedTime which is the ground station's clock
+BALLOON_COLUMNS = [("receivedTime", "<f8"),
+					("gpsTime", "<f8"),        # seconds into the UTC day
+					("latitude", "<f8"),
+					("longitude", "<f8"),
+					("altitude", "<f4"),
+					("tempInside", "<f4"),
+					("tempOutside", "<f4"),
+					("tempBattery", "<f4"),
+					("voltage", "<f4"),
+					("humidity", "<f4"),
+					("accelX", "<f4"),
+					("accelY", "<f4"),
+					("accelZ", "<f4"),
+					("errors", "<i4")]
+
+CHASE_COLUMNS = [("receivedTime", "<f8"),
+				("gpsTime", "<f8"),
+				("latitude", "<f8"),
+				("longitude", "<f8")]
+
+# NumPy dtype -> struct format used to write it
+STRUCT_FORMATS = {"<f8" : "<d",
+				"<f4" : "<f",
+				"<i4" : "<i"}
+
+
+def toFloat(field):
+	try:
+		return float(field)
+	except ValueError:
+		return float("nan")
+
+
+# "HHMMSS" or "HHMMSS.sss" -> seconds into the day
+def gpsTimeToSeconds(field):
+	try:
+		return int(field[0:2]) * 3600 + int(field[2:4]) * 60 + float(field[4:])
+	except ValueError:
+		return float("nan")
+
+
+def toErrorMask(field):
+	try:
+		return int(field)
+	except ValueError:
+		return MISSING_ERRORS
+
+
+# Returns the balloon columns for a "hab,data" payload, in BALLOON_COLUMNS order
+def parseBalloonData(payload, receivedTime):
+	fields = payload.split(",")
+	fields += [""] * (13 - len(fields))
+
+	return ([receivedTime, gpsTimeToSeconds(fields[0])] +
+			[toFloat(field) for field in fields[1:12]] +
+			[toErrorMask(fields[12])])
+
+
+# Returns the chase columns for a "<callsign>,data" payload
+def parseChaseData(payload, receivedTime):
+	fields = payload.split(",")
+	fields += [""] * (3 - len(fields))
+
+	return [receivedTime, gpsTimeToSeconds(fields[0]), toFloat(fields[1]), toFloat(fields[2])]
+
+
+class columnFileSet(object):
+	def __init__(self, directory, columns):
+		self.directory = directory
+		self.columns = columns
+		self.packers = [struct.Struct(STRUCT_FORMATS[dtype]) for name, dtype in columns]
+
+		if not (os.path.isdir(directory)):
+			os.makedirs(directory)
+
+		# Written once; a different schema for an existing directory is an error
+		schemaFileName = os.path.join(directory, "schema.json")
+		schema = {"columns" : [[name, dtype] for name, dtype in columns]}
+		if (os.path.exists(schemaFileName)):
+			with open(schemaFileName, "r") as schemaFile:
+				if (json.load(schemaFile) != schema):
+					raise ValueError("Archive schema in " + directory + " does not match")
+		else:
+			with open(schemaFileName, "w") as schemaFile:
+				json.dump(schema, schemaFile, indent = 1)
+
+		self.columnFiles = [open(os.path.join(directory, name + ".bin"), "ab") for name, dtype in columns]
+		self.recordsWritten = 0
+
+	# Packs the whole record before writing, so a value that does not fit its
+	# column cannot leave the columns out of step
+	def append(self, values):
+		packedValues = [packer.pack(value) for packer, value in zip(self.packers, values)]
+		for columnFile, packedValue in zip(self.columnFiles, packedValues):
+			columnFile.write(packedValue)
+		self.recordsWritten += 1
+
+	def flush(self):
+		for columnFile in self.columnFiles:
+			columnFile.flush()
+
+	def close(self):
+		for columnFile in self.columnFiles:
+			columnFile.close()
+
+
+class telemetryArchive(object):
+	def __init__(self, directory = ARCHIVE_DIRECTORY, flushInterval = ARCHIVE_FLUSH_INTERVAL):
+		self.directory = directory
+		self.flushInterval = flushInterval
+		self.lastFlushTime = time.time()
+
+		# callsign -> columnFileSet, opened on the node's first sample
+		self.nodes = {}
+		self.invalidSamples = 0
+
+	def getNode(self, callsign, columns):
+		if (callsign not in self.nodes):
+			self.nodes[callsign] = columnFileSet(os.path.join(self.directory, callsign), columns)
+		return self.nodes[callsign]
+
+	def addBalloonData(self, payload, receivedTime = None):
+		self.addSample("hab", BALLOON_COLUMNS, parseBalloonData, payload, receivedTime)
+
+	def addChaseData(self, callsign, payload, receivedTime = None):
+		self.addSample(callsign, CHASE_COLUMNS, parseChaseData, payload, receivedTime)
+
+	def addSample(self, callsign, columns, parseFunction, payload, receivedTime):
+		if (receivedTime is None):
+			receivedTime = time.time()
+
+		try:
+			values = parseFunction(payload, receivedTime)
+			self.getNode(callsign, columns).append(values)
+		except (ValueError, IndexError, struct.error, IOError, OSError):
+			self.invalidSamples += 1
+			return
+
+		if (receivedTime - self.lastFlushTime >= self.flushInterval):
+			self.flush()
+
+	def flush(self):
+		for node in self.nodes.values():
+			node.flush()
+		self.lastFlushTime = time.time()
+
+	def close(self):
+		for node in self.nodes.values():
+			node.close()
+		self.nodes = {}
+
+
+# Returns the callsigns that have data in an archive
+def listArchiveNodes(directory = ARCHIVE_DIRECTORY):
+	return sorted([name for name in os.listdir(directory)
+					if os.path.exists(os.path.join(directory, name, "schema.json"))])
+
+
+# Memory-maps every column of one node. Returns {column: numpy array}, all of
+# the same length. Only reading needs NumPy
+def loadArchive(directory, callsign):
+	import numpy
+
+	nodeDirectory = os.path.join(directory, callsign)
+	with open(os.path.join(nodeDirectory, "schema.json"), "r") as schemaFile:
+		columns = json.load(schemaFile)["columns"]
+
+	records = None
+	for name, dtype in columns:
+		count = os.path.getsize(os.path.join(nodeDirectory, name + ".bin")) // numpy.dtype(dtype).itemsize
+		if (records is None or count < records):
+			records = count
+
+	arrays = {}
+	for name, dtype in columns:
+		if (records == 0):
+			arrays[name] = numpy.zeros(0, dtype = dtype)
+		else:
+			arrays[name] = numpy.memmap(os.path.join(nodeDirectory, name + ".bin"), dtype = dtype,
+										mode = "r", shape = (records,))
+
+	return arrays
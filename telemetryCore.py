@@ -0,0 +1,521 @@
+import serial
+import time
+from logger import *
+from radioReader import radioPortReader, DEFAULT_READ_MODE
+from frameDecoder import frameDecoder
+from messageDispatcher import messageDispatcher
+from gpsHandler import gpsHandlerThread
+from txScheduler import txScheduler
+from commandTracker import commandTracker
+from commandChannel import *
+from telemetryArchive import telemetryArchive
+from telemetryDatabase import telemetryDatabase
+from replayPort import replayPort
+from latencyTracker import latencyTracker
+from metricsServer import metricsServer, METRICS_ADDRESS, METRICS_PORT
+
+"""
+Ground station telemetry core, with no dependency on Qt.
+
+Runs the radio loop: reads and decodes frames, dispatches them, keeps track
+of the network, sends position and heartbeats and carries out commands put on
+its command channel. GPS is read on its own thread (gpsHandlerThread).
+
+Anything that wants to hear about traffic subscribes a callback to one of
+EVENT_NAMES. The GUI attaches through serialHandlerThread, which turns the
+events into Qt signals; run_headless.py runs the core on its own. Callbacks
+are made from the thread running the core and must not block.
+"""
+EVENT_NAMES = ["balloonData",        # HAB telemetry payload
+			"balloonAck",         # HAB ack payload
+			"balloonInit",        # HAB init payload
+			"vehicleData",        # "<callsign>,<payload>" from a chase vehicle
+			"chatMessage",        # "<display name>: <message>"
+			"radioConsole",       # raw bytes read from or written to the radio
+			"invalidSerialPort",  # description of a serial port failure
+			"networkStatus",      # no argument, a node's heartbeat state changed
+			"commandTimedOut"]    # name of a balloon command that was never acknowledged
+
+
+class telemetryCore(object):
+	def __init__(self):
+		self.subscribers = dict([(eventName, []) for eventName in EVENT_NAMES])
+		self.running = False
+
+		self.TEST_MODE = False  # Test mode replays recorded frames instead of using the radio
+		self.REPLAY_LOG_FILES = ["test_telemetry.txt"]
+		self.REPLAY_SPEED = 1.0  # None replays as fast as the loop takes the frames
+		self.REPLAY_START_OFFSET = 0
+
+		self.HEARTBEAT_INTERVAL = 5
+		self.RADIO_SERIAL_PORT = "COM7"
+		self.RADIO_CALLSIGN = "chase1"
+		self.RADIO_BAUDRATE = 38400
+		self.RADIO_READ_MODE = DEFAULT_READ_MODE
+		self.RADIO_READ_TIMEOUT = 0.05
+		self.radioSerial = None
+		self.radioReader = radioPortReader(self.RADIO_READ_MODE, self.RADIO_READ_TIMEOUT)
+		self.radioReadFailing = False  # Read errors are logged once, not on every attempt
+		self.radioFrameDecoder = frameDecoder()
+		self.radioTxScheduler = txScheduler(self.RADIO_BAUDRATE)
+
+		# Balloon commands wait this long for their ack before a retry or giving up
+		self.COMMAND_ACK_TIMEOUT = 10
+		self.RELEASE_ATTEMPTS = 3
+		self.RELEASE_RETRY_INTERVAL = 2
+		self.commandTracker = commandTracker(self.radioSerialOutput, self.reportCommandTimeout)
+
+		self.GPS_SERIAL_PORT = "COM4"
+		self.GPS_BAUDRATE = 4800
+		self.GPS_FIX_MAX_AGE = 10  # Older fixes are not sent out as our position
+		self.gpsHandler = gpsHandlerThread(portErrorHandler = self.reportGpsPortError)
+
+		# Set up semaphore-like variables
+		self.sendingSerialMessage = False
+		self.validHeartbeatReceived = False
+
+		self.activeNodes = {}
+		self.nodeLastHeard = {}
+		self.messageDispatcher = messageDispatcher()
+		self.messageDispatcher.setNodeHeardHandler(self.receivedHeartbeat)
+
+		self.registerChaseVehicle("chase1", "Chase 1")
+		self.registerChaseVehicle("chase2", "Chase 2")
+		self.registerChaseVehicle("chase3", "Chase 3")
+		self.registerNode("hab", "HAB")
+		self.registerNode("nps", "NPS")
+
+		self.messageDispatcher.registerHandler("chat", self.receivedChatMessage)
+		self.messageDispatcher.registerHandler("image", self.receivedImagePacket)
+		self.messageDispatcher.registerHandler("data", self.receivedBalloonData, "hab")
+		self.messageDispatcher.registerHandler("ack", self.receivedBalloonAck, "hab")
+		self.messageDispatcher.registerHandler("init", self.receivedBalloonInit, "hab")
+
+		# Commands from the GUI thread, see commandChannel.py
+		self.commandChannel = commandChannel(self.wakeUp)
+		self.commandHandlers = {releaseBalloonCommand       : self.executeReleaseBalloon,
+								resetBalloonReleaseCommand  : self.executeResetBalloonRelease,
+								armBalloonReleaseCommand    : self.executeArmBalloonRelease,
+								disarmBalloonReleaseCommand : self.executeDisarmBalloonRelease,
+								diskSpaceRequestCommand     : self.executeDiskSpaceRequest,
+								snapshotRequestCommand      : self.executeSnapshotRequest,
+								chatMessageCommand          : self.executeChatMessage,
+								openRadioPortCommand        : self.executeOpenRadioPort,
+								openGpsPortCommand          : self.executeOpenGpsPort}
+
+		self.requestedSnapshotInterval = 30
+		self.requestedSnapshotBurst = 5
+		self.acknowledgedSnapshotInterval = 0
+		self.acknowledgedSnapshotBurst = 0
+
+		self.settingsWindowOpen = False
+
+		# Parsed balloon and chase samples, written alongside the text log
+		self.telemetryArchive = telemetryArchive()
+
+		# Set to a file name to also store every frame in SQLite, see
+		# telemetryDatabase.py. Opened when the loop starts
+		self.TELEMETRY_DATABASE_FILE = None
+		self.telemetryDatabase = None
+
+		# Per-frame latency stamps, see latencyTracker.py. Off unless enabled
+		self.latencyTracker = latencyTracker()
+		self.radioArrivalTime = None
+
+		# Prometheus text metrics, see metricsServer.py. None to not serve them
+		self.METRICS_ADDRESS = METRICS_ADDRESS
+		self.METRICS_PORT = METRICS_PORT
+		self.metricsServer = None
+
+		# Set by the front end driving the dish, for its command counts
+		self.dishHandler = None
+
+		# Frames a handler could not process, by handler
+		self.invalidPackets = {}
+
+		self.missionStartTime = time.time()
+		self.lastHeartbeatTime = time.time()
+
+	# Calls callback(value) whenever the event is published; "networkStatus"
+	# callbacks take no argument
+	def subscribe(self, eventName, callback):
+		self.subscribers[eventName].append(callback)
+
+	def unsubscribe(self, eventName, callback):
+		if (callback in self.subscribers[eventName]):
+			self.subscribers[eventName].remove(callback)
+
+	def publish(self, eventName, *args):
+		self.latencyTracker.eventPublished(eventName)
+
+		for callback in self.subscribers[eventName]:
+			try:
+				callback(*args)
+			except:
+				logRadio("Subscriber to " + eventName + " failed")
+
+	# Runs the radio loop until stop() is called
+	def run(self):
+		self.running = True
+
+		self.openTelemetryDatabase()
+		self.openMetricsServer()
+		self.openRadioSerialPort()
+		self.openGpsSerialPort()
+		self.sendHeartbeat()
+
+		while(self.running):
+			self.executeQueuedCommands()
+
+			self.commandTracker.serviceRetries()
+			self.flushRadioOutput()
+
+			serialInput = self.radioSerialInput()
+
+			for frame in self.radioFrameDecoder.feed(serialInput):
+				logRadio(frame + ",END_TX")
+				if (len(frame) > 0):
+					if (self.latencyTracker.enabled and self.radioArrivalTime is not None):
+						self.latencyTracker.frameDecoded(frame, self.radioArrivalTime)
+						self.handleFrame(frame)
+						self.latencyTracker.frameDone()
+					else:
+						self.handleFrame(frame)
+
+
+			if ((time.time() - self.lastHeartbeatTime) > self.HEARTBEAT_INTERVAL):
+				self.lastHeartbeatTime = time.time()
+
+				for key, value in self.activeNodes.items():
+					self.activeNodes[key] -= 1
+					if (self.activeNodes[key] <= 0):
+						self.publish("networkStatus")
+
+				if not (self.sendCurrentPosition()):
+					self.sendHeartbeat()
+
+		self.closePorts()
+
+	# Ends the radio loop. Safe to call from any thread
+	def stop(self):
+		self.running = False
+		self.wakeUp()
+
+	def closePorts(self):
+		self.gpsHandler.stop()
+		self.telemetryArchive.close()
+
+		if (self.telemetryDatabase is not None):
+			self.telemetryDatabase.stop()
+
+		if (self.metricsServer is not None):
+			self.metricsServer.stop()
+			self.metricsServer = None
+
+		try:
+			self.radioSerial.close()
+		except:
+			logRadio("Unable to close serial port " + self.RADIO_SERIAL_PORT)
+
+	# Carries out everything put on the command channel
+	def executeQueuedCommands(self):
+		command = self.commandChannel.get()
+
+		while (command is not None):
+			try:
+				self.commandHandlers[type(command)](command)
+			except:
+				logRadio("Unable to execute " + type(command).__name__)
+
+			self.commandChannel.commandCompleted(command)
+			command = self.commandChannel.get()
+
+	def executeReleaseBalloon(self, command):
+		self.sendReleaseCommand()
+
+	def executeResetBalloonRelease(self, command):
+		self.sendResetBrmCommand()
+
+	def executeArmBalloonRelease(self, command):
+		self.sendTrackedCommand("ARM_BRM")
+
+	def executeDisarmBalloonRelease(self, command):
+		self.sendTrackedCommand("DISARM_BRM")
+
+	def executeDiskSpaceRequest(self, command):
+		self.sendDiskSpaceRequest()
+
+	def executeSnapshotRequest(self, command):
+		self.requestedSnapshotBurst = command.burst
+		self.requestedSnapshotInterval = command.interval
+		self.sendSnapshotRequest()
+
+	def executeChatMessage(self, command):
+		self.radioSerialOutput("chat," + command.message, True)
+
+	def executeOpenRadioPort(self, command):
+		self.RADIO_SERIAL_PORT = command.portName
+		self.openRadioSerialPort()
+
+	def executeOpenGpsPort(self, command):
+		self.GPS_SERIAL_PORT = command.portName
+		self.openGpsSerialPort()
+
+	# Performs an action based on the message sent to it
+	# Returns True or False based on the success of that action
+	def handleMessage(self, message):
+		for line in message.split(',END_TX\n'):
+			if (len(line) > 0):
+				self.handleFrame(line)
+
+	# Acts on a single frame, already stripped of its ",END_TX" terminator
+	def handleFrame(self, line):
+		self.messageDispatcher.dispatch(line)
+		logTelemetry(line + ",END_TX")
+
+		if (self.telemetryDatabase is not None):
+			self.telemetryDatabase.addFrame(line)
+
+	# Adds a node to the network: frames with this callsign are dispatched and
+	# its heartbeat is tracked
+	def registerNode(self, callsign, displayName = None):
+		self.activeNodes.setdefault(callsign, 0)
+		self.messageDispatcher.registerCallsign(callsign, displayName)
+
+	# Adds a chase vehicle: a node whose data frames are positions for the
+	# vehicleData subscribers. Other nodes' data frames (nps sends its own
+	# position) are not published
+	def registerChaseVehicle(self, callsign, displayName = None):
+		self.registerNode(callsign, displayName)
+		self.messageDispatcher.registerHandler("data", self.receivedVehicleData, callsign)
+
+	def receivedChatMessage(self, callsign, payload):
+		self.publish("chatMessage", self.messageDispatcher.getDisplayName(callsign) + ": " + payload)
+
+	def receivedVehicleData(self, callsign, payload):
+		self.telemetryArchive.addChaseData(callsign, payload)
+		self.publish("vehicleData", callsign + "," + payload)
+
+	def receivedBalloonData(self, callsign, payload):
+		self.telemetryArchive.addBalloonData(payload)
+		self.publish("balloonData", payload)
+
+	def receivedBalloonAck(self, callsign, payload):
+		self.commandTracker.processAck(payload)
+		self.publish("balloonAck", payload)
+
+	def receivedBalloonInit(self, callsign, payload):
+		self.publish("balloonInit", payload)
+
+	def receivedImagePacket(self, callsign, payload):
+		print("Received image!")
+		self.parsePredictionMessage(payload)
+
+	def sendCurrentPosition(self):
+		success = False
+
+		try:
+			gpsData = self.getFormattedGpsData()
+			if (gpsData != "INVALID DATA"):
+				self.radioSerialOutput("data," + gpsData, True)
+				success = True
+		except:
+			print("Unable to send current position")
+
+		return success
+
+	def sendImage(self):
+		numPackets = len(self.imageToSend) / 1000
+		currIndex = 0
+
+		while(currIndex < numPackets):
+			packet = self.imageToSend[currIndex * 1000 : (currIndex + 1) * 1000]
+			self.radioSerialOutput("image," + packet)
+			currIndex += 1
+
+		self.radioSerialOutput("image,{}".format(self.imageToSend[numPackets * 1000 :-1]))
+
+		self.imageReadyToSend = False
+
+	def parsePredictionMessage(self, rawMessage):
+		print("Decommutating...")
+
+	# Takes a heartbeat signal and determines which node sent it out. That node
+	# is set as currently active on the network
+	def receivedHeartbeat(self, heartbeatSignalReceived):
+		if (heartbeatSignalReceived in self.activeNodes):
+			self.activeNodes[heartbeatSignalReceived] = 3
+			self.nodeLastHeard[heartbeatSignalReceived] = time.time()
+
+		self.publish("networkStatus")
+
+	# Sends a "heartbeat" signal to other radios to verify radio is currently
+	# active on the network
+	def sendHeartbeat(self):
+		self.radioSerialOutput("alive")
+
+	# Sends a balloon command and tracks it until the balloon acknowledges it
+	def sendTrackedCommand(self, command, maxAttempts = 1, retryInterval = None):
+		if (retryInterval is None):
+			retryInterval = self.COMMAND_ACK_TIMEOUT
+		self.commandTracker.sendCommand(command, maxAttempts, retryInterval)
+
+	def reportCommandTimeout(self, command):
+		logRadio("No acknowledgement for " + command.command + " after " + str(command.attempts) + " attempts")
+		self.publish("commandTimedOut", command.name)
+
+	def sendSnapshotRequest(self):
+		self.sendTrackedCommand("SNAPSHOT," + str(self.requestedSnapshotBurst) +
+							"," + str(self.requestedSnapshotInterval))
+
+	def sendDiskSpaceRequest(self):
+		self.sendTrackedCommand("DISK_SPACE")
+
+	# Retries are sent by the serial loop until BRM_ACTIVATED comes back
+	def sendReleaseCommand(self):
+		print("Releasing balloon")
+		self.sendTrackedCommand("SSAG_RELEASE_BALLOON", self.RELEASE_ATTEMPTS, self.RELEASE_RETRY_INTERVAL)
+
+	def sendResetBrmCommand(self):
+		print("Resetting balloon")
+		self.sendTrackedCommand("RESET_BRM")
+
+	# Wakes the serial loop so commands put on the channel are
+	# handled without waiting for the read timeout
+	def wakeUp(self):
+		self.radioReader.wake()
+
+	def radioSerialInput(self):
+		serialInput = ""
+
+		try:
+			if (self.radioReader.waitForInput(self.getNextOutputDeadline())):
+				if (self.latencyTracker.enabled):
+					self.radioArrivalTime = self.latencyTracker.now()
+
+				serialInput = self.radioReader.takePendingInput()
+
+				# Frames split across reads are reassembled by radioFrameDecoder
+				bytesWaiting = self.radioSerial.inWaiting()
+				if (bytesWaiting > 0):
+					serialInput += self.radioSerial.read(bytesWaiting)
+
+			if (len(serialInput) > 0):
+				self.publish("radioConsole", serialInput)
+
+			if (self.radioReadFailing):
+				logRadio("Reading from serial port on " + str(self.RADIO_SERIAL_PORT) + " again")
+				self.radioReadFailing = False
+
+		except:
+			if (not self.settingsWindowOpen):
+				self.publish("invalidSerialPort", "Please enter a valid serial port")
+				self.settingsWindowOpen = True
+			if (not self.radioReadFailing):
+				logRadio("Unable to read from serial port on " + str(self.RADIO_SERIAL_PORT))
+				self.radioReadFailing = True
+
+			# No usable port: wait out the read timeout rather than spin
+			time.sleep(self.RADIO_READ_TIMEOUT)
+
+		return serialInput
+
+	# Seconds until queued output or a command retry is due, or None
+	def getNextOutputDeadline(self):
+		deadlines = [deadline for deadline in (self.radioTxScheduler.getWaitTime(),
+												self.commandTracker.getNextDeadline())
+					if deadline is not None]
+
+		if (len(deadlines) == 0):
+			return None
+		return min(deadlines)
+
+	# Queues a message for the radio. It goes out immediately unless frames of a
+	# higher priority are waiting or the link budget is used up, in which case
+	# the serial loop sends it once there is room
+	def radioSerialOutput(self, line, processSentMessage = False):
+		preparedMessage = self.RADIO_CALLSIGN + "," + line + ",END_TX\n"
+		self.radioTxScheduler.enqueue(line, preparedMessage, processSentMessage)
+		self.flushRadioOutput()
+
+	# Writes queued frames out as far as the link budget allows
+	def flushRadioOutput(self):
+		queuedFrame = self.radioTxScheduler.getNextFrame()
+
+		while (queuedFrame is not None):
+			try:
+				if (queuedFrame.processSentMessage):
+					self.handleMessage(queuedFrame.frame)
+
+				self.publish("radioConsole", queuedFrame.frame)
+				self.radioSerial.write(queuedFrame.frame)
+			except:
+				if not (self.settingsWindowOpen):
+					self.publish("invalidSerialPort", "Please enter a valid serial port")
+					self.settingsWindowOpen = True
+				logRadio("Unable to write to serial port on " + self.RADIO_SERIAL_PORT)
+
+			queuedFrame = self.radioTxScheduler.getNextFrame()
+
+	def openRadioSerialPort(self):
+		try:
+			self.radioSerial.close()
+		except:
+			logRadio("Unable to close serial port " + self.RADIO_SERIAL_PORT)
+
+		try:
+			if (self.TEST_MODE):
+				print("IN TEST MODE")
+				self.radioSerial = replayPort(self.REPLAY_LOG_FILES, self.REPLAY_SPEED, self.REPLAY_START_OFFSET)
+			else:
+				self.radioSerial = serial.Serial(port = self.RADIO_SERIAL_PORT, baudrate = self.RADIO_BAUDRATE, timeout = 1)
+			self.radioReader.setPort(self.radioSerial)
+			self.radioFrameDecoder.reset()
+		except:
+			if not (self.settingsWindowOpen):
+				self.publish("invalidSerialPort", "Radio serial port is invalid")
+				self.settingsWindowOpen = True
+
+	# Called from the GPS thread when its port cannot be opened or read
+	def reportGpsPortError(self, message):
+		if not (self.settingsWindowOpen):
+			self.publish("invalidSerialPort", message)
+			self.settingsWindowOpen = True
+
+	# Formats the latest fix cached by the GPS thread. Never blocks on the port
+	def getFormattedGpsData(self):
+		finalDataString = "INVALID DATA"
+		fix = self.gpsHandler.getLatestFix(self.GPS_FIX_MAX_AGE)
+
+		if (fix is not None):
+			logTelemetry(self.RADIO_CALLSIGN + fix.sentence)
+			finalDataString = "{},{},{}".format(fix.timestamp,
+												"%4.5f" % fix.latitude,
+												"%4.5f" % fix.longitude)
+
+		return finalDataString
+
+	def openTelemetryDatabase(self):
+		if (self.TELEMETRY_DATABASE_FILE is not None and self.telemetryDatabase is None):
+			self.telemetryDatabase = telemetryDatabase(self.TELEMETRY_DATABASE_FILE,
+														callsigns = self.messageDispatcher.callsigns)
+			self.telemetryDatabase.start()
+
+	def openMetricsServer(self):
+		if (self.METRICS_PORT is not None and self.metricsServer is None):
+			try:
+				self.metricsServer = metricsServer(self, self.METRICS_ADDRESS, self.METRICS_PORT)
+				self.metricsServer.start()
+			except:
+				logRadio("Unable to serve metrics on {}:{}".format(self.METRICS_ADDRESS, self.METRICS_PORT))
+
+	# Counts a frame a handler could not process. Safe to call from any thread;
+	# a lost count under a race only makes the counter low by one
+	def reportInvalidPacket(self, source):
+		self.invalidPackets[source] = self.invalidPackets.get(source, 0) + 1
+
+	def openGpsSerialPort(self):
+		self.gpsHandler.openPort(self.GPS_SERIAL_PORT, self.GPS_BAUDRATE)
+
+		if not (self.gpsHandler.is_alive()):
+			self.gpsHandler.start()
@@ -0,0 +1,191 @@
+import re
+import time
+import sqlite3
+import threading
+from collections import deque
+from telemetryArchive import BALLOON_COLUMNS, CHASE_COLUMNS, parseBalloonData, parseChaseData
+
+"""
+Optional SQLite store of every decoded frame.
+
+Frames go into one table per callsign and message type, named
+"<callsign>_<type>", e.g. hab_data, chase2_data or hab_ack. Balloon and chase
+data tables have a column per telemetry field (see telemetryArchive), other
+tables keep the payload text. Every table is indexed on receivedTime. Given
+the callsigns of the network, frames from any other callsign (usually a
+corrupted one) are counted as invalid rather than given a table.
+
+addFrame() only appends to a queue. A writer thread owns the connection and
+commits whatever is queued as one transaction every DATABASE_COMMIT_INTERVAL
+seconds. The database runs in WAL mode, so readers are never blocked by the
+writer and the radio thread never waits on an fsync. query() can be used from
+any thread during the flight:
+
+	SELECT max(altitude) FROM hab_data
+	SELECT * FROM chase2_data ORDER BY receivedTime DESC LIMIT 1
+	SELECT receivedTime, errors FROM hab_data WHERE receivedTime > ? AND errors > 0
+"""
+DATABASE_FILE_LOCATION = r"MoGS_telemetry.db"
+DATABASE_QUEUE_SIZE = 50000
+DATABASE_COMMIT_INTERVAL = 0.5
+
+# Callsigns and types become table names, so anything else is not stored
+TABLE_NAME_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9]*$")
+
+SQLITE_TYPES = {"<f8" : "REAL",
+				"<f4" : "REAL",
+				"<i4" : "INTEGER"}
+
+PAYLOAD_COLUMNS = [("receivedTime", "<f8"),
+					("payload", None)]
+
+
+# Returns (columns, parseFunction) for a table; parseFunction(payload, receivedTime)
+# returns the row
+def getTableLayout(callsign, messageType):
+	if (messageType == "data"):
+		if (callsign == "hab"):
+			return BALLOON_COLUMNS, parseBalloonData
+		return CHASE_COLUMNS, parseChaseData
+
+	return PAYLOAD_COLUMNS, lambda payload, receivedTime: [receivedTime, payload]
+
+
+class telemetryDatabase(threading.Thread):
+	def __init__(self, fileName = DATABASE_FILE_LOCATION, queueSize = DATABASE_QUEUE_SIZE,
+				commitInterval = DATABASE_COMMIT_INTERVAL, callsigns = None):
+		threading.Thread.__init__(self)
+		self.daemon = True
+
+		self.fileName = fileName
+		self.queueSize = queueSize
+		self.commitInterval = commitInterval
+
+		# Anything supporting "in", e.g. the dispatcher's callsign table, which
+		# may change during the flight. None stores every callsign
+		self.callsigns = callsigns
+
+		self.pendingFrames = deque()
+		self.running = True
+		self.stopped = threading.Event()
+
+		# Only used by the writer thread: table name -> (insert statement, parseFunction)
+		self.tables = {}
+
+		# Read connections, one per querying thread
+		self.readConnections = threading.local()
+
+		self.framesStored = 0
+		self.droppedFrames = 0
+		self.invalidFrames = 0
+		self.commits = 0
+
+	# Queues a frame ("<callsign>,<type>[,<payload>]", no terminator) to be
+	# stored. Safe to call from any thread; never blocks
+	def addFrame(self, line, receivedTime = None):
+		if (len(self.pendingFrames) >= self.queueSize):
+			self.droppedFrames += 1
+			return False
+
+		if (receivedTime is None):
+			receivedTime = time.time()
+
+		self.pendingFrames.append((line, receivedTime))
+		return True
+
+	def connect(self):
+		connection = sqlite3.connect(self.fileName)
+		# Lets Python 2 store payloads with stray 8-bit bytes from the radio
+		connection.text_factory = str
+		connection.execute("PRAGMA journal_mode=WAL")
+		connection.execute("PRAGMA synchronous=NORMAL")
+		return connection
+
+	def getTable(self, connection, callsign, messageType):
+		tableName = callsign + "_" + messageType
+
+		if (tableName not in self.tables):
+			columns, parseFunction = getTableLayout(callsign, messageType)
+			columnDefinitions = ", ".join([name + " " + SQLITE_TYPES.get(dtype, "TEXT") for name, dtype in columns])
+
+			connection.execute("CREATE TABLE IF NOT EXISTS {} ({})".format(tableName, columnDefinitions))
+			connection.execute("CREATE INDEX IF NOT EXISTS {0}_time ON {0} (receivedTime)".format(tableName))
+
+			insertStatement = "INSERT INTO {} VALUES ({})".format(tableName, ", ".join(["?"] * len(columns)))
+			self.tables[tableName] = (insertStatement, parseFunction)
+
+		return self.tables[tableName]
+
+	# Groups queued frames by table and inserts them in one transaction
+	def storePendingFrames(self, connection):
+		rows = {}
+
+		while (True):
+			try:
+				line, receivedTime = self.pendingFrames.popleft()
+			except IndexError:
+				break
+
+			fields = line.split(",", 2)
+			if (len(fields) < 2 or TABLE_NAME_PATTERN.match(fields[0]) is None or
+				TABLE_NAME_PATTERN.match(fields[1]) is None or
+				(self.callsigns is not None and fields[0] not in self.callsigns)):
+				self.invalidFrames += 1
+				continue
+
+			payload = ""
+			if (len(fields) > 2):
+				payload = fields[2]
+
+			try:
+				insertStatement, parseFunction = self.getTable(connection, fields[0], fields[1])
+				rows.setdefault(insertStatement, []).append(parseFunction(payload, receivedTime))
+			except (ValueError, IndexError, sqlite3.Error):
+				self.invalidFrames += 1
+
+		if (len(rows) == 0):
+			return
+
+		try:
+			with connection:
+				for insertStatement, tableRows in rows.items():
+					connection.executemany(insertStatement, tableRows)
+		except sqlite3.Error:
+			print("WARNING: Unable to store frames in " + self.fileName)
+			self.invalidFrames += sum([len(tableRows) for tableRows in rows.values()])
+			return
+
+		self.framesStored += sum([len(tableRows) for tableRows in rows.values()])
+		self.commits += 1
+
+	def run(self):
+		connection = self.connect()
+
+		try:
+			while (self.running):
+				time.sleep(self.commitInterval)
+				self.storePendingFrames(connection)
+
+			self.storePendingFrames(connection)
+		finally:
+			connection.close()
+			self.stopped.set()
+
+	# Stores what is still queued and closes the database
+	def stop(self, timeout = 10):
+		self.running = False
+		if (self.is_alive()):
+			self.stopped.wait(timeout)
+
+	# Runs a read-only query on this thread's own connection. Rows committed by
+	# the writer so far are visible
+	def query(self, statement, parameters = ()):
+		connection = getattr(self.readConnections, "connection", None)
+		if (connection is None):
+			connection = sqlite3.connect(self.fileName)
+			self.readConnections.connection = connection
+
+		return connection.execute(statement, parameters).fetchall()
+
+	def getTableNames(self):
+		return [row[0] for row in self.query("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
@@ -0,0 +1,86 @@
+"""
+Holds the latest text and style of the GUI's telemetry and status labels, and
+applies them to the widgets at a fixed rate instead of once per frame.
+
+Handlers call setText() and setStyleSheet() as before, which only store the
+value and mark the field dirty. The GUI calls applyChanges() from a QTimer
+every GUI_REFRESH_INTERVAL ms; that touches a widget only if its text or
+style differs from what the widget already shows. A balloon frame rewrites
+about fifteen labels and every frame restyles the network status labels, but
+between two refreshes only the values that actually changed reach Qt, and a
+style sheet is only set again when its state flips (reparsing the CSS is the
+expensive part).
+
+Has no Qt dependency; a label is anything with setText() and setStyleSheet().
+Not thread safe, use it from the GUI thread.
+"""
+GUI_REFRESH_INTERVAL = 100  # ms
+
+
+class telemetryViewModel(object):
+	def __init__(self):
+		# field -> label widget
+		self.labels = {}
+
+		# field -> latest value, and the value the widget shows
+		self.texts = {}
+		self.styleSheets = {}
+		self.appliedTexts = {}
+		self.appliedStyleSheets = {}
+
+		self.dirtyFields = set()
+
+		self.textsApplied = 0
+		self.styleSheetsApplied = 0
+
+	# Fields can be any hashable key. The label's current text and style, if
+	# given, are taken as already applied
+	def addLabel(self, field, label, text = None, styleSheet = None):
+		self.labels[field] = label
+		if (text is not None):
+			self.texts[field] = self.appliedTexts[field] = text
+		if (styleSheet is not None):
+			self.styleSheets[field] = self.appliedStyleSheets[field] = styleSheet
+
+	def setText(self, field, text):
+		self.texts[field] = text
+		self.dirtyFields.add(field)
+
+	def setStyleSheet(self, field, styleSheet):
+		self.styleSheets[field] = styleSheet
+		self.dirtyFields.add(field)
+
+	def getText(self, field):
+		return self.texts.get(field)
+
+	# Pushes the changed values to their widgets. Returns the number of
+	# widget calls made
+	def applyChanges(self):
+		if (len(self.dirtyFields) == 0):
+			return 0
+
+		dirtyFields = self.dirtyFields
+		self.dirtyFields = set()
+		calls = 0
+
+		for field in dirtyFields:
+			# Values for a field with no label are kept, but shown nowhere
+			label = self.labels.get(field)
+			if (label is None):
+				continue
+
+			text = self.texts.get(field)
+			if (text is not None and text != self.appliedTexts.get(field)):
+				label.setText(text)
+				self.appliedTexts[field] = text
+				self.textsApplied += 1
+				calls += 1
+
+			styleSheet = self.styleSheets.get(field)
+			if (styleSheet is not None and styleSheet != self.appliedStyleSheets.get(field)):
+				label.setStyleSheet(styleSheet)
+				self.appliedStyleSheets[field] = styleSheet
+				self.styleSheetsApplied += 1
+				calls += 1
+
+		return calls
@@ -0,0 +1,272 @@
+import os
+import heapq
+import numpy
+
+"""
+Vehicle tracks for the map and the offline plot.
+
+Each vehicle's track is kept in preallocated NumPy arrays (time, latitude,
+longitude, altitude) used as a ring buffer of TRACK_CAPACITY points, so
+memory is fixed however long the flight. With a spill file, points pushed
+out of the ring are appended to it first, and getFullTrack() returns the
+whole flight at full resolution for analysis.
+
+The display never needs every point. getDisplayPoints() picks at most
+maxPoints of them with a Douglas-Peucker decimator that keeps the points
+furthest off the line through their neighbours first, so the shape survives
+at any count. The whole track is only decimated again once enough new points
+have come in, so redrawing after each point stays cheap. Given the bounds of
+the view it decimates only what is on screen, so zooming in brings the detail
+back.
+"""
+TRACK_CAPACITY = 50000
+
+# Record layout of a spill file
+TRACK_DTYPE = numpy.dtype([("time", "<f8"), ("latitude", "<f8"), ("longitude", "<f8"), ("altitude", "<f4")])
+
+
+# Returns the indices, in order, of at most maxPoints points of the line
+# through latitudes and longitudes, always including the first and last.
+# Points are added furthest deviation first (Douglas-Peucker run to a point
+# budget instead of a tolerance)
+def decimateTrack(latitudes, longitudes, maxPoints):
+	count = len(latitudes)
+	if (count <= maxPoints or count <= 2):
+		return numpy.arange(count)
+
+	# Roughly equal-distance units, good enough to rank deviations
+	x = longitudes * numpy.cos(numpy.radians(numpy.nanmean(latitudes)))
+	y = latitudes
+
+	keptIndices = [0, count - 1]
+	segments = []
+
+	def addSegment(first, last):
+		if (last - first < 2):
+			return
+
+		dx = x[last] - x[first]
+		dy = y[last] - y[first]
+		px = x[first + 1:last] - x[first]
+		py = y[first + 1:last] - y[first]
+
+		length = numpy.hypot(dx, dy)
+		if (length > 0):
+			deviations = numpy.abs(px * dy - py * dx) / length
+		else:
+			deviations = numpy.hypot(px, py)
+
+		furthest = int(numpy.argmax(deviations))
+		heapq.heappush(segments, (-deviations[furthest], first, last, first + 1 + furthest))
+
+	addSegment(0, count - 1)
+	while (len(segments) > 0 and len(keptIndices) < maxPoints):
+		negativeDeviation, first, last, split = heapq.heappop(segments)
+		keptIndices.append(split)
+		addSegment(first, split)
+		addSegment(split, last)
+
+	return numpy.sort(numpy.array(keptIndices))
+
+
+class vehicleTrack(object):
+	def __init__(self, capacity = TRACK_CAPACITY, spillFileName = None):
+		self.capacity = capacity
+		self.times = numpy.zeros(capacity, dtype = TRACK_DTYPE["time"])
+		self.latitudes = numpy.zeros(capacity, dtype = TRACK_DTYPE["latitude"])
+		self.longitudes = numpy.zeros(capacity, dtype = TRACK_DTYPE["longitude"])
+		self.altitudes = numpy.zeros(capacity, dtype = TRACK_DTYPE["altitude"])
+
+		# Index of the oldest point and the number held
+		self.start = 0
+		self.count = 0
+
+		# Points ever added, including those spilled or dropped
+		self.totalPoints = 0
+
+		# Bounding box of every point added, so a view that takes in the
+		# whole track can use the overview
+		self.south = float("inf")
+		self.north = float("-inf")
+		self.west = float("inf")
+		self.east = float("-inf")
+
+		self.spillFileName = spillFileName
+		self.spillFile = None
+		self.spilledPoints = 0
+		if (spillFileName is not None):
+			self.spillFile = open(spillFileName, "wb")
+
+		self.displayCacheKey = None
+		self.displayCache = None
+		self.overviewLimit = None
+
+	def __len__(self):
+		return self.count
+
+	def append(self, time, latitude, longitude, altitude = numpy.nan):
+		if (self.count == self.capacity):
+			if (self.spillFile is not None):
+				self.spillOldest()
+			position = self.start
+			self.start = (self.start + 1) % self.capacity
+		else:
+			position = (self.start + self.count) % self.capacity
+			self.count += 1
+
+		self.times[position] = time
+		self.latitudes[position] = latitude
+		self.longitudes[position] = longitude
+		self.altitudes[position] = altitude
+		self.totalPoints += 1
+
+		self.south = min(self.south, latitude)
+		self.north = max(self.north, latitude)
+		self.west = min(self.west, longitude)
+		self.east = max(self.east, longitude)
+
+	def spillOldest(self):
+		record = numpy.zeros(1, dtype = TRACK_DTYPE)
+		record["time"] = self.times[self.start]
+		record["latitude"] = self.latitudes[self.start]
+		record["longitude"] = self.longitudes[self.start]
+		record["altitude"] = self.altitudes[self.start]
+		self.spillFile.write(record.tobytes())
+		self.spilledPoints += 1
+
+	# Returns column in time order; a view unless the ring has wrapped
+	def getOrdered(self, column):
+		end = self.start + self.count
+		if (end <= self.capacity):
+			return column[self.start:end]
+		return numpy.concatenate((column[self.start:], column[:end - self.capacity]))
+
+	# Returns (times, latitudes, longitudes, altitudes) of the points held
+	def getColumns(self):
+		return (self.getOrdered(self.times), self.getOrdered(self.latitudes),
+				self.getOrdered(self.longitudes), self.getOrdered(self.altitudes))
+
+	# Returns (time, latitude, longitude, altitude) of the newest point, or None
+	def getLatest(self):
+		if (self.count == 0):
+			return None
+
+		position = (self.start + self.count - 1) % self.capacity
+		return (self.times[position], self.latitudes[position], self.longitudes[position], self.altitudes[position])
+
+	# Returns every point since the track was made as one TRACK_DTYPE array;
+	# without a spill file only the points still held
+	def getFullTrack(self):
+		spilled = numpy.zeros(0, dtype = TRACK_DTYPE)
+		if (self.spillFile is not None):
+			self.spillFile.flush()
+			spilled = numpy.fromfile(self.spillFileName, dtype = TRACK_DTYPE, count = self.spilledPoints)
+
+		held = numpy.zeros(self.count, dtype = TRACK_DTYPE)
+		held["time"], held["latitude"], held["longitude"], held["altitude"] = self.getColumns()
+		return numpy.concatenate((spilled, held))
+
+	# Returns the newest count values of column, in time order
+	def getRecent(self, column, count):
+		positions = (self.start + self.count - count + numpy.arange(count)) % self.capacity
+		return column[positions]
+
+	# Returns (latitudes, longitudes) of at most maxPoints points to draw. With
+	# bounds (south, north, west, east) only the part in view is decimated,
+	# plus the points either side of it so lines run to the edge. The arrays
+	# returned are not changed afterwards, and the same ones are returned
+	# until there is something new to draw
+	def getDisplayPoints(self, maxPoints, bounds = None):
+		if (bounds is None or self.isInside(bounds)):
+			return self.getOverviewPoints(maxPoints)
+
+		cacheKey = (self.totalPoints, maxPoints, bounds)
+		if (cacheKey == self.displayCacheKey):
+			return self.displayCache
+
+		times, latitudes, longitudes, altitudes = self.getColumns()
+
+		south, north, west, east = bounds
+		inView = (latitudes >= south) & (latitudes <= north) & (longitudes >= west) & (longitudes <= east)
+		shown = inView.copy()
+		shown[1:] |= inView[:-1]
+		shown[:-1] |= inView[1:]
+		latitudes = latitudes[shown]
+		longitudes = longitudes[shown]
+
+		indices = decimateTrack(latitudes, longitudes, maxPoints)
+		self.displayCache = (latitudes[indices], longitudes[indices])
+		self.displayCacheKey = cacheKey
+		return self.displayCache
+
+	def isInside(self, bounds):
+		south, north, west, east = bounds
+		return (south <= self.south and self.north <= north and west <= self.west and self.east <= east)
+
+	# The whole track is decimated only when the points shown would pass
+	# maxPoints, leaving an eighth of maxPoints spare; until that fills, new
+	# points are added to the ones shown as they are, so most redraws cost the
+	# new points alone
+	def getOverviewPoints(self, maxPoints):
+		if (maxPoints != self.overviewLimit):
+			self.overviewLimit = maxPoints
+			self.overviewPoints = 0
+			self.overviewNumbers = numpy.zeros(0, dtype = numpy.int64)
+			self.overviewLatitudes = numpy.zeros(0)
+			self.overviewLongitudes = numpy.zeros(0)
+
+		newPoints = min(self.totalPoints - self.overviewPoints, self.count)
+		if (newPoints == 0):
+			return (self.overviewLatitudes, self.overviewLongitudes)
+
+		# Points are numbered in the order they were added
+		firstHeld = self.totalPoints - self.count
+
+		if (len(self.overviewNumbers) + newPoints > maxPoints):
+			times, latitudes, longitudes, altitudes = self.getColumns()
+			indices = decimateTrack(latitudes, longitudes, max(2, maxPoints - maxPoints // 8))
+			self.overviewNumbers = firstHeld + indices
+			self.overviewLatitudes = latitudes[indices]
+			self.overviewLongitudes = longitudes[indices]
+		else:
+			held = self.overviewNumbers >= firstHeld
+			self.overviewNumbers = numpy.concatenate((self.overviewNumbers[held], numpy.arange(self.totalPoints - newPoints, self.totalPoints)))
+			self.overviewLatitudes = numpy.concatenate((self.overviewLatitudes[held], self.getRecent(self.latitudes, newPoints)))
+			self.overviewLongitudes = numpy.concatenate((self.overviewLongitudes[held], self.getRecent(self.longitudes, newPoints)))
+
+		self.overviewPoints = self.totalPoints
+		return (self.overviewLatitudes, self.overviewLongitudes)
+
+	def close(self):
+		if (self.spillFile is not None):
+			self.spillFile.close()
+			self.spillFile = None
+
+
+class trackStore(object):
+	def __init__(self, capacity = TRACK_CAPACITY, spillDirectory = None):
+		self.capacity = capacity
+		self.spillDirectory = spillDirectory
+		self.tracks = {}
+
+		if (spillDirectory is not None and not os.path.isdir(spillDirectory)):
+			os.makedirs(spillDirectory)
+
+	def getTrack(self, callsign):
+		track = self.tracks.get(callsign)
+		if (track is None):
+			spillFileName = None
+			if (self.spillDirectory is not None):
+				spillFileName = os.path.join(self.spillDirectory, callsign + "_track.bin")
+			track = self.tracks[callsign] = vehicleTrack(self.capacity, spillFileName)
+		return track
+
+	def append(self, callsign, time, latitude, longitude, altitude = numpy.nan):
+		self.getTrack(callsign).append(time, latitude, longitude, altitude)
+
+	def items(self):
+		return self.tracks.items()
+
+	def close(self):
+		for track in self.tracks.values():
+			track.close()
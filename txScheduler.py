@@ -0,0 +1,180 @@
+import time
+from collections import deque
+
+"""
+Outbound radio scheduler.
+
+Frames are queued by priority class and released under a token bucket sized
+to the radio link, so a burst of chat cannot delay a balloon command and the
+serial port is never handed more than the link can carry.
+
+Redundant frames are coalesced while they wait:
+	- a newer position frame replaces the one already queued
+	- heartbeats are dropped while a position frame is queued, since any
+	  frame from this node tells the others it is alive
+"""
+PRIORITY_SAFETY = 0
+PRIORITY_ACK = 1
+PRIORITY_POSITION = 2
+PRIORITY_CHAT = 3
+PRIORITY_HEARTBEAT = 4
+
+PRIORITY_NAMES = ["safety", "ack", "position", "chat", "heartbeat"]
+
+# Message type (the field after the callsign) -> priority class
+MESSAGE_PRIORITIES = {"cmd"   : PRIORITY_SAFETY,
+					"ack"   : PRIORITY_ACK,
+					"init"  : PRIORITY_ACK,
+					"data"  : PRIORITY_POSITION,
+					"chat"  : PRIORITY_CHAT,
+					"image" : PRIORITY_CHAT,
+					"alive" : PRIORITY_HEARTBEAT}
+
+# 8 data bits plus start and stop bit per byte
+BITS_PER_BYTE = 10
+
+
+class queuedFrame(object):
+	__slots__ = ["frame", "priority", "queuedTime", "processSentMessage"]
+
+	def __init__(self, frame, priority, queuedTime, processSentMessage):
+		self.frame = frame
+		self.priority = priority
+		self.queuedTime = queuedTime
+		self.processSentMessage = processSentMessage
+
+
+class queueDelayStatistics(object):
+	def __init__(self):
+		self.count = 0
+		self.totalDelay = 0.0
+		self.maxDelay = 0.0
+
+	def addSample(self, delay):
+		self.count += 1
+		self.totalDelay += delay
+		if (delay > self.maxDelay):
+			self.maxDelay = delay
+
+	def getMeanDelay(self):
+		if (self.count == 0):
+			return 0.0
+		return self.totalDelay / self.count
+
+
+def getMessagePriority(line):
+	return MESSAGE_PRIORITIES.get(line.split(",", 1)[0], PRIORITY_CHAT)
+
+
+class txScheduler(object):
+	# baudrate is the radio's serial rate; linkEfficiency scales it down to what
+	# the radios actually get across once framing and turnaround are paid for
+	def __init__(self, baudrate = 38400, linkEfficiency = 1.0, burstBytes = 512, clock = time.time):
+		self.bytesPerSecond = baudrate * linkEfficiency / BITS_PER_BYTE
+		self.burstBytes = burstBytes
+		self.clock = clock
+
+		self.tokens = float(burstBytes)
+		self.lastRefillTime = clock()
+
+		self.queues = [deque() for name in PRIORITY_NAMES]
+		self.queuedPosition = None
+
+		self.delayStatistics = [queueDelayStatistics() for name in PRIORITY_NAMES]
+		self.framesCoalesced = 0
+		self.bytesSent = 0
+
+	# Queues a frame. line is the message without callsign or terminator (used
+	# to classify it), frame the bytes that go on the wire. Returns False if the
+	# frame was coalesced away
+	def enqueue(self, line, frame, processSentMessage = False, priority = None):
+		if (priority is None):
+			priority = getMessagePriority(line)
+
+		now = self.clock()
+
+		if (priority == PRIORITY_HEARTBEAT):
+			if (self.queuedPosition is not None or len(self.queues[PRIORITY_HEARTBEAT]) > 0):
+				self.framesCoalesced += 1
+				return False
+
+		elif (priority == PRIORITY_POSITION):
+			self.framesCoalesced += len(self.queues[PRIORITY_HEARTBEAT])
+			self.queues[PRIORITY_HEARTBEAT].clear()
+
+			# Keep the older slot in the queue, but send the newest position
+			if (self.queuedPosition is not None):
+				self.queuedPosition.frame = frame
+				self.queuedPosition.processSentMessage = processSentMessage
+				self.framesCoalesced += 1
+				return False
+
+		item = queuedFrame(frame, priority, now, processSentMessage)
+		self.queues[priority].append(item)
+
+		if (priority == PRIORITY_POSITION):
+			self.queuedPosition = item
+
+		return True
+
+	def refillTokens(self):
+		now = self.clock()
+		elapsed = now - self.lastRefillTime
+		self.lastRefillTime = now
+
+		if (elapsed > 0):
+			self.tokens = min(float(self.burstBytes), self.tokens + elapsed * self.bytesPerSecond)
+
+	# Returns the highest priority frame the link has room for, or None
+	def getNextFrame(self):
+		for queue in self.queues:
+			if (len(queue) > 0):
+				break
+		else:
+			return None
+
+		self.refillTokens()
+		item = queue[0]
+		cost = len(item.frame)
+
+		# Frames larger than the bucket go out whenever it is full
+		if (self.tokens < min(cost, self.burstBytes)):
+			return None
+
+		queue.popleft()
+		self.tokens -= cost
+		self.bytesSent += cost
+
+		if (item is self.queuedPosition):
+			self.queuedPosition = None
+
+		self.delayStatistics[item.priority].addSample(self.clock() - item.queuedTime)
+
+		return item
+
+	# Seconds until the frame at the head of the queues can be sent, or None
+	# if nothing is queued
+	def getWaitTime(self):
+		for queue in self.queues:
+			if (len(queue) > 0):
+				break
+		else:
+			return None
+
+		self.refillTokens()
+		needed = min(len(queue[0].frame), self.burstBytes) - self.tokens
+
+		if (needed <= 0):
+			return 0.0
+
+		return needed / self.bytesPerSecond
+
+	def getQueueDepth(self, priority = None):
+		if (priority is None):
+			return sum([len(queue) for queue in self.queues])
+		return len(self.queues[priority])
+
+	def clear(self):
+		for queue in self.queues:
+			queue.clear()
+		self.queuedPosition = None